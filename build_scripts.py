@@ -0,0 +1,548 @@
+import os
+import re
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from option import Option
+from project_info import BuildType
+
+IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# A third-party requirement which can be probed: ("pkg", pkg-config module), ("header", "foo.h"), ("lib", "foo")
+# or ("cmake", CMake package).
+Requirement = Tuple[str, str]
+SKIP_DIRS = {"build", "_build", "node_modules", "__pycache__"}
+
+
+class Statement:
+    def __init__(self, file: str, line: int, text: str):
+        self.file = file
+        self.line = line
+        self.text = text
+        self.head = ""  # Command name (CMake) or first keyword.
+        self.block_end: Union[int, None] = None  # Last statement controlled by this condition.
+
+    def where(self) -> str:
+        return f"{self.file}:{self.line}"
+
+
+class BuildScript:
+    """Statements of all build scripts of one build system, indexed by identifier."""
+
+    def __init__(self, src_dir: str):
+        self.src_dir = src_dir
+        self.statements: List[Statement] = []
+        self.refs: Dict[str, List[int]] = {}
+        # Text of files which are substituted into generated headers/sources.
+        self.templates: List[Tuple[str, str]] = []
+
+    def add(self, statement: Statement):
+        idx = len(self.statements)
+        self.statements.append(statement)
+        for ident in set(IDENT_RE.findall(statement.text)):
+            self.refs.setdefault(ident, []).append(idx)
+
+    def region(self, idx: int) -> Iterable[int]:
+        end = self.statements[idx].block_end
+        return range(idx, (end if end is not None else idx) + 1)
+
+    def effect(self, stmt: Statement) -> Tuple[Union[str, None], List[str]]:
+        """(reason if the statement can change compilation, variables it assigns)."""
+        raise NotImplementedError
+
+    def template_reference(self, var: str) -> Union[str, None]:
+        return None
+
+    # Third-party requirements a statement makes, as (kind, pattern) with the name as group 1.
+    REQUIREMENT_PATTERNS: List[Tuple[str, re.Pattern]] = []
+
+    def requirements(self, stmt: Statement) -> List[Requirement]:
+        found = []
+        for kind, pattern in self.REQUIREMENT_PATTERNS:
+            for match in pattern.finditer(stmt.text):
+                if kind == "pkg":
+                    # A module list like "foo >= 1.0 bar", versions and operators aren't names.
+                    found.extend(("pkg", name) for name in re.findall(r"(?<![\w.])[A-Za-z][\w.+-]*", match.group(1)))
+                else:
+                    found.append((kind, match.group(1)))
+        return found
+
+    def trace(self, roots: Iterable[str], seeds: Iterable[int] = ()) -> Union[str, None]:
+        """Follow data and control dependencies of roots until they reach compilation.
+
+        Returns where they reach it, or None if they never do.
+        """
+        tainted: Set[str] = set(roots)
+        queue = list(tainted)
+        visited: Set[int] = set()
+        pending = list(seeds)
+        while pending or queue:
+            if not pending:
+                var = queue.pop()
+                reason = self.template_reference(var)
+                if reason:
+                    return reason
+                pending = list(self.refs.get(var, ()))
+                continue
+            for idx in self.region(pending.pop()):
+                if idx in visited:
+                    continue
+                visited.add(idx)
+                stmt = self.statements[idx]
+                reason, assigned = self.effect(stmt)
+                if reason:
+                    return f"{reason} at {stmt.where()}"
+                for var in assigned:
+                    if var not in tainted:
+                        tainted.add(var)
+                        queue.append(var)
+        return None
+
+
+def _walk(src_dir: str, match) -> List[str]:
+    files = []
+    for root, dirs, names in os.walk(src_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in SKIP_DIRS)
+        for name in sorted(names):
+            if match(name):
+                files.append(os.path.join(root, name))
+    return files
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path, "r", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def _strip_comment(line: str, comment: str) -> str:
+    quote = None
+    for i, ch in enumerate(line):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif line.startswith(comment, i) and (i == 0 or not line[i - 1].isalnum()):
+            return line[:i]
+    return line
+
+
+def _logical_lines(path: str, comment: str, opening: str, closing: str):
+    """Join physical lines while brackets are unbalanced, yield (line number, text)."""
+    start, parts, depth = 0, [], 0
+    for lineno, line in enumerate(_read(path).splitlines(), 1):
+        line = _strip_comment(line, comment)
+        if not parts:
+            if not line.strip():
+                continue
+            start = lineno
+        parts.append(line)
+        depth += sum(line.count(c) for c in opening) - sum(line.count(c) for c in closing)
+        if depth <= 0:
+            yield start, "\n".join(parts)
+            parts, depth = [], 0
+    if parts:
+        yield start, "\n".join(parts)
+
+
+def _macro_args(text: str, start: int) -> List[str]:
+    """Arguments of the m4 macro call whose "(" is at text[start], outer [] quotes removed."""
+    args, depth, quote, current = [], 0, 0, ""
+    for ch in text[start + 1:]:
+        if ch == "[":
+            quote += 1
+            if quote == 1:
+                continue
+        elif ch == "]" and quote:
+            quote -= 1
+            if quote == 0:
+                continue
+        elif not quote:
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif ch == "," and depth == 0:
+                args.append(current.strip())
+                current = ""
+                continue
+        current += ch
+    args.append(current.strip())
+    return args
+
+
+def _link_blocks(script: BuildScript, openers: Set[str], middles: Set[str], closers: Set[str]):
+    # A condition controls every statement up to the end of its block, including the
+    # other branches, since they run exactly when it doesn't hold.
+    stack: List[List[int]] = []
+    for idx, stmt in enumerate(script.statements):
+        if stmt.head in openers:
+            stack.append([idx])
+        elif stmt.head in middles and stack:
+            stack[-1].append(idx)
+        elif stmt.head in closers and stack:
+            for open_idx in stack.pop():
+                script.statements[open_idx].block_end = idx
+
+
+class CMakeScript(BuildScript):
+    COMMAND_RE = re.compile(r"([A-Za-z_][A-Za-z0-9_]*)\s*\(")
+    # Commands which can't change how any file is compiled. target_link_libraries and link_libraries
+    # are not among them: linking a target propagates its usage requirements (include directories,
+    # compile definitions and options), only linking plain library files is inert, see LINK_COMMANDS.
+    INERT = {
+        "message", "install", "link_directories",
+        "target_link_directories", "target_link_options", "add_link_options", "add_test",
+        "set_tests_properties", "mark_as_advanced", "enable_testing", "unset", "return",
+        "break", "continue", "cmake_policy", "else", "endif", "endforeach", "endwhile",
+        "endfunction", "endmacro", "if", "elseif", "foreach", "while", "function", "macro",
+    }
+    ASSIGN = {"set", "option", "cmake_dependent_option"}
+    LINK_COMMANDS = {"target_link_libraries", "link_libraries"}
+    LINK_KEYWORDS = {"PRIVATE", "PUBLIC", "INTERFACE", "LINK_PRIVATE", "LINK_PUBLIC", "LINK_INTERFACE_LIBRARIES",
+                     "debug", "optimized", "general"}
+    # -lfoo, -pthread or a path to a library file, which carry no usage requirements.
+    PLAIN_LIBRARY_RE = re.compile(r"^(?:-l[\w.+-]+|-pthread|[^$<>:]*\.(?:a|so(?:\.[\d.]+)?|dylib|lib|tbd))$")
+    REQUIREMENT_PATTERNS = [
+        ("pkg", re.compile(r"pkg_(?:check|search)_modules?\(\s*\w+\s+(?:\w+\s+)*?REQUIRED\s+((?:[^)\s]+\s*)+)\)", re.IGNORECASE)),
+        ("cmake", re.compile(r"find_package\(\s*([\w.+-]+)(?=[^)]*\bREQUIRED\b)", re.IGNORECASE)),
+    ]
+    TEMPLATE_RE = re.compile(r"\.(in|cmake)$")
+
+    def __init__(self, src_dir: str):
+        super().__init__(src_dir)
+        # Packages the project finds with its own Find<name>.cmake, which may do anything.
+        self.find_modules: Set[str] = set()
+        for path in _walk(src_dir, lambda n: n == "CMakeLists.txt" or n.endswith(".cmake")):
+            self._parse(path)
+            match = re.match(r"Find(.+)\.cmake$", os.path.basename(path))
+            if match:
+                self.find_modules.add(match.group(1))
+        for path in _walk(src_dir, lambda n: self.TEMPLATE_RE.search(n) and n != "CMakeLists.txt"):
+            if not path.endswith(".cmake") or ".h" in os.path.basename(path):
+                self.templates.append((os.path.relpath(path, src_dir), _read(path)))
+        _link_blocks(self, {"if"}, {"elseif", "else"}, {"endif"})
+
+    def _parse(self, path: str):
+        rel = os.path.relpath(path, self.src_dir)
+        for lineno, text in _logical_lines(path, "#", "(", ")"):
+            for match in self.COMMAND_RE.finditer(text):
+                # Commands inside the arguments of another command are arguments.
+                if text[: match.start()].count("(") > text[: match.start()].count(")"):
+                    continue
+                end, depth = match.end(), 1
+                while end < len(text) and depth:
+                    depth += {"(": 1, ")": -1}.get(text[end], 0)
+                    end += 1
+                stmt = Statement(rel, lineno + text[: match.start()].count("\n"), text[match.start():end])
+                stmt.head = match.group(1).lower()
+                self.add(stmt)
+
+    def requirements(self, stmt: Statement) -> List[Requirement]:
+        return [
+            (kind, name) for kind, name in super().requirements(stmt)
+            if kind != "cmake" or name not in self.find_modules
+        ]
+
+    def declared(self) -> Set[str]:
+        names = set()
+        for stmt in self.statements:
+            args = stmt.text[stmt.text.find("(") + 1:].split()
+            if not args:
+                continue
+            if stmt.head in ("option", "cmake_dependent_option"):
+                names.add(args[0].strip("\"()"))
+            elif stmt.head == "set" and "CACHE" in args:
+                names.add(args[0].strip("\"()"))
+        return names
+
+    def effect(self, stmt: Statement) -> Tuple[Union[str, None], List[str]]:
+        if stmt.head in self.INERT:
+            return None, []
+        args = stmt.text[stmt.text.find("(") + 1:].split()
+        if stmt.head in self.LINK_COMMANDS:
+            items = [arg.strip("\"()") for arg in args[1 if stmt.head == "target_link_libraries" else 0:]]
+            items = [item for item in items if item and item not in self.LINK_KEYWORDS]
+            if all(self.PLAIN_LIBRARY_RE.match(item) for item in items):
+                return None, []
+            return f"{stmt.head}()", []
+        if stmt.head in self.ASSIGN or stmt.head == "list":
+            target = args[1] if stmt.head == "list" and len(args) > 1 else (args[0] if args else "")
+            target = target.strip("\"()")
+            if target.startswith("CMAKE_"):
+                return f"{stmt.head}({target})", []
+            return None, [target] if target else []
+        return f"{stmt.head}()", []
+
+    def template_reference(self, var: str) -> Union[str, None]:
+        pattern = re.compile(
+            rf"(@{var}@|\$\{{{var}\}}|#\s*cmakedefine(01)?\s+{var}\b)"
+        )
+        for rel, text in self.templates:
+            if pattern.search(text):
+                return f"template {rel}"
+        return None
+
+
+class MesonScript(BuildScript):
+    CALL_RE = re.compile(r"(?<![\w.])([A-Za-z_]\w*)\s*\(")
+    METHOD_RE = re.compile(r"\.([A-Za-z_]\w*)\s*\(")
+    ASSIGN_RE = re.compile(r"^\s*([A-Za-z_]\w*)\s*(\+?=)(?!=)")
+    INERT_CALLS = {
+        "get_option", "message", "warning", "summary", "install_data", "install_man",
+        "install_subdir", "test", "benchmark", "files", "join_paths", "is_variable",
+        "get_variable", "set_variable", "import",
+    }
+    PURE_METHODS = {
+        "enabled", "disabled", "allowed", "auto", "found", "get", "contains", "format",
+        "join", "split", "strip", "to_string", "to_int", "to_lower", "to_upper",
+        "startswith", "endswith", "length", "version", "version_compare", "require",
+        "disable_auto_if", "enable_auto_if", "get_id", "get_define", "has_header",
+        "has_function", "has_argument", "cpu_family", "system", "keys",
+    }
+    OPENERS = {"if", "foreach"}
+    CLOSERS = {"endif", "endforeach"}
+    REQUIREMENT_PATTERNS = [
+        ("pkg", re.compile(r"dependency\(\s*'([^']+)'(?![^)]*required\s*:\s*false)")),
+        ("header", re.compile(r"has_header\(\s*'([^']+)'(?=[^)]*required\s*:\s*(?!false))")),
+        ("lib", re.compile(r"find_library\(\s*'([^']+)'(?![^)]*required\s*:\s*false)")),
+    ]
+    KEYWORDS = {"if", "elif", "foreach", "not", "and", "or", "in"}
+
+    def __init__(self, src_dir: str):
+        super().__init__(src_dir)
+        for path in _walk(src_dir, lambda n: n == "meson.build"):
+            rel = os.path.relpath(path, src_dir)
+            for lineno, text in _logical_lines(path, "#", "([{", ")]}"):
+                stmt = Statement(rel, lineno, text)
+                words = IDENT_RE.findall(text)
+                stmt.head = words[0] if words else ""
+                self.add(stmt)
+        _link_blocks(self, {"if"}, {"elif", "else"}, {"endif"})
+        self.options_files = _walk(src_dir, lambda n: n in ("meson_options.txt", "meson.options"))
+
+    def declared(self) -> Set[str]:
+        names = set()
+        for path in self.options_files:
+            names.update(re.findall(r"option\s*\(\s*'([^']+)'", _read(path)))
+        return names
+
+    def effect(self, stmt: Statement) -> Tuple[Union[str, None], List[str]]:
+        text = stmt.text
+        if stmt.head in self.OPENERS | self.CLOSERS | {"elif", "else"}:
+            return None, []
+        for name in self.CALL_RE.findall(text):
+            if name not in self.INERT_CALLS and name not in self.KEYWORDS:
+                return f"{name}()", []
+        for name in self.METHOD_RE.findall(text):
+            if name not in self.PURE_METHODS:
+                return f".{name}()", []
+        match = self.ASSIGN_RE.match(text)
+        return None, [match.group(1)] if match else []
+
+
+class AutoconfScript(BuildScript):
+    LIVE_RE = re.compile(
+        r"\b(AC_DEFINE(_UNQUOTED)?|AM_CONDITIONAL|AC_SUBST|AC_CONFIG_(FILES|HEADERS|SUBDIRS|LINKS)"
+        r"|AC_CHECK_(HEADERS?|FUNCS?|DECLS?|TYPES?|MEMBERS?|SIZEOF|LIB)|PKG_CHECK_MODULES)\b"
+        r"|(?<![\w$])(CFLAGS|CPPFLAGS|CXXFLAGS|DEFS|\w+_CFLAGS|\w+_CPPFLAGS|\w+_CXXFLAGS)\+?="
+    )
+    MACRO_RE = re.compile(r"\b([A-Z][A-Z0-9]*_[A-Z0-9_]+)\s*\(")
+    INERT_MACROS = {
+        "AC_MSG_CHECKING", "AC_MSG_RESULT", "AC_MSG_NOTICE", "AC_MSG_WARN", "AC_MSG_ERROR",
+        "AC_MSG_FAILURE", "AS_IF", "AS_CASE", "AS_HELP_STRING", "AC_HELP_STRING", "AS_ECHO",
+        "AC_SEARCH_LIBS", "AC_ARG_ENABLE", "AC_ARG_WITH", "AC_ARG_VAR", "AS_VAR_SET",
+        "AC_CACHE_CHECK", "AC_CACHE_VAL", "AC_LINK_IFELSE", "AC_COMPILE_IFELSE",
+        "AC_RUN_IFELSE", "AC_PREPROC_IFELSE", "AC_LANG_PROGRAM", "AC_LANG_SOURCE",
+        "AC_CHECK_PROG", "AC_CHECK_PROGS", "AC_PATH_PROG", "AC_PATH_PROGS", "AC_REQUIRE",
+    }
+    ASSIGN_RE = re.compile(r"(?:^|[\s;\[(])([A-Za-z_]\w*)\+?=")
+    KEYWORD_RE = re.compile(r"(?:^|[;\n]|\bthen\b|\bdo\b|\belse\b)\s*(if|case|for|while|until|fi|esac|done)\b")
+    DECLARE_RE = re.compile(r"AC_ARG_(ENABLE|WITH)\(\s*\[?([\w.+-]+)\]?")
+    # Checks as (kind, macro, argument naming the requirement, argument run when it is missing).
+    # Only a check whose missing branch fails configure makes a requirement, the default branch of
+    # PKG_CHECK_MODULES does, those of AC_CHECK_LIB and AC_CHECK_HEADER don't.
+    REQUIREMENT_CHECKS = [
+        ("pkg", "PKG_CHECK_MODULES", 1, 3),
+        ("header", "AC_CHECK_HEADER", 0, 2),
+        ("lib", "AC_CHECK_LIB", 0, 3),
+    ]
+    FATAL_RE = re.compile(r"\bAC_MSG_(?:ERROR|FAILURE)\b")
+
+    def __init__(self, src_dir: str):
+        super().__init__(src_dir)
+        paths = _walk(src_dir, lambda n: n in ("configure.ac", "configure.in", "acinclude.m4"))
+        paths += [p for p in _walk(src_dir, lambda n: n.endswith(".m4")) if p not in paths]
+        for path in paths:
+            rel = os.path.relpath(path, src_dir)
+            for lineno, text in _logical_lines(path, "dnl", "([", ")]"):
+                if text.lstrip().startswith("#"):
+                    continue
+                stmt = Statement(rel, lineno, text)
+                keywords = self.KEYWORD_RE.findall(text)
+                opens = sum(k in ("if", "case", "for", "while", "until") for k in keywords)
+                closes = len(keywords) - opens
+                stmt.head = "if" if opens > closes else ("fi" if closes > opens else "")
+                if stmt.head == "" and re.match(r"\s*(elif|else)\b", text):
+                    stmt.head = "else"
+                self.add(stmt)
+        _link_blocks(self, {"if"}, {"else"}, {"fi"})
+
+    def requirements(self, stmt: Statement) -> List[Requirement]:
+        found = []
+        for kind, macro, name_arg, missing_arg in self.REQUIREMENT_CHECKS:
+            for match in re.finditer(rf"\b{macro}\s*\(", stmt.text):
+                args = _macro_args(stmt.text, match.end() - 1)
+                if len(args) <= name_arg or not args[name_arg]:
+                    continue
+                if len(args) > missing_arg and args[missing_arg]:
+                    fatal = bool(self.FATAL_RE.search(args[missing_arg]))
+                else:
+                    fatal = kind == "pkg"
+                if not fatal:
+                    continue
+                if kind == "pkg":
+                    found.extend(("pkg", name) for name in re.findall(r"(?<![\w.])[A-Za-z][\w.+-]*", args[name_arg]))
+                else:
+                    found.append((kind, args[name_arg].split()[0]))
+        return found
+
+    def declared(self) -> Dict[str, int]:
+        """Variable of every declared feature/package (enable_foo, with_foo) -> declaring statement."""
+        names = {}
+        for idx, stmt in enumerate(self.statements):
+            for kind, feature in self.DECLARE_RE.findall(stmt.text):
+                names[kind.lower() + "_" + re.sub(r"\W", "_", feature)] = idx
+        return names
+
+    def effect(self, stmt: Statement) -> Tuple[Union[str, None], List[str]]:
+        match = self.LIVE_RE.search(stmt.text)
+        if match:
+            return match.group(0).rstrip("=+"), []
+        for name in self.MACRO_RE.findall(stmt.text):
+            if name not in self.INERT_MACROS:
+                return name, []
+        return None, [var for var in self.ASSIGN_RE.findall(stmt.text)]
+
+
+def autoconf_variable(key: str) -> Union[str, None]:
+    """--enable-foo/--disable-foo -> enable_foo, --with-foo/--without-foo -> with_foo."""
+    match = re.match(r"-*(enable|disable|with|without)-([\w.+-]+)", key.split("=")[0])
+    if not match:
+        return None
+    kind = "enable" if match.group(1) in ("enable", "disable") else "with"
+    return kind + "_" + re.sub(r"\W", "_", match.group(2))
+
+
+def load_build_script(src_dir: str, build_type: BuildType) -> Union[BuildScript, None]:
+    if build_type == BuildType.CMake:
+        return CMakeScript(src_dir)
+    if build_type == BuildType.Meson:
+        return MesonScript(src_dir)
+    if build_type == BuildType.AutoConf:
+        return AutoconfScript(src_dir)
+    return None
+
+
+def option_entry_points(
+    script: BuildScript, option: Option, declared: Union[Set[str], Dict[str, int]]
+) -> Union[Tuple[List[str], List[int]], None]:
+    """Variables holding the option and statements reading it, None if the scripts don't declare it.
+
+    declared is script.declared(), computed once for all options.
+    """
+    if isinstance(script, CMakeScript):
+        name = option.option.split("=")[0]
+        return ([name], []) if name in declared else None
+    if isinstance(script, MesonScript):
+        name = option.option.split("=")[0]
+        if name.startswith("-D"):
+            name = name[2:]
+        if name not in declared:
+            return None
+        readers = [
+            idx for idx, stmt in enumerate(script.statements)
+            if re.search(rf"get_option\(\s*'{re.escape(name)}'\s*\)", stmt.text)
+        ]
+        return [], readers
+    var = autoconf_variable(option.option)
+    return ([var], [declared[var]]) if var in declared else None
+
+
+def find_dead_options(src_dir: str, build_type: BuildType, options: List[Option]) -> Dict[str, str]:
+    """Options declared by the build scripts which can't change how any file is compiled.
+
+    Returns option -> reason. Options which aren't declared in the scanned
+    scripts (built-in or declared by generated scripts) are never reported.
+    """
+    dead: Dict[str, str] = {}
+    script = load_build_script(src_dir, build_type)
+    if script is None:
+        return dead
+    declared = script.declared()
+    for option in options:
+        entry = option_entry_points(script, option, declared)
+        if entry is None:
+            continue
+        roots, seeds = entry
+        if not roots and not seeds:
+            dead[option.option] = "never read"
+        elif not script.trace(roots, seeds):
+            dead[option.option] = "never reaches compilation"
+    return dead
+
+
+FFMPEG_REQUIRE_RE = re.compile(r"^\s*enabled\s+(\w+)\s+&&\s+(require_pkg_config|require_headers|require)\s+(.*)$")
+
+
+def _configure_script_requirements(src_dir: str) -> Dict[str, List[Requirement]]:
+    # Handwritten configure scripts (FFmpeg style): `enabled libfoo && require_pkg_config libfoo foo foo.h fn`.
+    requirements: Dict[str, List[Requirement]] = {}
+    for line in _read(os.path.join(src_dir, "configure")).splitlines():
+        match = FFMPEG_REQUIRE_RE.match(line)
+        if not match:
+            continue
+        feature, command, args = match.groups()
+        words = [word.strip("\"'") for word in args.split()]
+        found = requirements.setdefault("enable_" + feature, [])
+        if command == "require_pkg_config" and len(words) > 1:
+            found.append(("pkg", words[1]))
+        elif command == "require_headers" and words:
+            found.append(("header", words[0]))
+        elif command == "require" and len(words) > 1:
+            if words[1].endswith(".h"):
+                found.append(("header", words[1]))
+            found.extend(("lib", word[2:]) for word in words if word.startswith("-l"))
+    return requirements
+
+
+def find_option_requirements(src_dir: str, build_type: BuildType, options: List[Option]) -> Dict[str, List[Requirement]]:
+    """Third-party requirements of turning each option on, as far as the build scripts state them.
+
+    Only the statements reading the option directly are considered, options
+    without any stated requirement are left out.
+    """
+    result: Dict[str, List[Requirement]] = {}
+    script = load_build_script(src_dir, build_type)
+    handwritten = _configure_script_requirements(src_dir) if build_type == BuildType.AutoConf else {}
+    declared = script.declared() if script is not None else None
+    for option in options:
+        found: List[Requirement] = []
+        var = autoconf_variable(option.option) if build_type == BuildType.AutoConf else None
+        if var in handwritten:
+            found.extend(handwritten[var])
+        entry = option_entry_points(script, option, declared) if script is not None else None
+        if entry is not None:
+            roots, seeds = entry
+            readers = set(seeds)
+            for root in roots:
+                readers.update(script.refs.get(root, ()))
+            for idx in sorted(readers):
+                for stmt_idx in script.region(idx):
+                    found.extend(script.requirements(script.statements[stmt_idx]))
+        if found:
+            result[option.option] = sorted(set(found))
+    return result
@@ -0,0 +1,265 @@
+import errno
+import fcntl
+import os
+import shutil
+import subprocess
+from array import array
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+from logger import logger
+from option import OptionSpace
+
+SLOT_EXCLUDES = {".git", ".cache"}
+FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h.
+
+
+class SlotMethodUnsupported(Exception):
+    pass
+
+
+def _walk(src_dir: str) -> Iterable[Tuple[str, str, os.stat_result]]:
+    """(relative path, kind, stat) of everything under src_dir except SLOT_EXCLUDES, parents first."""
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(src_dir, rel_dir)) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.name in SLOT_EXCLUDES:
+                    continue
+                rel = os.path.join(rel_dir, entry.name)
+                if entry.is_symlink():
+                    yield rel, "link", entry.stat(follow_symlinks=False)
+                elif entry.is_dir():
+                    yield rel, "dir", entry.stat()
+                    stack.append(rel)
+                elif entry.is_file():
+                    yield rel, "file", entry.stat()
+
+
+def _replicate(src_dir: str, dst_dir: str, copy_file: Callable[[str, str, os.stat_result], None]):
+    # Mirror the tree with copy_file for regular files, keeping modes and times like rsync -a,
+    # so make and the autotools don't consider anything out of date.
+    dirs = []
+    for rel, kind, st in _walk(src_dir):
+        src = os.path.join(src_dir, rel)
+        dst = os.path.join(dst_dir, rel)
+        if kind == "dir":
+            os.makedirs(dst, exist_ok=True)
+            dirs.append((dst, st))
+        elif kind == "link":
+            os.symlink(os.readlink(src), dst)
+        else:
+            copy_file(src, dst, st)
+    for dst, st in reversed(dirs):
+        os.chmod(dst, st.st_mode & 0o7777)
+        os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def _finish_copy(dst: str, st: os.stat_result):
+    os.chmod(dst, st.st_mode & 0o7777)
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def reflink_copy(src_dir: str, dst_dir: str):
+    """Clone every file with FICLONE, the blocks are shared until either side writes (btrfs, xfs)."""
+
+    def clone(src: str, dst: str, st: os.stat_result):
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except OSError as e:
+                if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+                    raise SlotMethodUnsupported(f"no reflinks: {e.strerror}")
+                raise
+        _finish_copy(dst, st)
+
+    _replicate(src_dir, dst_dir, clone)
+
+
+def git_worktree(src_dir: str, dst_dir: str):
+    """Check the source commit out into the slot, only if that is exactly the source tree."""
+    if os.path.exists(os.path.join(src_dir, ".gitmodules")):
+        raise SlotMethodUnsupported("submodules aren't checked out by worktrees")
+    # Ignored files count too: a generated configure or aclocal.m4 the build needs isn't checked out.
+    status = subprocess.run(
+        ["git", "status", "--porcelain", "--untracked-files=all", "--ignored"],
+        cwd=src_dir, capture_output=True, text=True,
+    )
+    if status.returncode != 0:
+        raise SlotMethodUnsupported("not a git checkout")
+    for line in status.stdout.splitlines():
+        path = line[3:].strip('"')
+        if path.split("/")[0] not in SLOT_EXCLUDES:
+            raise SlotMethodUnsupported(f"not a clean git checkout: {path}")
+    # Registrations of slots deleted without git would make "worktree add" refuse their paths.
+    subprocess.run(["git", "worktree", "prune"], cwd=src_dir, capture_output=True)
+    # The slot dir exists and is empty, git wants to create it.
+    os.rmdir(dst_dir)
+    process = subprocess.run(
+        ["git", "worktree", "add", "--detach", "--force", dst_dir, "HEAD"],
+        cwd=src_dir, capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        os.makedirs(dst_dir, exist_ok=True)
+        raise SlotMethodUnsupported(process.stderr.strip())
+
+
+def remove_slot(slot_dir: str):
+    """Delete a slot, unregistering it from its repository if it is a git worktree."""
+    git_file = os.path.join(slot_dir, ".git")
+    if os.path.isfile(git_file):
+        # A worktree's .git is a file pointing at its registration in the main repository.
+        subprocess.run(
+            ["git", "-C", slot_dir, "worktree", "remove", "--force", slot_dir], capture_output=True
+        )
+    shutil.rmtree(slot_dir, ignore_errors=True)
+
+
+def rsync_copy(src_dir: str, dst_dir: str):
+    """A full copy, works everywhere."""
+    cmd = ["rsync", "-a"]
+    for exclude in sorted(SLOT_EXCLUDES):
+        cmd.extend(["--exclude", exclude])
+    cmd.extend([f"{src_dir}/", f"{dst_dir}/"])
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+# Fastest first, "auto" tries them in this order. Hard-link farms aren't offered: a linked file
+# is shared with the source tree and every other slot, and nothing can break the link before
+# a tool rewrites the file in place (bison regenerating a committed parser, cp x.h.in x.h).
+SLOT_METHODS: Dict[str, Callable[[str, str], None]] = {
+    "reflink": reflink_copy,
+    "worktree": git_worktree,
+    "rsync": rsync_copy,
+}
+
+
+def _clear(dst_dir: str):
+    for name in os.listdir(dst_dir):
+        path = os.path.join(dst_dir, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+
+def materialize_slot(src_dir: str, dst_dir: str, method: str = "auto") -> str:
+    """Fill the empty slot dir with the source tree, return the method used.
+
+    With "auto", unsupported methods fall through to the next one, a forced
+    method falls back to rsync.
+    """
+    if method == "auto":
+        chain = list(SLOT_METHODS)
+    else:
+        chain = [method] if method == "rsync" else [method, "rsync"]
+    for name in chain:
+        try:
+            SLOT_METHODS[name](src_dir, dst_dir)
+            return name
+        except (SlotMethodUnsupported, OSError, subprocess.CalledProcessError) as e:
+            logger.info(f"[Build Slot] {name} can't materialize {dst_dir}: {e}")
+            os.makedirs(dst_dir, exist_ok=True)
+            _clear(dst_dir)
+    raise RuntimeError(f"Can't materialize build slot {dst_dir}")
+
+
+def tree_bytes(path: str) -> int:
+    """Disk space used by a directory tree."""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            total += st.st_blocks * 512
+    return total
+
+
+class SlotPool:
+    """The candidate build slots (s0, s1, ...) and the options each was last configured with.
+
+    Candidates are sent to the slot whose last options differ from theirs in
+    the fewest options, so in-place reconfiguration and incremental builds
+    have the least to redo. The pool grows with the cores and shrinks to what
+    the disk holds.
+    """
+
+    def __init__(self, build_root: str, option_space: OptionSpace, size: int):
+        self.build_root = build_root
+        self.option_space = option_space
+        self.slots: List[str] = [f"s{i}" for i in range(max(1, size))]
+        # Build dir -> (options, option vector) of its last successful configure.
+        self.configured: Dict[str, Tuple[List[str], array]] = {}
+        # Build dir -> disk space it used when last measured, after materializing or building.
+        self.footprints: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def slot_dir(self, slot: str) -> str:
+        return os.path.join(self.build_root, slot)
+
+    def last_options(self, build_dir: str) -> Union[List[str], None]:
+        entry = self.configured.get(build_dir)
+        return entry[0] if entry else None
+
+    def record(self, build_dir: str, options: List[str]):
+        self.configured[build_dir] = (list(options), self.option_space.encode(options))
+
+    def forget(self, build_dir: str):
+        self.configured.pop(build_dir, None)
+
+    def measure(self, build_dir: str):
+        """Take the disk space build_dir uses now as its footprint, e.g. after a build."""
+        self.footprints[build_dir] = tree_bytes(build_dir)
+
+    def target_size(self, candidate_size: int, footprint_hint: int = 0) -> int:
+        """As many slots as candidates, more with spare cores, fewer if the disk can't hold them."""
+        cores = os.cpu_count() or 1
+        wanted = max(candidate_size, min(2 * candidate_size, cores))
+        existing = [slot for slot in self.slots if os.path.isdir(self.slot_dir(slot))]
+        for slot in existing:
+            # Walking a slot's tree is expensive, it is only done once unless a build measures it again.
+            if self.slot_dir(slot) not in self.footprints:
+                self.measure(self.slot_dir(slot))
+        footprint = max([self.footprints[self.slot_dir(slot)] for slot in existing] + [footprint_hint])
+        if footprint <= 0 or not os.path.isdir(self.build_root):
+            return max(1, wanted)
+        usage = shutil.disk_usage(self.build_root)
+        spare = usage.free - usage.total // 10  # Keep a tenth of the disk free.
+        return max(1, min(wanted, len(existing) + max(0, spare) // footprint))
+
+    def resize(self, size: int):
+        size = max(1, size)
+        if size == len(self.slots):
+            return
+        logger.info(f"[Build Slot] Resizing the slot pool from {len(self.slots)} to {size}")
+        for slot in self.slots[size:]:
+            build_dir = self.slot_dir(slot)
+            self.forget(build_dir)
+            self.footprints.pop(build_dir, None)
+            remove_slot(build_dir)
+        self.slots = [f"s{i}" for i in range(size)]
+
+    def assign(self, candidates: List[List[str]]) -> List[str]:
+        """A distinct slot for every candidate (at most len(self) of them), nearest first."""
+        assert len(candidates) <= len(self.slots)
+        unset = len(self.option_space.keys) + 1  # A fresh slot is farther than any configured one.
+        pairs = []
+        for cand_idx, options in enumerate(candidates):
+            vector = self.option_space.encode(options)
+            for slot_idx, slot in enumerate(self.slots):
+                entry = self.configured.get(self.slot_dir(slot))
+                delta = len(self.option_space.diff_keys(entry[1], vector)) if entry else unset
+                pairs.append((delta, cand_idx, slot_idx))
+        # Greedy matching on the smallest deltas.
+        assigned: Dict[int, str] = {}
+        used = set()
+        for delta, cand_idx, slot_idx in sorted(pairs):
+            if cand_idx in assigned or slot_idx in used:
+                continue
+            assigned[cand_idx] = self.slots[slot_idx]
+            used.add(slot_idx)
+        return [assigned[idx] for idx in range(len(candidates))]
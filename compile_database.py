@@ -0,0 +1,139 @@
+import json
+import os
+import shlex
+from typing import Dict, Iterable, Iterator, List
+
+SOURCE_EXTS = {"c", "C", "cc", "CC", "cp", "cpp", "CPP", "cxx", "CXX", "c++", "C++"}
+READ_SIZE = 1 << 20
+_decoder = json.JSONDecoder()
+
+
+def iter_entries(cdb_file: str) -> Iterator[Dict]:
+    """The entries of a compile_commands.json one at a time, reading it in chunks.
+
+    Memory stays bounded by the largest entry, not the size of the database.
+    """
+    with open(cdb_file, "r") as f:
+        buffer = ""
+        pos = 0
+        started = False
+        eof = False
+        while True:
+            # Skip the separators between entries.
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if not started and pos < len(buffer):
+                if buffer[pos] != "[":
+                    raise ValueError(f"{cdb_file} is not a JSON array")
+                started = True
+                pos += 1
+                continue
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                if pos == len(buffer):
+                    raise ValueError("need more input")
+                entry, end = _decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if eof:
+                    # The closing "]" returns above, so input ending without it is incomplete.
+                    if not started:
+                        raise ValueError(f"{cdb_file} is not a JSON array")
+                    raise ValueError(f"{cdb_file} is truncated")
+                chunk = f.read(READ_SIZE)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield entry
+            pos = end
+
+
+class CompileDatabaseWriter:
+    """Write compile_commands.json entries as they come, compactly, one per line.
+
+    The file is written next to its destination and moved over it on close,
+    so a database can be rewritten while it is being read.
+    """
+
+    def __init__(self, cdb_file: str):
+        self.cdb_file = cdb_file
+        self.tmp_file = f"{cdb_file}.{os.getpid()}.tmp"
+        self.count = 0
+        self._f = None
+
+    def __enter__(self) -> "CompileDatabaseWriter":
+        self._f = open(self.tmp_file, "w")
+        self._f.write("[")
+        return self
+
+    def write(self, entry: Dict):
+        self._f.write(",\n" if self.count else "\n")
+        self._f.write(json.dumps(entry, separators=(",", ":")))
+        self.count += 1
+
+    def write_all(self, entries: Iterable[Dict]):
+        for entry in entries:
+            self.write(entry)
+
+    def __exit__(self, exc_type, exc, tb):
+        self._f.write("\n]\n")
+        self._f.close()
+        if exc_type is None:
+            os.replace(self.tmp_file, self.cdb_file)
+        else:
+            os.remove(self.tmp_file)
+
+
+def entry_arguments(entry: Dict) -> List[str]:
+    if "arguments" in entry:
+        return entry["arguments"]
+    command = entry["command"]
+    if any(char in command for char in "\"'\\"):
+        return shlex.split(command)
+    return command.split()
+
+
+def is_source(argument: str) -> bool:
+    # os.path.splitext(argument)[1][1:] in SOURCE_EXTS, without the overhead.
+    dot = argument.rfind(".")
+    return dot > 0 and argument[dot - 1] != "/" and "/" not in argument[dot:] and argument[dot + 1:] in SOURCE_EXTS
+
+
+def split_sources(entry: Dict) -> List[Dict]:
+    """One entry per source file of a command compiling several (e.g. `cc -c a.c b.c`).
+
+    The entry of the command's own file comes first, commands with a single
+    source are returned unchanged.
+    """
+    arguments = entry_arguments(entry)
+    directory = entry["directory"]
+    source_idxs = [idx for idx, argument in enumerate(arguments) if is_source(argument)]
+    if len(source_idxs) <= 1:
+        return [entry]
+    sources = [os.path.abspath(os.path.join(directory, arguments[idx])) for idx in source_idxs]
+    others = [argument for idx, argument in enumerate(arguments) if idx not in source_idxs]
+    current_file = os.path.abspath(os.path.join(directory, entry["file"]))
+    result = [entry] if current_file not in sources else []
+    for source in sources:
+        item = {key: value for key, value in entry.items() if key != "arguments"}
+        item["file"] = source
+        item["command"] = shlex.join(others[:1] + [source] + others[1:])
+        if source == current_file:
+            result.insert(0, item)
+        else:
+            result.append(item)
+    return result
+
+
+def split_compile_database(cdb_file: str) -> int:
+    """Split the multi-source commands of cdb_file in one streaming pass, return the entries added."""
+    if not os.path.exists(cdb_file):
+        return 0
+    added = 0
+    with CompileDatabaseWriter(cdb_file) as writer:
+        for entry in iter_entries(cdb_file):
+            items = split_sources(entry)
+            added += len(items) - 1
+            writer.write_all(items)
+    return added
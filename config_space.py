@@ -0,0 +1,256 @@
+import random
+import sys
+from typing import Dict, Iterable, List, Tuple, Union
+
+from option import Option, option_value_tokens
+
+FALSE = 0
+TRUE = 1
+
+
+class ConfigSpaceDD:
+    """The valid configurations of a set of options, compiled into a decision diagram.
+
+    Every option key is a multi-valued variable whose value is one of its
+    tokens or unset (left to the build system's default). A configuration is
+    valid when:
+    - an option turned on leaves the options it conflicts with unset,
+    - an option turned on sets every value of its combination,
+    - a key which is only reachable through combinations is only set by one,
+    - no forbidden set of tokens (e.g. learned conflicts) is fully selected.
+
+    The diagram is reduced and ordered, so the number of valid configurations
+    is counted exactly in one pass over the nodes, and a uniformly random
+    valid configuration is drawn in O(number of options).
+    """
+
+    def __init__(self, options: List[Option], forbidden: Iterable[Iterable[str]] = ()):
+        self.keys: List[str] = []
+        self.domains: List[List[Union[str, None]]] = []  # [level][code] -> token, code 0 is unset.
+        on_codes: Dict[str, List[int]] = {}
+        index: Dict[str, int] = {}
+        token_keys: Dict[str, str] = {}  # Like OptionSpace, option tokens belong to their option.
+
+        def add_token(token: str, key: Union[str, None] = None) -> Tuple[int, int]:
+            if key is None:
+                key = token_keys.get(token, token.split("=")[0])
+            token_keys[token] = key
+            if key not in index:
+                index[key] = len(self.keys)
+                self.keys.append(key)
+                self.domains.append([None])
+            level = index[key]
+            if token not in self.domains[level]:
+                self.domains[level].append(token)
+            return level, self.domains[level].index(token)
+
+        for option in options:
+            tokens = option_value_tokens(option)
+            if not tokens:
+                continue
+            for token, is_on in tokens:
+                _, code = add_token(token, option.option)
+                if is_on:
+                    on_codes.setdefault(option.option, []).append(code)
+        for option in options:
+            for com in option.combination:
+                add_token(com)
+
+        # Constraints as (option key, on codes) -> [(key, allowed codes), ...] implications.
+        options_by_key = {option.option: option for option in options if option.option in index}
+        implications: List[Tuple[str, List[Tuple[str, List[int]]]]] = []
+        forced_by: Dict[str, List[str]] = {key: [] for key in self.keys}
+        for key, option in options_by_key.items():
+            if key not in on_codes:
+                continue
+            consequences = []
+            for cf in sorted(option.conflict):
+                if cf in index:
+                    consequences.append((cf, [0]))
+            for com in option.combination:
+                com_key = token_keys[com]
+                consequences.append((com_key, [self.domains[index[com_key]].index(com)]))
+                if com_key not in options_by_key:
+                    forced_by[com_key].append(key)
+            if consequences:
+                implications.append((key, consequences))
+
+        # Keep constrained keys next to each other, it keeps the diagram narrow.
+        neighbours: Dict[str, List[str]] = {key: [] for key in self.keys}
+        for key, consequences in implications:
+            for other, _ in consequences:
+                neighbours[key].append(other)
+                neighbours[other].append(key)
+        order: List[str] = []
+        placed = set()
+        for start in self.keys:
+            stack = [start]
+            while stack:
+                key = stack.pop()
+                if key in placed:
+                    continue
+                placed.add(key)
+                order.append(key)
+                stack.extend(reversed(neighbours[key]))
+        self.domains = [self.domains[index[key]] for key in order]
+        self.keys = order
+        self.level: Dict[str, int] = {key: level for level, key in enumerate(order)}
+        # Sampled tokens are emitted in the option order.
+        self.emit_order = sorted(range(len(order)), key=lambda level: index[order[level]])
+
+        # Node id -> (level, children); ids 0 and 1 are the terminals.
+        self.nodes: List[Tuple[int, Tuple[int, ...]]] = [(len(order), ()), (len(order), ())]
+        self.unique: Dict[Tuple[int, Tuple[int, ...]], int] = {}
+        self._memo: Dict[Tuple[str, int, int], int] = {}
+
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, 4 * len(order) + 1000))
+        try:
+            clauses = []
+            forbidden_codes: List[Dict[str, int]] = []
+            for tokens in forbidden:
+                codes = {}
+                for token in tokens:
+                    key = token_keys.get(token)
+                    if key is None or key in codes:
+                        # Can't be selected together anyway.
+                        break
+                    codes[key] = self.domains[self.level[key]].index(token)
+                else:
+                    if codes:
+                        forbidden_codes.append(codes)
+            for key, consequences in implications:
+                # key on => each consequence, as the clause (not on) or consequence.
+                not_on = self._literal(key, [c for c in range(len(self.domains[self.level[key]])) if c not in on_codes[key]])
+                for other, codes in consequences:
+                    clauses.append(self._apply("or", not_on, self._literal(other, codes)))
+            for key in self.keys:
+                if key in options_by_key:
+                    continue
+                # A combination-only key is set only when a combination forces it,
+                # as the clause (unset) or (some forcing option on).
+                clause = self._literal(key, [0])
+                for forcing in forced_by[key]:
+                    clause = self._apply("or", clause, self._literal(forcing, on_codes[forcing]))
+                clauses.append(clause)
+            for codes in forbidden_codes:
+                # not (all tokens), as the clause (some token not selected).
+                clause = FALSE
+                for key, code in codes.items():
+                    others = [c for c in range(len(self.domains[self.level[key]])) if c != code]
+                    clause = self._apply("or", clause, self._literal(key, others))
+                clauses.append(clause)
+            # Conjoin from the deepest clause up, so every step only rebuilds the levels above.
+            root = TRUE
+            for clause in sorted(clauses, key=lambda node: -self.nodes[node][0]):
+                root = self._apply("and", root, clause)
+            self.root = self._compact(root)
+        finally:
+            sys.setrecursionlimit(limit)
+            self._memo = {}
+
+        # Number of valid assignments below every node, counted from the node's level.
+        self.counts: List[int] = [0, 1]
+        self._skip: List[int] = [1] * (len(order) + 1)  # Product of the domain sizes from a level on.
+        for level in range(len(order) - 1, -1, -1):
+            self._skip[level] = self._skip[level + 1] * len(self.domains[level])
+        self.child_weights: List[List[int]] = [[], []]
+        for node in range(2, len(self.nodes)):
+            level, children = self.nodes[node]
+            self.child_weights.append([self._weight(level + 1, child) for child in children])
+            self.counts.append(sum(self.child_weights[node]))
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _mk(self, level: int, children: Tuple[int, ...]) -> int:
+        if all(child == children[0] for child in children):
+            return children[0]
+        node = self.unique.get((level, children))
+        if node is None:
+            node = len(self.nodes)
+            self.nodes.append((level, children))
+            self.unique[(level, children)] = node
+        return node
+
+    def _compact(self, root: int) -> int:
+        # Drop the intermediate nodes which aren't reachable from root.
+        reachable = {FALSE, TRUE, root}
+        stack = [root]
+        while stack:
+            for child in self.nodes[stack.pop()][1]:
+                if child not in reachable:
+                    reachable.add(child)
+                    stack.append(child)
+        # Children always have smaller ids, so renumbering in id order keeps that.
+        renumber = {node: new for new, node in enumerate(sorted(reachable))}
+        self.nodes = [
+            (self.nodes[node][0], tuple(renumber[child] for child in self.nodes[node][1]))
+            for node in sorted(reachable)
+        ]
+        self.unique = {node: idx for idx, node in enumerate(self.nodes) if idx > TRUE}
+        return renumber[root]
+
+    def _literal(self, key: str, codes: List[int]) -> int:
+        level = self.level[key]
+        return self._mk(level, tuple(TRUE if code in codes else FALSE for code in range(len(self.domains[level]))))
+
+    def _apply(self, op: str, a: int, b: int) -> int:
+        if op == "and":
+            if a == FALSE or b == FALSE:
+                return FALSE
+            if a == TRUE:
+                return b
+            if b == TRUE or a == b:
+                return a
+        else:
+            if a == TRUE or b == TRUE:
+                return TRUE
+            if a == FALSE:
+                return b
+            if b == FALSE or a == b:
+                return a
+        if a > b:
+            a, b = b, a
+        memo_key = (op, a, b)
+        result = self._memo.get(memo_key)
+        if result is not None:
+            return result
+        level = min(self.nodes[a][0], self.nodes[b][0])
+        size = len(self.domains[level])
+        a_children = self.nodes[a][1] if self.nodes[a][0] == level else (a,) * size
+        b_children = self.nodes[b][1] if self.nodes[b][0] == level else (b,) * size
+        result = self._mk(level, tuple(self._apply(op, x, y) for x, y in zip(a_children, b_children)))
+        self._memo[memo_key] = result
+        return result
+
+    def _weight(self, level: int, node: int) -> int:
+        # Assignments of the levels from `level` on which lead to node's subgraph.
+        return self.counts[node] * self._skip[level] // self._skip[self.nodes[node][0]]
+
+    def count(self) -> int:
+        """Exact number of valid configurations."""
+        return self._weight(0, self.root)
+
+    def sample(self, rand: random.Random) -> Union[List[str], None]:
+        """A uniformly random valid configuration, or None if there is none."""
+        total = self.count()
+        if total == 0:
+            return None
+        # One draw over all valid configurations, decoded level by level.
+        pick = rand.randrange(total)
+        codes = [0] * len(self.keys)
+        node = self.root
+        for level in range(len(self.keys)):
+            node_level, children = self.nodes[node]
+            if node_level > level:
+                # The level is unconstrained here, every value leads to node equally often.
+                pick, codes[level] = divmod(pick, len(self.domains[level]))
+                continue
+            for code, weight in enumerate(self.child_weights[node]):
+                if pick < weight:
+                    codes[level] = code
+                    node = children[code]
+                    break
+                pick -= weight
+        return [self.domains[level][codes[level]] for level in self.emit_order if codes[level]]
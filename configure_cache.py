@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from configure_failures import option_stem
+
+CACHE_ENTRY_RE = re.compile(r"^(\w+)=")
+# Variables configure records per run and checks against the environment, never shared.
+PER_RUN_PREFIXES = ("ac_cv_env_",)
+BASELINE_HEADER = "# baseline options: "
+# Checks of the compiler and system, which configure arguments don't change.
+TOOLCHAIN_CHECK_PREFIXES = (
+    "ac_cv_prog_", "ac_cv_path_", "ac_cv_c_", "ac_cv_cxx_", "ac_cv_sizeof_", "ac_cv_alignof_", "ac_cv_type_",
+    "ac_cv_build", "ac_cv_host", "ac_cv_target", "ac_cv_objext", "ac_cv_exeext", "ac_cv_sys_", "ac_cv_safe_to_define",
+    "am_cv_", "lt_cv_",
+)
+# Checks for third-party dependencies, which only the options about them change.
+DEPENDENCY_CHECK_PREFIXES = (
+    "ac_cv_lib_", "ac_cv_header_", "ac_cv_func_", "ac_cv_search_", "ac_cv_have_decl_", "ac_cv_member_", "pkg_cv_",
+)
+TOOLCHAIN_VARIABLES = ("CC", "CXX", "CPP", "CFLAGS", "CXXFLAGS", "CPPFLAGS", "LDFLAGS", "LIBS", "PKG_CONFIG_PATH")
+
+
+def _parse_cache(text: str) -> List[List[str]]:
+    # Entries as [name, line, continuation lines...], lines before the first entry are dropped.
+    entries: List[List[str]] = []
+    for line in text.splitlines():
+        match = CACHE_ENTRY_RE.match(line)
+        if match:
+            entries.append([match.group(1), line])
+        elif entries and not line.startswith("#"):
+            entries[-1].append(line)
+    return entries
+
+
+def _mentions(variable: str, stems: Iterable[str]) -> bool:
+    padded = f"_{variable.lower()}_"
+    for stem in stems:
+        stem = re.sub(r"\W", "_", stem)
+        if f"_{stem}_" in padded or (stem.startswith("lib") and f"_{stem[3:]}_" in padded):
+            return True
+    return False
+
+
+def toolchain_description(env: Dict[str, str]) -> Dict[str, str]:
+    """The compilers and flags env selects, with the compiler binaries resolved."""
+    toolchain = {name: env.get(name, "") for name in TOOLCHAIN_VARIABLES}
+    for name in ("CC", "CXX"):
+        compiler = shutil.which(toolchain[name].split()[0]) if toolchain[name] else None
+        if compiler:
+            compiler = os.path.realpath(compiler)
+            toolchain[f"{name}_binary"] = f"{compiler}:{os.path.getmtime(compiler)}"
+    return toolchain
+
+
+def toolchain_key(configure_script: str, env: Dict[str, str], constant_options: List[str]) -> str:
+    """Cache results are only valid for the same configure script, compilers and flags."""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(configure_script, "rb") as f:
+        digest.update(f.read())
+    digest.update(json.dumps([toolchain_description(env), constant_options], sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class AutoconfCache:
+    """Shared autoconf cache files (ac_cv_*) for the candidates of one project and toolchain.
+
+    The baseline's results seed every candidate. Of those, compiler and
+    system checks are kept, dependency checks (libraries, headers,
+    functions, declarations, pkg-config) are kept unless they are about an
+    option the candidate sets differently than the baseline (its name or one
+    of the names in `related`), and the project's own checks are dropped,
+    since any argument may affect them. A run with exactly the same
+    arguments as an earlier successful one reuses all of that run's results.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        configure_script: str,
+        env: Dict[str, str],
+        constant_options: List[str],
+        related: Union[Dict[str, Iterable[str]], None] = None,
+    ):
+        self.cache_dir = os.path.join(cache_dir, toolchain_key(configure_script, env, constant_options))
+        self.seed_file = os.path.join(self.cache_dir, "seed.cache")
+        self.related: Dict[str, Iterable[str]] = related or {}
+        # How candidates were seeded: "invocation", "seed" or "none".
+        self.hits: Dict[str, int] = {"invocation": 0, "seed": 0, "none": 0}
+
+    @staticmethod
+    def supported(configure_script: str) -> bool:
+        # Generated by autoconf, handwritten scripts (e.g. FFmpeg's) reject the option.
+        try:
+            with open(configure_script, "r", errors="replace") as f:
+                return "--cache-file" in f.read()
+        except OSError:
+            return False
+
+    def invocation_file(self, arguments: List[str]) -> str:
+        digest = hashlib.blake2b(json.dumps(arguments).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.cache")
+
+    def _seed(self) -> Union[Tuple[List[str], List[List[str]]], None]:
+        # (baseline options, entries) of the seed, None if there is no seed yet.
+        try:
+            with open(self.seed_file, "r", errors="replace") as f:
+                text = f.read()
+        except OSError:
+            return None
+        first_line = text.split("\n", 1)[0]
+        if not first_line.startswith(BASELINE_HEADER):
+            return None
+        try:
+            return json.loads(first_line[len(BASELINE_HEADER):]), _parse_cache(text)
+        except json.JSONDecodeError:
+            return None
+
+    def _seeded_entries(self, options: List[str]) -> Union[List[List[str]], None]:
+        seed = self._seed()
+        if seed is None:
+            return None
+        baseline_options, entries = seed
+        changed = set(options).symmetric_difference(baseline_options)
+        if not changed:
+            return entries
+        stems = _changed_names(baseline_options, options, self.related)
+        # A path given to --with-x goes into CPPFLAGS/LDFLAGS, every later dependency check may see it.
+        moves_paths = any(token.startswith("--with") and "/" in token.partition("=")[2] for token in changed)
+        kept = []
+        for entry in entries:
+            name = entry[0]
+            if name.startswith(TOOLCHAIN_CHECK_PREFIXES):
+                kept.append(entry)
+            elif name.startswith(DEPENDENCY_CHECK_PREFIXES) and not moves_paths and not _mentions(name, stems):
+                kept.append(entry)
+        return kept
+
+    def prepare(self, cache_file: str, options: List[str], arguments: List[str]) -> int:
+        """Write the results reusable by a configure run with these options and arguments to cache_file.
+
+        Returns the number of cached results, 0 if there is nothing to reuse yet.
+        """
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+        source = "invocation"
+        try:
+            with open(self.invocation_file(arguments), "r", errors="replace") as f:
+                entries = _parse_cache(f.read())
+        except OSError:
+            source = "seed"
+            entries = self._seeded_entries(options)
+        if not entries:
+            self.hits["none"] += 1
+            return 0
+        self.hits[source] += 1
+        with open(cache_file, "w") as f:
+            for entry in entries:
+                f.write("\n".join(entry[1:]) + "\n")
+        return len(entries)
+
+    @staticmethod
+    def _write(path: str, entries: List[List[str]], header: str = ""):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(header)
+            for entry in entries:
+                if not entry[0].startswith(PER_RUN_PREFIXES):
+                    f.write("\n".join(entry[1:]) + "\n")
+        os.replace(tmp_file, path)
+
+    def save(self, cache_file: str, arguments: List[str], baseline_options: Union[List[str], None] = None):
+        """Share the cache file of a successful configure run, as the seed too if it is the baseline's."""
+        if not os.path.exists(cache_file):
+            return
+        with open(cache_file, "r", errors="replace") as f:
+            entries = _parse_cache(f.read())
+        self._write(self.invocation_file(arguments), entries)
+        if baseline_options is not None:
+            self._write(self.seed_file, entries, BASELINE_HEADER + json.dumps(sorted(set(baseline_options))) + "\n")
+
+
+def _option_key(token: str) -> str:
+    return token.split("=")[0]
+
+
+def _changed_names(previous_options: List[str], options: List[str], related: Dict[str, Iterable[str]]) -> Set[str]:
+    # Stems of the options whose value changed, plus what their checks are named after.
+    stems = {option_stem(token) for token in set(options).symmetric_difference(previous_options)}
+    related_by_stem: Dict[str, Set[str]] = {}
+    for option, names in related.items():
+        related_by_stem.setdefault(option_stem(option), set()).update(name.lower() for name in names)
+    for stem in list(stems):
+        stems |= related_by_stem.get(stem, set())
+    return stems
+
+
+def cmake_cache_variables(cache_file: str) -> Dict[str, str]:
+    """Variable -> type of the entries of a CMakeCache.txt."""
+    variables = {}
+    with open(cache_file, "r", errors="replace") as f:
+        for line in f:
+            match = re.match(r"^([^#/][^:=]*):(\w+)=", line)
+            if match:
+                variables[match.group(1)] = match.group(2)
+    return variables
+
+
+def cmake_reconfigure_args(
+    cache_file: str, previous_options: List[str], options: List[str], related: Dict[str, Iterable[str]]
+) -> List[str]:
+    """-U arguments which turn a build dir configured with previous_options into one for options.
+
+    The options set now are passed with -D anyway, options only set before go
+    back to their defaults, and cached results about a changed option (e.g.
+    its find_package or check results) are dropped, so they are computed again.
+    """
+    keys = {_option_key(token) for token in options}
+    unset = {_option_key(token) for token in previous_options} - keys
+    names = _changed_names(previous_options, options, related)
+    for variable in cmake_cache_variables(cache_file):
+        if variable in keys or variable.startswith("CMAKE_"):
+            continue
+        if _mentions(variable, names):
+            unset.add(variable)
+    return [arg for variable in sorted(unset) for arg in ("-U", variable)]
+
+
+def meson_option_defaults(src_dir: str, env: Dict[str, str]) -> Dict[str, str]:
+    """Option -> default value, as meson introspects the project's source tree."""
+    try:
+        result = subprocess.run(
+            ["meson", "introspect", "--buildoptions", os.path.join(src_dir, "meson.build")],
+            cwd=src_dir,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        options = json.loads(result.stdout) if result.returncode == 0 else []
+    except (OSError, subprocess.TimeoutExpired, json.JSONDecodeError):
+        return {}
+    defaults = {}
+    for option in options:
+        value = option.get("value")
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        elif isinstance(value, list):
+            value = ",".join(str(item) for item in value)
+        defaults[option["name"]] = str(value)
+    return defaults
+
+
+def meson_reconfigure_cmds(
+    build_dir: str, previous_options: List[str], options: List[str], defaults: Dict[str, str]
+) -> Union[List[List[str]], None]:
+    """Commands which switch a configured Meson build dir from previous_options to options.
+
+    `meson configure` applies the delta, options only set before go back to
+    their defaults, and regenerating build.ninja writes compile_commands.json
+    again with the compiler and dependency results kept in meson-private.
+    None if an option can't be reset because its default is unknown.
+    """
+    keys = {_option_key(token) for token in options}
+    delta = [token for token in options if token not in previous_options]
+    for key in sorted({_option_key(token) for token in previous_options} - keys):
+        if key not in defaults:
+            return None
+        delta.append(f"{key}={defaults[key]}")
+    cmds = []
+    if delta:
+        cmds.append(["meson", "configure", build_dir] + [f"-D{token}" for token in delta])
+    cmds.append(["ninja", "-C", build_dir, "build.ninja"])
+    return cmds
@@ -0,0 +1,175 @@
+import json
+import os
+import re
+from enum import Enum, auto
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from option import Option, option_value_tokens
+
+
+class FailureKind(Enum):
+    missing_package = auto()
+    missing_header = auto()
+    missing_library = auto()
+    incompatible_option = auto()
+    toolchain = auto()
+    unknown = auto()
+
+
+class FailureCause:
+    def __init__(self, kind: FailureKind, dependency: Union[str, None] = None, detail: str = ""):
+        self.kind = kind
+        self.dependency = dependency  # Normalized name of the missing dependency, if any.
+        self.detail = detail  # The output line the cause was inferred from.
+
+    def __repr__(self) -> str:
+        return f"{self.kind.name}({self.dependency or ''})"
+
+
+DEP = r"([\w.+/-]+)"  # The dependency, the only capturing group of a pattern.
+# Checked in order, so specific messages are matched before generic ones.
+FAILURE_PATTERNS: List[Tuple[FailureKind, re.Pattern]] = [
+    (FailureKind.toolchain, re.compile(
+        r"C\+?\+? compiler cannot create executables|No CMAKE_\w+_COMPILER could be found"
+        r"|is not able to compile a simple test program|C compiler test failed|compiler .*not found"
+    )),
+    (FailureKind.incompatible_option, re.compile(
+        r"is (?:gpl|nonfree|version3) and --enable-[\w-]+ is not set|Unknown options?:? \"?--?[\w-]+"
+        r"|unrecognized options?:? --?[\w-]+|mutually exclusive|cannot be used (?:with|together)"
+        r"|incompatible with|conflicts with|[Ii]nvalid (?:value|option)"
+    )),
+    (FailureKind.missing_package, re.compile(
+        rf"Package '{DEP}',? (?:required by '[^']*',? )?not found|No package '{DEP}' found"
+        rf"|ERROR: {DEP} not found using pkg-config|Could NOT find {DEP}"
+        rf"|Dependency \"?{DEP}\"? not found|Run-time dependency {DEP} found: NO"
+        rf"|{DEP} was not found in the pkg-config search path|By not providing \"Find{DEP}\.cmake\"",
+    )),
+    (FailureKind.missing_header, re.compile(
+        rf"{DEP}\.h(?:pp)?: No such file or directory|[Hh]eader (?:file )?[`'\"]?{DEP}\.h[`'\"]? (?:not found|is required)"
+        rf"|ERROR: {DEP}\.h not found"
+    )),
+    (FailureKind.missing_library, re.compile(
+        rf"cannot find -l{DEP}|[Ll]ibrary [`'\"]?{DEP}[`'\"]? (?:not found|is required)"
+        rf"|error: (?:[Cc]ould not|[Cc]annot|[Uu]nable to) find (?:the )?(?:library )?{DEP}|ERROR: {DEP} not found"
+    )),
+]
+
+
+def normalize_dependency(name: str) -> str:
+    """libx264 -> x264, ZLIB -> zlib, gtk+-3.0 -> gtk+, openssl/ssl.h -> ssl."""
+    name = os.path.basename(name).lower()
+    name = re.sub(r"\.h(pp)?$", "", name)
+    name = re.sub(r"-\d+(\.\d+)+$", "", name)
+    if name.startswith("lib") and len(name) > 4:
+        name = name[3:]
+    return name
+
+
+# The line a configure failure is reported on: autoconf, CMake, Meson and handwritten scripts (FFmpeg).
+FATAL_LINE_RE = re.compile(
+    r"^(?:configure: error:|CMake Error\b|(?:\S+:\d+:\d+: )?ERROR:|Unknown option)", re.IGNORECASE
+)
+# Where the message of a fatal line ends: the tool's next progress line.
+PROGRESS_LINE_RE = re.compile(r"^(?:-- |checking |Run-time dependency |Message: |Program )")
+FATAL_BLOCK_LINES = 15
+
+
+def classify_failure(output: str) -> FailureCause:
+    """Infer the cause of a configure failure from its output.
+
+    Only the first fatal line and the message printed with it count. Optional
+    checks report missing packages too (-- Could NOT find X, No package 'x'
+    found) without failing configure, so lines before it are never the cause.
+    """
+    lines = output.splitlines()
+    first_fatal = next((i for i, line in enumerate(lines) if FATAL_LINE_RE.match(line)), None)
+    if first_fatal is None:
+        return FailureCause(FailureKind.unknown, None, lines[-1].strip() if lines else "")
+    block = [lines[first_fatal]]
+    for line in lines[first_fatal + 1:first_fatal + FATAL_BLOCK_LINES]:
+        if PROGRESS_LINE_RE.match(line) or FATAL_LINE_RE.match(line):
+            break
+        block.append(line)
+    for kind, pattern in FAILURE_PATTERNS:
+        for line in block:
+            match = pattern.search(line)
+            if not match:
+                continue
+            dependency = next((group for group in match.groups() if group), None)
+            if dependency:
+                dependency = normalize_dependency(dependency)
+            return FailureCause(kind, dependency, line.strip())
+    return FailureCause(FailureKind.unknown, None, block[0].strip())
+
+
+def option_stem(option: str) -> str:
+    """What the option is about: --enable-libx264 -> libx264, -DWITH_SSL=ON -> ssl."""
+    name = option.split("=")[0].lower().lstrip("-")
+    if name.startswith("d") and option.startswith("-D"):
+        name = name[1:]
+    return re.sub(r"^(enable|disable|with|without|use|build|have)[-_]", "", name)
+
+
+def option_depends_on(option: str, dependency: str) -> bool:
+    """Whether the option name refers to the dependency, e.g. --enable-libx264 and x264."""
+    name = option_stem(option)
+    if name == dependency or normalize_dependency(name) == dependency:
+        return True
+    return dependency in re.split(r"[-_]", name)
+
+
+def enabling_values(option: Option) -> Set[str]:
+    """Tokens of the option which turn it on, not merely set it to an off value."""
+    values = set()
+    for token, is_on in option_value_tokens(option):
+        value = token.split("=")[1] if "=" in token else ""
+        if is_on and value.lower() not in Option.off_value_set:
+            values.add(token)
+    return values
+
+
+def dependent_values(dependencies: Iterable[str], options: List[Option]) -> Set[str]:
+    """Option values which turn on an option that needs one of the dependencies."""
+    values = set()
+    dependencies = list(dependencies)
+    for option in options:
+        if any(option_depends_on(option.option, dependency) for dependency in dependencies):
+            values |= enabling_values(option)
+    return values
+
+
+class MissingDependencies:
+    """Dependencies which configure reported missing, shared by all projects of this machine."""
+
+    def __init__(self, dependencies_file: str):
+        self.dependencies_file = dependencies_file
+        self.dependencies: Dict[str, Dict] = {}  # dependency -> {"kind", "detail", "projects"}
+        if os.path.exists(dependencies_file):
+            try:
+                with open(dependencies_file, "r") as f:
+                    self.dependencies = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.dependencies = {}
+
+    def __contains__(self, dependency: str) -> bool:
+        return dependency in self.dependencies
+
+    def __iter__(self):
+        return iter(self.dependencies)
+
+    def add(self, cause: FailureCause, project: str) -> bool:
+        """Record the missing dependency of cause, return True if it wasn't known."""
+        entry = self.dependencies.get(cause.dependency)
+        is_new = entry is None
+        if is_new:
+            entry = {"kind": cause.kind.name, "detail": cause.detail, "projects": []}
+            self.dependencies[cause.dependency] = entry
+        if project not in entry["projects"]:
+            entry["projects"].append(project)
+        self.save()
+        return is_new
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.dependencies_file), exist_ok=True)
+        with open(self.dependencies_file, "w") as f:
+            json.dump(self.dependencies, f, indent=3)
@@ -0,0 +1,176 @@
+import glob
+import os
+import re
+import shlex
+import subprocess
+from typing import Dict, Iterable, List, Set, Union
+
+from build_scripts import Requirement
+
+PROBE_TIMEOUT = 60
+
+
+def _run(cmd: List[str], env: Dict[str, str], stdin: Union[str, None] = None) -> Union[str, None]:
+    """Output of the command, None if the tool isn't there or didn't work."""
+    try:
+        result = subprocess.run(
+            cmd,
+            input=stdin,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=PROBE_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def _pkg_config_modules(env: Dict[str, str]) -> Union[Set[str], None]:
+    output = _run(["pkg-config", "--list-all"], env)
+    if output is None:
+        return None
+    return {line.split()[0] for line in output.splitlines() if line.strip()}
+
+
+def _dpkg_packages(env: Dict[str, str]) -> Union[Set[str], None]:
+    output = _run(["dpkg-query", "-W", "-f", "${Package} ${Status}\n"], env)
+    if output is None:
+        return None
+    packages = set()
+    for line in output.splitlines():
+        fields = line.split()
+        if fields and line.endswith("install ok installed"):
+            packages.add(fields[0].split(":")[0])
+    return packages
+
+
+def _available_headers(headers: List[str], env: Dict[str, str]) -> Union[Set[str], None]:
+    # One preprocessor run answers for all headers.
+    source = "".join(
+        f"#if __has_include(<{header}>)\nHEADER_FOUND_{idx}\n#endif\n" for idx, header in enumerate(headers)
+    )
+    # The compiler and include paths configure would use.
+    cmd = shlex.split(env.get("CC") or "cc") + shlex.split(env.get("CPPFLAGS", "")) + shlex.split(env.get("CFLAGS", ""))
+    output = _run(cmd + ["-E", "-P", "-x", "c", "-"], env, source)
+    if output is None:
+        return None
+    found = {int(idx) for idx in re.findall(r"HEADER_FOUND_(\d+)", output)}
+    return {header for idx, header in enumerate(headers) if idx in found}
+
+
+def _linker_libraries(env: Dict[str, str]) -> Union[Set[str], None]:
+    output = _run(["ldconfig", "-p"], env)
+    if output is None:
+        return None
+    return set(re.findall(r"^\s*lib([\w.+-]+?)\.(?:so|a)\b", output, re.MULTILINE))
+
+
+def _links(library: str, env: Dict[str, str]) -> bool:
+    # ldconfig only knows the runtime linker's paths, the compiler may search more (LDFLAGS, -L).
+    cmd = shlex.split(env.get("CC") or "cc") + shlex.split(env.get("LDFLAGS", ""))
+    return _run(cmd + ["-x", "c", "-", "-o", os.devnull, f"-l{library}"], env, "int main(void) { return 0; }\n") is not None
+
+
+def _cmake_packages(names: List[str], env: Dict[str, str]) -> Union[Set[str], None]:
+    """Packages find_package can find: with a <name>Config.cmake or a Find module of CMake's.
+
+    None if CMake isn't installed.
+    """
+    roots = sorted(glob.glob("/usr/share/cmake*/Modules") + glob.glob("/usr/local/share/cmake*/Modules"))
+    if not roots:
+        return None
+    prefixes = [p for p in env.get("CMAKE_PREFIX_PATH", "").split(os.pathsep) if p] + ["/usr/local", "/usr", "/opt"]
+    found = set()
+    for name in names:
+        if any(os.path.exists(os.path.join(root, f"Find{name}.cmake")) for root in roots):
+            # The module decides at configure time, it can't be told from here.
+            found.add(name)
+            continue
+        configs = (f"{name}Config.cmake", f"{name.lower()}-config.cmake")
+        for prefix in prefixes:
+            patterns = [
+                os.path.join(prefix, lib, "cmake", f"{name}*", config)
+                for lib in ("lib", "lib64", "lib/*", "share")
+                for config in configs
+            ] + [os.path.join(prefix, f"{name}*", "**", config) for config in configs if prefix == "/opt"]
+            if any(glob.glob(pattern, recursive=True) for pattern in patterns):
+                found.add(name)
+                break
+    return found
+
+
+class DependencyProbe:
+    """Which third-party requirements this machine satisfies, one batched query per tool.
+
+    A requirement of a kind whose tools aren't installed is unknown and never
+    reported missing.
+    """
+
+    def __init__(self, requirements: Iterable[Requirement], env: Dict[str, str]):
+        requirements = set(requirements)
+        self.missing: Set[Requirement] = set()
+        self.unknown_kinds: Set[str] = set()
+
+        packages = sorted(name for kind, name in requirements if kind == "pkg")
+        if packages:
+            modules = _pkg_config_modules(env)
+            installed = _dpkg_packages(env)
+            if modules is None and installed is None:
+                self.unknown_kinds.add("pkg")
+            else:
+                for name in packages:
+                    if modules is not None:
+                        available = name in modules
+                    else:
+                        # No pkg-config to ask, a development package of that name will do.
+                        stem = re.sub(r"^lib", "", name)
+                        available = bool({f"lib{stem}-dev", f"{stem}-dev"} & installed)
+                    if not available:
+                        self.missing.add(("pkg", name))
+
+        headers = sorted(name for kind, name in requirements if kind == "header")
+        if headers:
+            found = _available_headers(headers, env)
+            if found is None:
+                self.unknown_kinds.add("header")
+            else:
+                self.missing.update(("header", name) for name in headers if name not in found)
+
+        libraries = sorted(name for kind, name in requirements if kind == "lib")
+        if libraries:
+            found = _linker_libraries(env)
+            if found is None:
+                self.unknown_kinds.add("lib")
+            else:
+                # A library the runtime linker doesn't know is only missing if linking with it fails too.
+                self.missing.update(
+                    ("lib", name) for name in libraries if name not in found and not _links(name, env)
+                )
+
+        cmake_packages = sorted(name for kind, name in requirements if kind == "cmake")
+        if cmake_packages:
+            found = _cmake_packages(cmake_packages, env)
+            if found is None:
+                self.unknown_kinds.add("cmake")
+            else:
+                self.missing.update(("cmake", name) for name in cmake_packages if name not in found)
+
+    def unsatisfied(self, requirements: Iterable[Requirement]) -> List[Requirement]:
+        return [requirement for requirement in requirements if requirement in self.missing]
+
+
+def unsatisfiable_options(
+    option_requirements: Dict[str, List[Requirement]], env: Dict[str, str]
+) -> Dict[str, List[Requirement]]:
+    """Options with a requirement this machine, with env's tools and search paths, is known to miss."""
+    probe = DependencyProbe(
+        (requirement for requirements in option_requirements.values() for requirement in requirements), env
+    )
+    result = {}
+    for option, requirements in option_requirements.items():
+        missing = probe.unsatisfied(requirements)
+        if missing:
+            result[option] = missing
+    return result
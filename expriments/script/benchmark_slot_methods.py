@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Compare the ways of materializing an in-tree build slot on one source tree.
+
+Usage: benchmark_slot_methods.py SRC_DIR [SCRATCH_DIR] [--repeat N]
+
+Every method clones SRC_DIR into fresh slots under SCRATCH_DIR (next to
+SRC_DIR by default, reflinks need the same filesystem) and
+reports the wall time and the disk space the slot added.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from build_slots import SLOT_METHODS, SlotMethodUnsupported  # noqa: E402
+
+
+def disk_usage(path: str) -> int:
+    # Blocks actually allocated; shared reflinked blocks are still counted by du.
+    output = subprocess.run(["du", "-sk", path], capture_output=True, text=True).stdout
+    return int(output.split()[0]) * 1024 if output else 0
+
+
+def free_space(path: str) -> int:
+    return shutil.disk_usage(path).free
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("src_dir")
+    parser.add_argument("scratch_dir", nargs="?")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    src_dir = os.path.abspath(args.src_dir)
+    scratch_root = args.scratch_dir or os.path.dirname(src_dir)
+    scratch = tempfile.mkdtemp(prefix="slot-bench-", dir=scratch_root)
+
+    print(f"source: {src_dir} ({disk_usage(src_dir) / 2**20:.1f} MiB)")
+    print(f"{'method':<10} {'best s':>8} {'mean s':>8} {'added MiB':>10}  note")
+    try:
+        for name, method in SLOT_METHODS.items():
+            times = []
+            added = 0
+            note = ""
+            for i in range(args.repeat):
+                slot = os.path.join(scratch, f"{name}{i}")
+                os.makedirs(slot)
+                free_before = free_space(scratch)
+                start = time.monotonic()
+                try:
+                    method(src_dir, slot)
+                except (SlotMethodUnsupported, OSError, subprocess.CalledProcessError) as e:
+                    note = f"unsupported: {e}"
+                    break
+                times.append(time.monotonic() - start)
+                added = max(added, free_before - free_space(scratch))
+                if name == "worktree":
+                    subprocess.run(["git", "worktree", "remove", "--force", slot], cwd=src_dir, capture_output=True)
+                shutil.rmtree(slot, ignore_errors=True)
+            if times:
+                print(f"{name:<10} {min(times):>8.2f} {sum(times) / len(times):>8.2f} {added / 2**20:>10.1f}  {note}")
+            else:
+                print(f"{name:<10} {'-':>8} {'-':>8} {'-':>10}  {note}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        subprocess.run(["git", "worktree", "prune"], cwd=src_dir, capture_output=True)
+
+
+if __name__ == "__main__":
+    main()
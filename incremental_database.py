@@ -1,9 +1,13 @@
+import hashlib
+import json
 import os
 import re
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Set
 
 from pydantic import BaseModel, RootModel
 
+from compile_database import iter_entries
+
 class FileLevelCache(RootModel):
     root: Dict[str, List[str]] = {}
 
@@ -53,3 +57,180 @@ class FileLevelCache(RootModel):
                     dis += 1
         return dis
     
+
+
+class ConfigIndex:
+    """Append-only on-disk index of every configuration prepared for one project commit.
+
+    Entries are keyed by `option.config_fingerprint`, one JSON object per line,
+    so concurrent runs and workers can append without rewriting the file.
+    """
+
+    def __init__(self, index_file: str):
+        self.index_file = index_file
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(index_file):
+            with open(index_file, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Partially written line from an interrupted run.
+                        continue
+                    self.entries[entry["fingerprint"]] = entry
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return fingerprint in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, fingerprint: str) -> Optional[Dict]:
+        return self.entries.get(fingerprint)
+
+    def fingerprints(self, exclude_workspace: Optional[str] = None) -> Set[str]:
+        return {
+            fp
+            for fp, entry in self.entries.items()
+            if entry.get("workspace") != exclude_workspace
+        }
+
+    def record(self, fingerprint: str, options: List[str], workspace: str, tag: str, status: str):
+        entry = {
+            "fingerprint": fingerprint,
+            "options": sorted(set(options)),
+            "workspace": workspace,
+            "tag": tag,
+            "status": status,
+        }
+        self.entries[fingerprint] = entry
+        os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+        with open(self.index_file, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+# Configure's bookkeeping, which records how it was invoked rather than what it generated.
+FINGERPRINT_SKIP_DIRS = {".git", ".cache", "CMakeFiles", "meson-private", "meson-logs", "meson-info"}
+FINGERPRINT_SKIP_FILES = {"config.log", "config.status", "CMakeCache.txt", "compile_commands.json"}
+# Build outputs left by earlier builds in a reused build directory.
+FINGERPRINT_SKIP_EXTS = {".o", ".obj", ".a", ".so", ".lo", ".la", ".d", ".dylib", ".pyc", ".log"}
+BUILD_DIR_PLACEHOLDER = "__BUILD_DIR__"
+
+
+def _cmake_cache_entries(cache_file: str, ignore_keys: Set[str]) -> List[str]:
+    entries = []
+    with open(cache_file, "r", errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            match = re.match(r"^([^#/][^:=]*):(\w+)=(.*)$", line)
+            if not match:
+                continue
+            key, kind, _ = match.groups()
+            # Option values themselves are what differs, only what configure derived from them counts.
+            if kind in ("INTERNAL", "STATIC", "UNINITIALIZED") or key in ignore_keys:
+                continue
+            if key == "CMAKE_CACHEFILE_DIR" or key.endswith(("_BINARY_DIR", "_SOURCE_DIR")):
+                continue
+            entries.append(line)
+    return sorted(entries)
+
+
+def _compile_database_entries(cdb_file: str) -> List[str]:
+    try:
+        return sorted(json.dumps(item, sort_keys=True) for item in iter_entries(cdb_file))
+    except (OSError, ValueError):
+        return ["<invalid>"]
+
+
+def generated_files(build_dir: str, src_dir: str) -> List[str]:
+    """Sorted paths, relative to build_dir, of the files configure generated there.
+
+    That is every file without a counterpart in src_dir (in-tree builds are a
+    copy of the sources), except configure's bookkeeping and build outputs.
+    """
+    generated = []
+    for root, dirs, files in os.walk(build_dir):
+        dirs[:] = sorted(d for d in dirs if d not in FINGERPRINT_SKIP_DIRS)
+        rel_root = os.path.relpath(root, build_dir)
+        for name in files:
+            if name in FINGERPRINT_SKIP_FILES or os.path.splitext(name)[1] in FINGERPRINT_SKIP_EXTS:
+                continue
+            rel = os.path.normpath(os.path.join(rel_root, name))
+            if build_dir != src_dir and os.path.exists(os.path.join(src_dir, rel)):
+                continue
+            generated.append(rel)
+    return sorted(generated)
+
+
+def configure_outputs(build_dir: str) -> List[str]:
+    """Paths, relative to build_dir, of the files configure says it generated.
+
+    config.status and CMake's configure_file leave a file alone when its
+    content didn't change, so its modification time doesn't tell whether
+    this configure generated it. Their lists do: config.status's outputs
+    and, for CMake's Makefile generator, CMAKE_MAKEFILE_PRODUCTS.
+    """
+    outputs = []
+    try:
+        with open(os.path.join(build_dir, "config.status"), "r", errors="replace") as f:
+            text = f.read()
+        for match in re.finditer(r'^config_(?:files|headers|links)="([^"]*)"', text, re.MULTILINE):
+            # Entries are "output[:input...]".
+            outputs.extend(entry.split(":")[0] for entry in match.group(1).split())
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(build_dir, "CMakeFiles", "Makefile.cmake"), "r", errors="replace") as f:
+            text = f.read()
+        match = re.search(r"^set\(CMAKE_MAKEFILE_PRODUCTS\s(.*?)\)", text, re.MULTILINE | re.DOTALL)
+        if match:
+            outputs.extend(re.findall(r'"([^"]*)"', match.group(1)))
+    except OSError:
+        pass
+    return sorted({os.path.normpath(os.path.relpath(os.path.join(build_dir, path), build_dir)) for path in outputs})
+
+
+def build_fingerprint(build_dir: str, src_dir: str, since: float, ignore_keys: Iterable[str] = ()) -> str:
+    """Content fingerprint of what the configure run started at `since` generated in build_dir.
+
+    Covers the cache variables configure derived (CMake), the compile
+    database when configure writes one and the generated files (those
+    without a counterpart in src_dir, in-tree builds are a copy of the
+    sources) which were written since `since` or which configure lists.
+    Older files are left over from earlier configurations of a reused build
+    directory and are not part of this build. The build directory path is
+    normalized, so configurations prepared in different build directories
+    compare equal when they build the same.
+    """
+    build_dir = os.path.normpath(build_dir)
+    src_dir = os.path.normpath(src_dir)
+    ignore_keys = set(ignore_keys)
+    digest = hashlib.blake2b(digest_size=16)
+
+    def update(name: str, data: bytes):
+        digest.update(name.encode())
+        digest.update(b"\0")
+        digest.update(data.replace(build_dir.encode(), BUILD_DIR_PLACEHOLDER.encode()))
+        digest.update(b"\0")
+
+    cache_file = os.path.join(build_dir, "CMakeCache.txt")
+    if os.path.exists(cache_file):
+        update("CMakeCache.txt", "\n".join(_cmake_cache_entries(cache_file, ignore_keys)).encode())
+    cdb_file = os.path.join(build_dir, "compile_commands.json")
+    if os.path.exists(cdb_file):
+        update("compile_commands.json", "\n".join(_compile_database_entries(cdb_file)).encode())
+
+    declared = set(configure_outputs(build_dir))
+    for rel in generated_files(build_dir, src_dir):
+        path = os.path.join(build_dir, rel)
+        try:
+            if rel not in declared and os.stat(path).st_mtime < since:
+                continue
+            with open(path, "rb") as f:
+                update(rel, f.read())
+        except OSError:
+            continue
+    return digest.hexdigest()
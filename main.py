@@ -5,6 +5,7 @@ import sys
 
 from git import Repo
 
+from build_slots import SLOT_METHODS
 from project import *
 from project_info import ProjectInfo
 from utils import *
@@ -243,6 +244,104 @@ class MCArgumentParser:
             default=200,
             help="Maximum number of configurations to generate (for adaptive, twise, pairwise-explicit strategies).",
         )
+        self.parser.add_argument(
+            "--ov-scheduler",
+            type=str,
+            dest="ov_scheduler",
+            choices=["uniform", "ucb", "thompson"],
+            default="ucb",
+            help="How the random-space strategy picks the next option value: uniformly, or by a UCB/Thompson bandit rewarded by distance per second of prepare time.",
+        )
+        self.parser.add_argument(
+            "--noop-contexts",
+            type=int,
+            dest="noop_contexts",
+            default=2,
+            help="Prune an option once toggling it changed no file hash in this many contexts (0 disables pruning).",
+        )
+        self.parser.add_argument(
+            "--no-static-prune",
+            action="store_true",
+            dest="no_static_prune",
+            help="Keep options which the build scripts never let reach a compile flag, definition, generated header or source list.",
+        )
+        self.parser.add_argument(
+            "--ddmin-probes",
+            type=int,
+            dest="ddmin_probes",
+            default=16,
+            help="Configure-only probes used to isolate the option values behind a prepare failure (0 disables isolation).",
+        )
+        self.parser.add_argument(
+            "--no-dependency-check",
+            action="store_true",
+            dest="no_dependency_check",
+            help="Don't probe the packages, headers and libraries options require before sampling.",
+        )
+        self.parser.add_argument(
+            "--no-build-dedup",
+            action="store_true",
+            dest="no_build_dedup",
+            help="Prepare every configuration, even when configure generated the same build as an earlier one.",
+        )
+        self.parser.add_argument(
+            "--no-configure-cache",
+            action="store_true",
+            dest="no_configure_cache",
+            help="Run every autoconf configure from scratch instead of reusing the baseline's check results which the candidate's options don't affect.",
+        )
+        self.parser.add_argument(
+            "--incremental-reconfigure",
+            action="store_true",
+            dest="incremental_reconfigure",
+            help="Reconfigure CMake and Meson build dirs in place with the option delta instead of clearing their cached state.",
+        )
+        self.parser.add_argument(
+            "--slot-method",
+            type=str,
+            dest="slot_method",
+            choices=["auto"] + list(SLOT_METHODS),
+            default="auto",
+            help="How in-tree build slots get the source tree: auto tries reflink, worktree and rsync in order.",
+        )
+        self.parser.add_argument(
+            "--dry-run-jobs",
+            type=int,
+            dest="dry_run_jobs",
+            default=0,
+            help="Parallel make -n runs while extracting compile commands, and parallel dry-run commands (0 uses one per core).",
+        )
+        self.parser.add_argument(
+            "--serial-make-n",
+            action="store_true",
+            dest="serial_make_n",
+            help="Extract compile commands with a single top-level make -n, without running sub-makes in parallel or caching them.",
+        )
+        self.parser.add_argument(
+            "--no-prepare-store",
+            action="store_true",
+            dest="no_prepare_store",
+            help="Prepare every configuration in this workspace instead of reusing identical ones prepared by any workspace of the project.",
+        )
+        self.parser.add_argument(
+            "--no-early-abort",
+            action="store_true",
+            dest="no_early_abort",
+            help="Let configure and build run to completion after a fatal error line instead of killing them.",
+        )
+        self.parser.add_argument(
+            "--skip-evaluated",
+            action="store_true",
+            dest="skip_evaluated",
+            help="Skip configurations already prepared by other workspaces of the same project commit.",
+        )
+        self.parser.add_argument(
+            "--sampling-jobs",
+            type=int,
+            dest="sampling_jobs",
+            default=1,
+            help="Worker processes used to generate sampled configurations (the result is identical for any value).",
+        )
 
     def parse_args(self, args):
         return self.parser.parse_args(args)
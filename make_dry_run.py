@@ -0,0 +1,658 @@
+import hashlib
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Union
+
+from compile_database import CompileDatabaseWriter, is_source, split_sources
+from incremental_database import BUILD_DIR_PLACEHOLDER
+from logger import logger
+
+# make[2]: Entering directory '/path', older makes quote with `path'.
+DIRECTORY_RE = re.compile(r"^make(?:\[\d+\])?: (Entering|Leaving) directory [`'](.*)'$")
+COMPILERS = r"(?:gcc|g\+\+|cc|c\+\+|clang|clang\+\+|icc|icpc|nvcc)"
+# Cross and versioned compilers too, e.g. x86_64-linux-gnu-gcc-12, clang-17.
+COMPILER_RE = re.compile(rf"^(?:[\w.+]+-)*{COMPILERS}(?:-[\d.]+)?$")
+# Cheap test before tokenizing a line.
+COMPILER_HINT_RE = re.compile(rf"(?:^|[\s/-]){COMPILERS}(?:-[\d.]+)?\s")
+WRAPPERS = {"ccache", "sccache", "distcc", "icecc", "libtool", "sh", "bash"}
+SEPARATORS = {"&&", "||", ";", "|", "&", "(", ")"}
+REDIRECTIONS = {">", ">>", "<", ">&", "&>"}
+# Preprocessing and dependency generation only, no object is compiled.
+NON_COMPILE_FLAGS = {"-E", "-M", "-MM"}
+MAKEFILE_NAMES = ("GNUmakefile", "makefile", "Makefile")
+INCLUDE_RE = re.compile(r"^\s*-?s?include\s+(.+)$", re.MULTILINE)
+# The makefiles make read, in the database make -p prints.
+MAKEFILE_LIST_RE = re.compile(r"^MAKEFILE_LIST :?= (.*)$")
+# What the generator commands of the makes run in a directory wrote, learned across runs.
+GENERATED_OUTPUTS_FILE = "generated_outputs.json"
+SUBMAKE_MARKER = "@@SUBMAKE@@ "
+# Stands in for $(MAKE) during make -n: reports the sub-make instead of running it.
+SUBMAKE_SCRIPT = f"""#!{sys.executable}
+import json, os, sys
+print({SUBMAKE_MARKER!r} + json.dumps([os.getcwd(), sys.argv[1:], dict(os.environ)]), flush=True)
+"""
+# Environment variables which differ between otherwise identical sub-makes.
+VOLATILE_ENV = {"PWD", "OLDPWD", "_", "SHLVL"}
+# Commands of make -n which aren't run by the dry run, as one pattern.
+DRY_RUN_SKIP_RE = re.compile(
+    "|".join(
+        f"(?:{pattern})"
+        for pattern in (
+            r"^\s*((/[\w-]+)+/)?(gcc|clang|cc|g\+\+|clang\+\+|nvcc|ld|ar|ccache)\s",  # Compile, link.
+            r"\smake\s",  # Make
+            r"\smsgfmt\s",  # Don't parse .po
+            r"\s-shared\b",  # Shared library.
+            r"\s-arch\b",  # Architecture argument.
+            r"^\s*#",  # Comment(e.g. # This is a comment).
+            r"\b(make|info|warning)\b",  # Ignore Makefile function(e.g. $(info ...))
+            r"^\s*\$\(",  # Ignore variable expansion(e.g. $(RM) file.o)
+        )
+    ),
+    re.IGNORECASE,
+)
+# Shell the file analysis can't see through, such commands run alone.
+OPAQUE_SHELL_RE = re.compile(r"\$\(|`|[*?]|\b(?:for|while|until|if|case|eval|source)\b|(?:^|\s)\.\s")
+# Commands whose operands (all but the first for cp, mv, ln and install) are written.
+WRITE_ALL_OPERANDS = {"touch", "rm", "mkdir", "rmdir", "chmod"}
+WRITE_LAST_OPERAND = {"cp", "mv", "ln", "install"}
+# Commands which write nothing but their redirections, unless an option makes them edit in place.
+READ_ONLY_PROGRAMS = {
+    "cat", "echo", "printf", "sed", "grep", "egrep", "fgrep", "tr", "sort", "uniq", "head", "tail",
+    "cut", "wc", "cmp", "diff", "test", "[", "true", "false", ":", "basename", "dirname", "expr",
+}
+# Options which make a command write files its operands don't show: sed -i, cp -t dir.
+HIDDEN_WRITE_OPTIONS_RE = {
+    "sed": re.compile(r"^(?:-[a-zA-Z]*i|--in-place\b)"),
+    **{program: re.compile(r"^(?:-[a-zA-Z]*t|--target-directory\b)") for program in WRITE_LAST_OPERAND},
+}
+
+
+def _is_prefix(token: str) -> bool:
+    # What may come before the compiler: wrappers, libtool and its options, VAR=value.
+    return (
+        os.path.basename(token) in WRAPPERS
+        or token.startswith("--")
+        or re.match(r"^\w+=", token) is not None
+    )
+
+
+def _segments(command: str, redirects: Union[List[Tuple[str, str]], None] = None) -> Union[List[List[str]], None]:
+    # The simple commands of a shell line, None if it can't be tokenized.
+    # Redirections are left out, (operator, target) pairs go to redirects if given.
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        tokens = list(lexer)
+    except ValueError:
+        return None
+    segments: List[List[str]] = [[]]
+    redirected = ""
+    for token in tokens:
+        if redirected:
+            if redirects is not None:
+                redirects.append((redirected, token))
+            redirected = ""
+        elif token in REDIRECTIONS:
+            redirected = token
+        elif token in SEPARATORS:
+            segments.append([])
+        else:
+            segments[-1].append(token)
+    return [segment for segment in segments if segment]
+
+
+def compiler_arguments(tokens: List[str]) -> Union[List[str], None]:
+    """The compiler invocation in a simple command, without wrappers, None if it compiles nothing."""
+    for idx, token in enumerate(tokens):
+        if COMPILER_RE.match(os.path.basename(token)):
+            arguments = tokens[idx:]
+            if NON_COMPILE_FLAGS.isdisjoint(arguments) and any(is_source(arg) for arg in arguments[1:]):
+                return arguments
+            return None
+        if not _is_prefix(token):
+            return None
+    return None
+
+
+class MakeDryRunParser:
+    """Read `make -n` output as it is produced and turn it into compile_commands.json entries.
+
+    Recursive makes are followed through their Entering/Leaving directory
+    messages and `cd dir && ...` commands, continuation lines are joined.
+    """
+
+    def __init__(self, build_dir: str):
+        self.dir_stack = [build_dir]
+        self.entries = 0
+        self.split = 0
+
+    def commands(self, lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """(directory, command) of every command line in the output."""
+        pending: List[str] = []
+        for line in lines:
+            line = line.strip()
+            if not pending:
+                if not line:
+                    continue
+                match = DIRECTORY_RE.match(line)
+                if match:
+                    self._change_directory(match.group(1), match.group(2))
+                    continue
+            if line.endswith("\\"):
+                pending.append(line[:-1].strip())
+                continue
+            pending.append(line)
+            yield self.dir_stack[-1], " ".join(pending)
+            pending = []
+        if pending:
+            yield self.dir_stack[-1], " ".join(pending)
+
+    def _change_directory(self, action: str, directory: str):
+        if action == "Entering":
+            self.dir_stack.append(directory)
+        elif directory in self.dir_stack[1:]:
+            while self.dir_stack.pop() != directory:
+                pass
+
+    def compile_entries(self, directory: str, command: str) -> List[Dict]:
+        """One entry per source file compiled by the command line."""
+        if not COMPILER_HINT_RE.search(command):
+            return []
+        segments = _segments(command)
+        if segments is None:
+            return []
+        entries = []
+        for tokens in segments:
+            if tokens[0] == "cd" and len(tokens) == 2:
+                directory = os.path.normpath(os.path.join(directory, tokens[1]))
+                continue
+            arguments = compiler_arguments(tokens)
+            if arguments is None:
+                continue
+            source = next(arg for arg in arguments[1:] if is_source(arg))
+            entry = {
+                "directory": directory,
+                "file": os.path.abspath(os.path.join(directory, source)),
+                "command": shlex.join(arguments),
+            }
+            items = split_sources(entry)
+            self.split += len(items) - 1
+            entries.extend(items)
+        return entries
+
+    def parse(
+        self,
+        lines: Iterable[str],
+        writer: CompileDatabaseWriter,
+        other_commands: Union[List[Tuple[str, str]], None] = None,
+    ):
+        """Write the compile entries of the output, collect the other commands if asked."""
+        for directory, command in self.commands(lines):
+            entries = self.compile_entries(directory, command)
+            if entries:
+                writer.write_all(entries)
+                self.entries += len(entries)
+            elif other_commands is not None:
+                other_commands.append((directory, command))
+
+
+# A make invocation: (directory, arguments, environment).
+SubMake = Tuple[str, List[str], Dict[str, str]]
+
+
+def _makefiles(cwd: str, args: List[str]) -> Tuple[str, List[str]]:
+    # The directory make runs in and the makefiles it reads, after -C and -f.
+    directory = cwd
+    makefiles = []
+    idx = 0
+    while idx < len(args):
+        arg = args[idx]
+        for flag in ("-C", "--directory=", "-f", "--file=", "--makefile="):
+            if arg.startswith(flag):
+                value = arg[len(flag):]
+                if not value and not flag.endswith("=") and idx + 1 < len(args):
+                    idx += 1
+                    value = args[idx]
+                if flag in ("-C", "--directory="):
+                    directory = os.path.join(directory, value)
+                else:
+                    makefiles.append(value)
+                break
+        idx += 1
+    if not makefiles:
+        makefiles = [name for name in MAKEFILE_NAMES if os.path.exists(os.path.join(directory, name))][:1]
+    return directory, [os.path.join(directory, makefile) for makefile in makefiles]
+
+
+def makefile_digest(
+    directory: str, makefiles: List[str], build_dir: str, unresolved: Union[List[str], None] = None
+) -> str:
+    """Hash of the makefiles and the fragments they include, with build_dir paths normalized.
+
+    Included names with variables can't be resolved here, they are added to
+    unresolved if given.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    stack = list(reversed(makefiles))
+    seen: Set[str] = set()
+    while stack:
+        path = os.path.normpath(stack.pop())
+        if path in seen:
+            continue
+        seen.add(path)
+        digest.update(path.replace(build_dir, BUILD_DIR_PLACEHOLDER).encode())
+        try:
+            with open(path, "r", errors="replace") as f:
+                text = f.read()
+        except OSError:
+            continue
+        digest.update(text.replace(build_dir, BUILD_DIR_PLACEHOLDER).encode())
+        includes = []
+        for match in INCLUDE_RE.finditer(text):
+            for name in match.group(1).split():
+                if "$" not in name:
+                    includes.append(os.path.join(directory, name))
+                elif unresolved is not None:
+                    unresolved.append(name)
+        stack.extend(reversed(includes))
+    return digest.hexdigest()
+
+
+class MakeDryRun:
+    """compile_commands.json and the other commands of `make -n` for a build dir.
+
+    $(MAKE) is replaced by a script which reports each sub-make instead of
+    running it, so the sub-makes of a recursive build run in parallel. The
+    output of every make is cached in cache_dir, keyed by its directory,
+    arguments, environment and the hash of its makefiles (those included
+    through variables as make resolved them), so candidates only run the
+    makes whose Makefiles changed. Outputs are stitched back in the order a
+    serial make would have printed them.
+
+    make -n leaves out generator commands whose outputs are up to date, so
+    the output of a make is not cached while outputs an earlier run of its
+    directory's generator commands wrote exist and it didn't list them.
+    """
+
+    def __init__(self, build_dir: str, env: Dict[str, str], cache_dir: str, jobs: int = 0, serial: bool = False):
+        self.build_dir = build_dir
+        self.env = env
+        self.cache_dir = cache_dir
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.serial = serial
+        self.entries = 0
+        self.split = 0
+        self.runs = 0
+        self.cached = 0
+        self.uncached: Dict[str, List[str]] = {}  # Record file -> its lines, for outputs not to be cached.
+        self._record_files: Dict[str, str] = {}
+        self._generated_outputs: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def extract(self, cdb_file: str, other_commands: Union[List[Tuple[str, str]], None] = None):
+        if self.serial:
+            self._extract_serial(cdb_file, other_commands)
+            return
+        top = (self.build_dir, ["-n", "-i", f"MAKE={self._submake_script()}"], self.env)
+        self._generated_outputs = self._load_generated_outputs()
+        self._run_all(top)
+        self._save_generated_outputs()
+        with CompileDatabaseWriter(cdb_file) as writer:
+            self._merge(top, writer, other_commands, set())
+
+    def _extract_serial(self, cdb_file: str, other_commands: Union[List[Tuple[str, str]], None]):
+        parser = MakeDryRunParser(self.build_dir)
+        with subprocess.Popen(
+            ["make", "-n", "-i"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            errors="replace",
+            cwd=self.build_dir,
+            env=self.env,
+        ) as process, CompileDatabaseWriter(cdb_file) as writer:
+            parser.parse(process.stdout, writer, other_commands)
+        self.runs = 1
+        self.entries = parser.entries
+        self.split = parser.split
+
+    def _submake_script(self) -> str:
+        # Named make, so its command lines look like (and are skipped as) sub-makes.
+        script = os.path.join(self.cache_dir, "bin", "make")
+        if not os.path.exists(script):
+            os.makedirs(os.path.dirname(script), exist_ok=True)
+            tmp_file = f"{script}.{os.getpid()}.tmp"
+            with open(tmp_file, "w") as f:
+                f.write(SUBMAKE_SCRIPT)
+            os.chmod(tmp_file, 0o755)
+            os.replace(tmp_file, script)
+        return script
+
+    def _normalize(self, text: str) -> str:
+        return text.replace(self.build_dir, BUILD_DIR_PLACEHOLDER)
+
+    def _record_file(self, submake: SubMake) -> str:
+        cwd, args, env = submake
+        env = {name: value for name, value in env.items() if name not in VOLATILE_ENV}
+        material = json.dumps([cwd, args, env], sort_keys=True)
+        if material in self._record_files:
+            return self._record_files[material]
+        directory, makefiles = _makefiles(cwd, args)
+        key = hashlib.blake2b(self._normalize(material).encode(), digest_size=16)
+        unresolved: List[str] = []
+        digest = makefile_digest(directory, makefiles, self.build_dir, unresolved)
+        if unresolved:
+            digest = makefile_digest(directory, makefiles + self._makefile_list(submake, directory), self.build_dir)
+        key.update(digest.encode())
+        record_file = os.path.join(self.cache_dir, f"{key.hexdigest()}.jsonl")
+        self._record_files[material] = record_file
+        return record_file
+
+    @staticmethod
+    def _makefile_list(submake: SubMake, directory: str) -> List[str]:
+        # Every makefile the make reads, the included ones resolved by make itself (make -pq).
+        cwd, args, env = submake
+        names: List[str] = []
+        with subprocess.Popen(
+            ["make"] + args + ["-p", "-q"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            errors="replace",
+            cwd=cwd,
+            env=env,
+        ) as process:
+            for line in process.stdout:
+                match = MAKEFILE_LIST_RE.match(line.rstrip("\n"))
+                if match:
+                    names = match.group(1).split()
+        return [os.path.join(directory, name) for name in names]
+
+    def _records(self, record_file: str) -> Iterator[List]:
+        if record_file in self.uncached:
+            for line in self.uncached[record_file]:
+                yield json.loads(line.replace(BUILD_DIR_PLACEHOLDER, self.build_dir))
+            return
+        with open(record_file, "r") as f:
+            for line in f:
+                yield json.loads(line.replace(BUILD_DIR_PLACEHOLDER, self.build_dir))
+
+    def _load_generated_outputs(self) -> Dict[str, Set[str]]:
+        try:
+            with open(os.path.join(self.cache_dir, GENERATED_OUTPUTS_FILE), "r") as f:
+                return {directory: set(paths) for directory, paths in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save_generated_outputs(self):
+        # Merged with what other processes learned meanwhile.
+        outputs = self._load_generated_outputs()
+        for directory, paths in self._generated_outputs.items():
+            outputs.setdefault(directory, set()).update(paths)
+        output_file = os.path.join(self.cache_dir, GENERATED_OUTPUTS_FILE)
+        tmp_file = f"{output_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({directory: sorted(paths) for directory, paths in outputs.items()}, f)
+        os.replace(tmp_file, output_file)
+
+    def _run(self, submake: SubMake, record_file: str) -> List[SubMake]:
+        """Run one make -n, record its commands and the sub-makes it started, in order."""
+        cwd, args, env = submake
+        parser = MakeDryRunParser(cwd)
+        submakes = []
+        lines = []
+        written: Set[str] = set()  # By the generator commands listed.
+        with subprocess.Popen(
+            ["make"] + args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            errors="replace",
+            cwd=cwd,
+            env=env,
+        ) as process:
+            for directory, command in parser.commands(process.stdout):
+                if command.startswith(SUBMAKE_MARKER):
+                    child = json.loads(command[len(SUBMAKE_MARKER):])
+                    submakes.append(child)
+                    record = ["sub"] + child
+                else:
+                    record = ["cmd", directory, command, parser.compile_entries(directory, command)]
+                    if not record[3] and not DRY_RUN_SKIP_RE.search(command):
+                        files = command_files(directory, command)
+                        if files is not None:
+                            written.update(self._normalize(path) for path in files[1])
+                lines.append(self._normalize(json.dumps(record)) + "\n")
+        directory_key = self._normalize(os.path.normpath(cwd))
+        with self._lock:
+            known = self._generated_outputs.setdefault(directory_key, set())
+            # Up to date outputs make -n didn't list the commands of.
+            skipped = any(
+                os.path.exists(path.replace(BUILD_DIR_PLACEHOLDER, self.build_dir)) for path in known - written
+            )
+            known.update(written)
+            if skipped:
+                self.uncached[record_file] = lines
+                return submakes
+        tmp_file = f"{record_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, "w") as f:
+            f.writelines(lines)
+        os.replace(tmp_file, record_file)
+        return submakes
+
+    def _run_all(self, top: SubMake):
+        # Run every make whose output isn't cached, a sub-make as soon as its parent reported it.
+        os.makedirs(self.cache_dir, exist_ok=True)
+        seen: Set[str] = set()
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            running = set()
+
+            def schedule(submake: SubMake):
+                record_file = self._record_file(submake)
+                if record_file in seen:
+                    return
+                seen.add(record_file)
+                if os.path.exists(record_file):
+                    self.cached += 1
+                    for record in self._records(record_file):
+                        if record[0] == "sub":
+                            schedule(tuple(record[1:]))
+                else:
+                    self.runs += 1
+                    running.add(pool.submit(self._run, submake, record_file))
+
+            schedule(top)
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.remove(future)
+                    for child in future.result():
+                        schedule(tuple(child))
+
+    def _merge(
+        self,
+        submake: SubMake,
+        writer: CompileDatabaseWriter,
+        other_commands: Union[List[Tuple[str, str]], None],
+        stack: Set[str],
+    ):
+        # A make's commands with those of its sub-makes in place of the line which started them.
+        record_file = self._record_file(submake)
+        if record_file in stack or (record_file not in self.uncached and not os.path.exists(record_file)):
+            return
+        stack.add(record_file)
+        for record in self._records(record_file):
+            if record[0] == "sub":
+                self._merge(tuple(record[1:]), writer, other_commands, stack)
+            elif record[3]:
+                writer.write_all(record[3])
+                self.entries += len(record[3])
+            elif other_commands is not None:
+                other_commands.append((record[1], record[2]))
+        stack.remove(record_file)
+
+
+def command_files(directory: str, command: str) -> Union[Tuple[Set[str], Set[str]], None]:
+    """(read, written) paths of a shell command, None if they can't be told from its text.
+
+    Every operand counts as read, outputs are what the command redirects to,
+    -o/--output values, the destinations of cp/mv/ln/install, the operands
+    of touch/rm/mkdir and the default outputs of bison, yacc, flex and lex.
+    Any other program (scripts included) or an in-place option makes the
+    writes unknown.
+    """
+    if OPAQUE_SHELL_RE.search(command):
+        return None
+    redirects: List[Tuple[str, str]] = []
+    segments = _segments(command, redirects)
+    if segments is None:
+        return None
+    read: Set[str] = set()
+    written: Set[str] = set()
+
+    def path(name: str) -> str:
+        return os.path.normpath(os.path.join(directory, name))
+
+    if redirects and any(tokens[0] == "cd" for tokens in segments):
+        return None  # Which directory a redirection is relative to isn't tracked.
+    for op, target in redirects:
+        (read if op == "<" else written).add(path(target))
+    for tokens in segments:
+        while tokens and re.match(r"^\w+=", tokens[0]):
+            tokens = tokens[1:]
+        if not tokens:
+            continue
+        program = os.path.basename(tokens[0])
+        if program == "cd":
+            if len(tokens) != 2:
+                return None
+            directory = path(tokens[1])
+            continue
+        if program not in READ_ONLY_PROGRAMS | WRITE_ALL_OPERANDS | WRITE_LAST_OPERAND | {"bison", "yacc", "flex", "lex"}:
+            return None
+        hidden_write = HIDDEN_WRITE_OPTIONS_RE.get(program)
+        if hidden_write is not None and any(hidden_write.match(token) for token in tokens[1:]):
+            return None
+        if program == "sed" and any(re.search(r"(?:^|[/;{}\s])w\s", token) for token in tokens[1:]):
+            return None  # sed's w command and s///w flag write a file.
+        operands = []
+        idx = 1
+        while idx < len(tokens):
+            token = tokens[idx]
+            if token in ("-o", "--output", "--defines", "--header") and idx + 1 < len(tokens):
+                idx += 1
+                written.add(path(tokens[idx]))
+            elif token.startswith(("--output=", "--defines=", "--header=")):
+                written.add(path(token.split("=", 1)[1]))
+            elif token.startswith("-"):
+                if "=" in token:
+                    read.add(path(token.split("=", 1)[1]))
+                elif token.startswith(("-I", "-L")) and len(token) > 2:
+                    read.add(path(token[2:]))
+            else:
+                operands.append(path(token))
+            idx += 1
+        read.update(operands)
+        if program in WRITE_ALL_OPERANDS:
+            written.update(operands)
+        elif program == "install" and "-d" in tokens:
+            written.update(operands)
+        elif program in WRITE_LAST_OPERAND and len(operands) >= 2:
+            written.add(operands[-1])
+            if program == "mv":
+                written.update(operands[:-1])
+        elif program in ("bison", "yacc", "flex", "lex") and operands:
+            stem = os.path.splitext(operands[-1])[0]
+            if program == "bison":
+                for base in (stem, path(os.path.basename(stem))):
+                    written.update({f"{base}.tab.c", f"{base}.tab.h", f"{base}.output"})
+            elif program == "yacc":
+                written.update(path(name) for name in ("y.tab.c", "y.tab.h", "y.output"))
+            else:
+                written.add(path("lex.yy.c"))
+    return read, written
+
+
+def _overlap(lhs: Set[str], rhs: Set[str]) -> bool:
+    # Same path, or one inside the other: writing a file changes what reading its directories
+    # (e.g. -I dir) sees, removing a directory what reading its files sees.
+    for left in lhs:
+        for right in rhs:
+            if left == right or left.startswith(right + os.sep) or right.startswith(left + os.sep):
+                return True
+    return False
+
+
+def dry_run_dependencies(commands: List[Tuple[str, str]]) -> List[Set[int]]:
+    """For every command, the earlier commands it has to wait for.
+
+    A command waits for earlier ones writing what it reads or writes and
+    reading what it writes. Commands whose files can't be told wait for
+    everything before them and everything after waits for them.
+    """
+    files = [command_files(directory, command) for directory, command in commands]
+    dependencies: List[Set[int]] = []
+    barrier = -1
+    for idx, current in enumerate(files):
+        if current is None:
+            dependencies.append(set(range(max(barrier, 0), idx)))
+            barrier = idx
+            continue
+        read, written = current
+        deps = {barrier} if barrier >= 0 else set()
+        for prev in range(barrier + 1, idx):
+            prev_read, prev_written = files[prev]
+            if _overlap(prev_written, read | written) or _overlap(written, prev_read):
+                deps.add(prev)
+        dependencies.append(deps)
+    return dependencies
+
+
+def run_dry_run_commands(commands: List[Tuple[str, str]], env: Dict[str, str], jobs: int = 0) -> int:
+    """Run the (directory, command) pairs make -n printed, except compiling and linking.
+
+    They generate sources and headers (bison, flex, scripts). Independent
+    ones run in parallel, each once those it depends on are done, failed or
+    not. Returns the number of failed commands.
+    """
+    pending = []
+    for directory, command in commands:
+        if DRY_RUN_SKIP_RE.search(command):
+            logger.debug(f"[SKIPPED] {command}")
+        else:
+            pending.append((directory, command))
+    dependencies = dry_run_dependencies(pending)
+    dependents: List[List[int]] = [[] for _ in pending]
+    for idx, deps in enumerate(dependencies):
+        for dep in deps:
+            dependents[dep].append(idx)
+    waiting = [len(deps) for deps in dependencies]
+    failed = 0
+
+    def execute(idx: int) -> bool:
+        directory, command = pending[idx]
+        logger.debug(f"[EXECUTE] {command}")
+        result = subprocess.run(command, shell=True, cwd=directory, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            logger.info(f"[FAILED!] {command}\nError: exit status {result.returncode}\n{result.stderr[-2000:]}")
+        return result.returncode == 0
+
+    with ThreadPoolExecutor(max_workers=jobs if jobs > 0 else (os.cpu_count() or 1)) as pool:
+        running = {pool.submit(execute, idx): idx for idx, count in enumerate(waiting) if count == 0}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = running.pop(future)
+                if not future.result():
+                    failed += 1
+                for dependent in dependents[idx]:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        running[pool.submit(execute, dependent)] = dependent
+    return failed
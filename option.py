@@ -1,5 +1,7 @@
+import hashlib
+from array import array
 from enum import Enum, auto
-from typing import List
+from typing import Dict, List, Tuple, Union
 
 from logger import logger
 
@@ -126,6 +128,132 @@ class Option:
             return None, False
 
 
+def option_value_tokens(option: Option) -> List[Tuple[str, bool]]:
+    """All values an option can be set to, as (token, is_on) pairs."""
+    tokens = []
+    if option.is_switch():
+        pos_token, _ = option.positive()
+        neg_token, _ = option.negative()
+        if pos_token:
+            tokens.append((pos_token, True))
+        if neg_token:
+            tokens.append((neg_token, False))
+    elif option.values:
+        for val in option.values:
+            tokens.append((f"{option.option}={val}", True))
+    else:
+        pos, _ = option.positive()
+        if pos:
+            tokens.append((pos, True))
+    return tokens
+
+
+class OptionSpace:
+    """Integer encoding of the option value space.
+
+    Every option key gets a small index and every token of it a code, 0 means
+    the option is unset. A configuration is then an array of codes with one
+    slot per option, which is cheap to copy, mutate, compare and serialize.
+    """
+
+    UNSET = 0
+
+    def __init__(self, options: List[Option]):
+        self.keys: List[str] = []
+        self.key_index: Dict[str, int] = {}
+        self.tokens: List[List[Union[str, None]]] = []  # [key index][code] -> token
+        self.token_codes: Dict[str, Tuple[int, int]] = {}  # token -> (key index, code)
+        for option in options:
+            idx = self._add_key(option.option)
+            for token, _ in option_value_tokens(option):
+                self._add_token(idx, token)
+        # Combinations may set values which are not in the value lists.
+        for option in options:
+            for com in option.combination:
+                self.encode_token(com)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _add_key(self, key: str) -> int:
+        if key not in self.key_index:
+            self.key_index[key] = len(self.keys)
+            self.keys.append(key)
+            self.tokens.append([None])
+        return self.key_index[key]
+
+    def _add_token(self, idx: int, token: str) -> Tuple[int, int]:
+        if token not in self.token_codes:
+            self.token_codes[token] = (idx, len(self.tokens[idx]))
+            self.tokens[idx].append(token)
+        return self.token_codes[token]
+
+    def encode_token(self, token: str) -> Tuple[int, int]:
+        if token in self.token_codes:
+            return self.token_codes[token]
+        return self._add_token(self._add_key(token.split("=")[0]), token)
+
+    def key_of(self, token: str) -> str:
+        return self.keys[self.encode_token(token)[0]]
+
+    def empty(self) -> array:
+        return array("H", [self.UNSET]) * len(self.keys)
+
+    def _fit(self, vec: array) -> array:
+        # Keys registered after the vector was created are unset.
+        if len(vec) < len(self.keys):
+            vec.extend([self.UNSET] * (len(self.keys) - len(vec)))
+        return vec
+
+    def encode(self, tokens: List[str]) -> array:
+        """Later tokens of the same option overwrite earlier ones, like on the command line."""
+        codes = [self.encode_token(token) for token in tokens]
+        vec = self.empty()
+        for idx, code in codes:
+            vec[idx] = code
+        return vec
+
+    def decode(self, vec: array) -> List[str]:
+        return [self.tokens[idx][code] for idx, code in enumerate(vec) if code != self.UNSET]
+
+    def with_token(self, vec: array, token: str) -> array:
+        """A copy of vec with the option of token set to it."""
+        idx, code = self.encode_token(token)
+        new_vec = self._fit(array("H", vec))
+        new_vec[idx] = code
+        return new_vec
+
+    def vector_key(self, vec: array) -> bytes:
+        return self._fit(array("H", vec)).tobytes()
+
+    def diff_keys(self, lhs: array, rhs: array) -> List[str]:
+        """Option keys set differently in the two vectors."""
+        lhs = self._fit(array("H", lhs))
+        rhs = self._fit(array("H", rhs))
+        return [self.keys[idx] for idx, (a, b) in enumerate(zip(lhs, rhs)) if a != b]
+
+    def distance(self, lhs: array, rhs: array) -> int:
+        """Number of options set differently (Hamming distance)."""
+        return len(self.diff_keys(lhs, rhs))
+
+
+def config_fingerprint(options: List[str], space: Union[OptionSpace, None] = None) -> str:
+    """Stable content fingerprint of the option values an option list sets.
+
+    A later token of the same option overrides an earlier one, like on the
+    command line. space tells which tokens set the same option, without it
+    that is the text before "=". The effective tokens are sorted before
+    hashing, so the same values give the same fingerprint regardless of token
+    order, process or run.
+    """
+    if space is not None:
+        effective = space.decode(space.encode(options))
+    else:
+        effective = list({token.split("=")[0]: token for token in options}.values())
+    canonical = "\0".join(sorted(set(effective)))
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
 class ConfigType(Enum):
     default = auto()
     all_positive = auto()
@@ -149,15 +277,18 @@ class SamplingConfig:
 
 
 class ConfigSampling:
-    def __init__(self, options: List[Option], sampling_config: SamplingConfig):
+    def __init__(
+        self, options: List[Option], sampling_config: SamplingConfig, option_space: Union[OptionSpace, None] = None
+    ):
         self.positive_idx = 0
         self.negative_idx = 0
         self.options = options
         self.options_set = set()
         self.sampling_config = sampling_config
+        self.option_space = option_space
 
     def get_options_hash(self, options: List[str]):
-        return hash(tuple(options))
+        return config_fingerprint(options, self.option_space)
 
     def continue_sampling(self, kind: ConfigType):
         if kind == ConfigType.one_positive:
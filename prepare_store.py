@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Union
+
+from incremental_database import BUILD_DIR_PLACEHOLDER
+from logger import logger
+
+
+def store_key(*parts) -> str:
+    """Address of whatever the JSON-serializable parts determine."""
+    return hashlib.blake2b(json.dumps(parts, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+class PrepareStore:
+    """Prepare outputs (compile database, generated files) shared by all workspaces.
+
+    An entry is a manifest, addressed by a key of everything that determines
+    the outputs (commit, option fingerprint, build setup, toolchain), which
+    maps names to blobs. Blobs are addressed by their content, with the
+    build dir normalized, so identical files of many configurations, slots
+    and workspaces are stored once. Manifests are written last, so an entry
+    is either complete or absent.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+
+    def _manifest_file(self, key: str) -> str:
+        return os.path.join(self.store_dir, "manifests", f"{key}.json")
+
+    def _blob_file(self, digest: str) -> str:
+        return os.path.join(self.store_dir, "blobs", digest[:2], digest)
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+        os.replace(tmp_file, path)
+
+    def save(self, key: str, files: Dict[str, str], build_dir: str):
+        """Store the files (name -> path) as the entry of key."""
+        placeholder = BUILD_DIR_PLACEHOLDER.encode()
+        manifest = {}
+        for name, path in sorted(files.items()):
+            try:
+                with open(path, "rb") as f:
+                    data = f.read().replace(build_dir.encode(), placeholder)
+                mode = os.stat(path).st_mode & 0o777
+            except OSError:
+                continue
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            if not os.path.exists(self._blob_file(digest)):
+                self._write(self._blob_file(digest), data)
+            manifest[name] = [digest, mode]
+        self._write(self._manifest_file(key), json.dumps(manifest, indent=1).encode())
+
+    def names(self, key: str) -> Union[List[str], None]:
+        try:
+            with open(self._manifest_file(key), "r") as f:
+                return list(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def restore(self, key: str, destination: Callable[[str], str], build_dir: str) -> bool:
+        """Write the files of key's entry to destination(name), False if there is no complete entry."""
+        try:
+            with open(self._manifest_file(key), "r") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        if not all(os.path.exists(self._blob_file(digest)) for digest, _ in manifest.values()):
+            logger.info(f"[Prepare Store] Entry {key} lost some of its files")
+            return False
+        placeholder = BUILD_DIR_PLACEHOLDER.encode()
+        for name, (digest, mode) in manifest.items():
+            with open(self._blob_file(digest), "rb") as f:
+                data = f.read().replace(placeholder, build_dir.encode())
+            path = destination(name)
+            self._write(path, data)
+            os.chmod(path, mode)
+        return True
@@ -0,0 +1,120 @@
+import os
+import queue
+import re
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Union
+
+from project_info import BuildType
+
+TAIL_LINES = 200
+# After a fatal line, what the tool prints right after it (e.g. CMake's message body) is kept.
+FATAL_CONTEXT_LINES = 20
+FATAL_CONTEXT_SECONDS = 2.0
+KILL_GRACE_SECONDS = 5.0
+
+# Lines after which configure can only end in failure.
+CONFIGURE_FATAL_PATTERNS: Dict[BuildType, re.Pattern] = {
+    # Any error makes CMake skip generation, but it keeps configuring until the end.
+    BuildType.CMake: re.compile(r"^CMake Error\b|^-- Configuring incomplete"),
+    # autoconf's AC_MSG_ERROR, handwritten scripts like FFmpeg's print ERROR:.
+    BuildType.AutoConf: re.compile(r"^configure: error:|^ERROR: "),
+    BuildType.Meson: re.compile(r"^(?:\S+:\d+:\d+: )?ERROR: "),
+}
+# Lines after which a build that doesn't ignore errors can only fail.
+BUILD_FATAL_PATTERN = re.compile(r"\*\*\* \[[^\]]*\] Error \d+|^FAILED: |No rule to make target|^ninja: build stopped")
+
+
+class MonitoredRun:
+    def __init__(self, returncode: int, tail: str, log_file: str, fatal_line: Union[str, None]):
+        self.returncode = returncode
+        self.tail = tail  # The last TAIL_LINES lines of output, stdout and stderr interleaved.
+        self.log_file = log_file  # The whole output.
+        self.fatal_line = fatal_line  # The line the run was aborted after, if it was.
+
+
+def _kill_tree(process: subprocess.Popen):
+    # The process leads its own session, so its process group holds everything it started.
+    for sig, grace in ((signal.SIGTERM, KILL_GRACE_SECONDS), (signal.SIGKILL, None)):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            process.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def run_monitored(
+    cmd: List[str],
+    cwd: str,
+    env: Dict[str, str],
+    log_file: str,
+    fatal: Union[re.Pattern, None] = None,
+    append: bool = False,
+) -> MonitoredRun:
+    """Run cmd streaming its output to log_file, keeping only a bounded tail in memory.
+
+    Once a line matches fatal, the process tree is killed, after the few
+    lines which explain the failure.
+    """
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    tail: deque = deque(maxlen=TAIL_LINES)
+    lines: queue.Queue = queue.Queue()
+    fatal_line = None
+    killed = False
+    with open(log_file, "a" if append else "w") as log, subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+        start_new_session=True,
+    ) as process:
+
+        def read():
+            for line in process.stdout:
+                lines.put(line)
+            lines.put(None)
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+        log.write(f"$ {shlex.join(cmd)}\n")
+        context_left = FATAL_CONTEXT_LINES
+        deadline = None
+        while True:
+            try:
+                line = lines.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if line is None:
+                break
+            log.write(line)
+            tail.append(line)
+            if fatal_line is None:
+                if fatal is not None and fatal.search(line):
+                    fatal_line = line.strip()
+                    deadline = time.monotonic() + FATAL_CONTEXT_SECONDS
+            else:
+                context_left -= 1
+                if context_left <= 0:
+                    break
+        if fatal_line is not None and process.poll() is None:
+            _kill_tree(process)
+            killed = True
+        process.wait()
+        reader.join(timeout=KILL_GRACE_SECONDS)
+    returncode = process.returncode
+    if killed:
+        returncode = returncode or 1
+    else:
+        fatal_line = None  # It ended on its own, its exit status tells.
+    return MonitoredRun(returncode, "".join(tail), log_file, fatal_line)
@@ -3,12 +3,38 @@ import os
 import re
 import subprocess
 import random
+import time
 import itertools
-from typing import Dict, List, Set, Union, Tuple
-
-from incremental_database import FileLevelCache
+from array import array
+from typing import Dict, FrozenSet, List, Set, Union, Tuple
+
+from build_scripts import find_dead_options, find_option_requirements
+from build_slots import SlotPool, materialize_slot, tree_bytes
+from config_space import ConfigSpaceDD
+from configure_cache import (
+    AutoconfCache,
+    cmake_reconfigure_args,
+    meson_option_defaults,
+    meson_reconfigure_cmds,
+    toolchain_description,
+)
+from configure_failures import FailureCause, MissingDependencies, classify_failure, dependent_values, enabling_values
+from dependency_check import unsatisfiable_options
+from incremental_database import ConfigIndex, FileLevelCache, build_fingerprint, generated_files
 from logger import logger
+from make_dry_run import MakeDryRun, run_dry_run_commands
+from prepare_store import PrepareStore, store_key
+from process_monitor import BUILD_FATAL_PATTERN, CONFIGURE_FATAL_PATTERNS, MonitoredRun, run_monitored
 from project_info import *
+from sampling import *
+from selection import (
+    CandidatePool,
+    CandidateState,
+    LearnedConflicts,
+    OptionEffectStats,
+    OptionValueScheduler,
+    ddmin,
+)
 from utils import *
 
 
@@ -41,35 +67,68 @@ global_config = GlobalConfig()
 
 
 class Configuration:
-    def __init__(self, workspace, tag, opts, config_options, project_info: ProjectInfo):
+    # Sampling may create huge pools of configurations, keep them small and
+    # don't touch the file system until a configuration is actually prepared.
+    __slots__ = (
+        "project_info",
+        "workspace",
+        "tag",
+        "opts",
+        "config_options",
+        "build_dir",
+        "option_space",
+        "_fingerprint",
+        "_materialized",
+    )
+
+    def __init__(
+        self, workspace, tag, opts, config_options, project_info: ProjectInfo, option_space: Union[OptionSpace, None] = None
+    ):
         self.project_info = project_info
         self.workspace = workspace
         self.tag = tag
         self.opts = opts
         self.config_options = config_options
-        self.prep_path = os.path.join(self.workspace, f"preprocess/{tag}")
-        self.cache_file = os.path.join(self.prep_path, "file_level_cache.json")
+        self.option_space = option_space  # Tells which tokens set the same option, for the fingerprint.
+        self._fingerprint: Union[str, None] = None
+        self._materialized = False
+
+    @property
+    def prep_path(self) -> str:
+        return os.path.join(self.workspace, f"preprocess/{self.tag}")
+
+    @property
+    def cache_file(self) -> str:
+        return os.path.join(self.prep_path, "file_level_cache.json")
+
+    @property
+    def compile_database(self) -> str:
+        return os.path.join(self.prep_path, "compile_commands.json")
+
+    @property
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            self._fingerprint = config_fingerprint(self.config_options, self.option_space)
+        return self._fingerprint
+
+    def materialize(self):
+        """Create the preprocess directory and record options, once per configuration."""
+        if self._materialized:
+            return
         makedir(self.prep_path)
-        self.compile_database = os.path.join(self.prep_path, "compile_commands.json")
-    
+        with open(os.path.join(self.prep_path, "options.json"), "w") as f:
+            json.dump(self.option_cmd(), f, indent=4)
+        self._materialized = True
+
     def set_build_dir(self, build_tag):
         self.build_dir = os.path.join(self.project_info.build_dir, build_tag)
         makedir(self.build_dir)
         # If in-tree build, and build dir is empty, copy source code
         if not self.project_info.out_of_tree and len(os.listdir(self.build_dir)) == 0:
-            # In-tree build, copy source code to build dir
-            cmd = ["rsync", "-a", 
-                   "--exclude", ".git", 
-                   "--exclude", ".cache",
-                   f"{self.project_info.src_dir}/", 
-                   f"{self.build_dir}/"
-                ]
-            logger.info(f"[Setup In-tree Build] {' '.join(cmd)}")
-            run(
-                cmd,
-                cwd=".",
-                tag="Setup In-tree Build",
-            )
+            # In-tree build, clone the source tree into the build dir as cheaply as the filesystem allows.
+            start = time.monotonic()
+            method = materialize_slot(self.project_info.src_dir, self.build_dir, getattr(self.opts, "slot_method", "auto"))
+            logger.info(f"[Setup In-tree Build] {self.build_dir} by {method} in {time.monotonic() - start:.2f}s")
 
     def option_cmd(self):
         cmd = self.project_info.constant_options.copy()
@@ -102,7 +161,7 @@ class Configuration:
         return cmd
 
     def config_cmd(self):
-        if "build_dir" not in self.__dict__:
+        if not hasattr(self, "build_dir"):
             self.build_dir = self.project_info.build_dir
         cmd = []
         if self.project_info.build_type == BuildType.CMake:
@@ -123,14 +182,7 @@ class Configuration:
                 cmd.extend(
                     ["--native", os.path.join(self.workspace, "native_file.ini")]
                 )
-        option_cmd = self.option_cmd()
-        cmd.extend(option_cmd)
-        # record options
-        json.dump(
-            option_cmd,
-            open(os.path.join(self.prep_path, "options.json"), "w"),
-            indent=4,
-        )
+        cmd.extend(self.option_cmd())
         return cmd
 
     def build_cmd(self):
@@ -203,10 +255,22 @@ class Project:
         self.opts = opts
         self.project_info = project_info
 
-        self.config_list: List[Configuration] = [] # All sampled configurations.
+        # All sampled configurations, loaded lazily from the sampling plan (see sample_configurations).
+        self._config_list: Union[List[Configuration], None] = None
+        self._baseline: Union[Configuration, None] = None
         self.chosen_config_list: List[Configuration] = [] # Configurations to be analyzed.
         self.zero_distance_configs: Set[Configuration] = set() # Configurations with zero distance.
+        self.candidate_pool: Union[CandidatePool, None] = None # Selection state of config_list.
+        self._config_space: Union[ConfigSpaceDD, None] = None # Valid configurations of the unpruned options.
         self.prepared_configs: Set[str] = set() # Configurations that have been prepared (by tag).
+        # What configure generated -> first configuration prepared with it, and the configurations reusing it.
+        self.build_fingerprints: Dict[str, Configuration] = {}
+        self.build_twins: Dict[Configuration, Configuration] = {}
+        # The generator commands (bison, flex, scripts) make -n listed for a configuration, run again for its twins.
+        self.dry_run_commands: Dict[Configuration, List[Tuple[str, str]]] = {}
+        self._autoconf_cache: Union[AutoconfCache, None, bool] = False  # False until looked up.
+        self._option_requirements: Union[Dict[str, List[Tuple[str, str]]], None] = None
+        self._meson_defaults: Union[Dict[str, str], None] = None
         self.overall_cache_file = os.path.join(self.workspace, "file_level_cache.json")
         self.explored_candidate_configs: Set[str] = set() # Configurations explored (by tag).
 
@@ -221,9 +285,11 @@ class Project:
             }
         )
 
+        # Integer encoding of all option values, shared by configurations and populations.
+        self.option_space = OptionSpace(self.project_info.options)
         self.sampling_config = SamplingConfig(self.project_info.options, getattr(self.opts, "max_configs", 1000))
         self.config_sampler = ConfigSampling(
-            self.project_info.options, self.sampling_config
+            self.project_info.options, self.sampling_config, self.option_space
         )
         if not project_info.must_gcc:
             self.env["CC"] = "clang-18"
@@ -234,6 +300,13 @@ class Project:
         # Strategy selection
         self.strategy = getattr(self.opts, "strategy", "preset")
         self.candidate_size = getattr(self.opts, "candidate_size", 5)
+        # Candidate build slots and what each was last configured with.
+        self.slot_pool = SlotPool(self.project_info.build_dir, self.option_space, self.candidate_size)
+        # Prepare outputs of every workspace of the project, by what determines them.
+        self.prepare_store: Union[PrepareStore, None] = None
+        if not getattr(self.opts, "no_prepare_store", False):
+            self.prepare_store = PrepareStore(os.path.join(os.path.dirname(self.workspace), "prepare_store"))
+        self._source_bytes: Union[int, None] = None
         self.stop_threshold = getattr(self.opts, "stop_threshold", 0)
         self.stop_patience = getattr(self.opts, "stop_patience", 3)
         self.random_seed = getattr(self.opts, "random_seed", 0)
@@ -241,21 +314,291 @@ class Project:
         self.max_random_options = max(1, getattr(self.opts, "max_random_options", 5))
         self.max_rounds = max(0, getattr(self.opts, "max_rounds", 50))
         self.t_wise = max(1, getattr(self.opts, "t_wise", 2))
+        self.sampling_jobs = max(1, getattr(self.opts, "sampling_jobs", 1))
+        self.ov_scheduler = getattr(self.opts, "ov_scheduler", "ucb")
         self.rand = random.Random(self.random_seed)
 
-        if self.strategy == "preset":
-            self.configuration_sampling()
-        elif self.strategy == "random-space":
-            self.configuration_sampling_random_space()
-        elif self.strategy == "twise":
-            self.configuration_sampling_twise(self.t_wise)
-        elif self.strategy == "pairwise-explicit":
-            self.configuration_sampling_pairwise_explicit()
-        elif self.strategy == "adaptive":
-            self.configuration_sampling_adaptive()
+        # Every configuration ever prepared for this project commit, shared by all workspaces.
+        self.config_index = ConfigIndex(
+            os.path.join(
+                os.path.dirname(self.workspace),
+                "config_index",
+                f"{self.project_info.commit.replace('/', '_')}.jsonl",
+            )
+        )
+        # Options whose toggling never changed a file hash are pruned from the candidate space.
+        self.option_effects = OptionEffectStats(
+            os.path.join(
+                os.path.dirname(self.workspace),
+                "option_effects",
+                f"{self.project_info.commit.replace('/', '_')}.json",
+            ),
+            max(0, getattr(self.opts, "noop_contexts", 2)),
+        )
+        self._pruned_options: Union[Set[str], None] = None
+        # Option value sets isolated as configure failures, never sampled together again.
+        self.learned_conflicts = LearnedConflicts(
+            os.path.join(os.path.dirname(self.workspace), "learned_conflicts.json")
+        )
+        self.ddmin_probes = max(0, getattr(self.opts, "ddmin_probes", 16))
+        # Classified configure failures (by tag) and the dependencies they found missing,
+        # shared by all projects since they are a property of this machine.
+        self.configure_failures: Dict[str, FailureCause] = {}
+        self.missing_dependencies = MissingDependencies(
+            os.path.join(os.path.dirname(os.path.dirname(self.src_dir)), "missing_dependencies.json")
+        )
+        self._unavailable_values: Union[Set[str], None] = None
+        # Configurations evaluated by other workspaces are not explored again.
+        self.skip_fingerprints: Set[str] = set()
+        if getattr(self.opts, "skip_evaluated", False):
+            self.skip_fingerprints = self.config_index.fingerprints(exclude_workspace=self.workspace)
+            logger.info(f"[Config Index] Skipping {len(self.skip_fingerprints)} configurations evaluated by other workspaces.")
+
+    @property
+    def config_list(self) -> List[Configuration]:
+        if self._config_list is None:
+            self.sample_configurations()
+        return self._config_list
+
+    @config_list.setter
+    def config_list(self, config_list: List[Configuration]):
+        self._config_list = config_list
+
+    @property
+    def baseline(self) -> Configuration:
+        if self._baseline is None:
+            self.sample_configurations()
+        return self._baseline
+
+    @baseline.setter
+    def baseline(self, baseline: Configuration):
+        self._baseline = baseline
+
+    @property
+    def pruned_options(self) -> Set[str]:
+        """No-op options and, unless disabled, the dead ones, looked up when sampling first needs them."""
+        if self._pruned_options is None:
+            self._pruned_options = self.option_effects.noop_options()
+            if self._pruned_options:
+                logger.info(f"[Option Effects] Pruning no-op options: {', '.join(sorted(self._pruned_options))}")
+            if not getattr(self.opts, "no_static_prune", False):
+                self._pruned_options |= set(self.detect_dead_options())
+        return self._pruned_options
+
+    @property
+    def unavailable_values(self) -> Set[str]:
+        """Values needing a dependency known or, unless disabled, probed to be missing, looked up when first needed."""
+        if self._unavailable_values is None:
+            self._unavailable_values = dependent_values(self.missing_dependencies, self.project_info.options)
+            if self._unavailable_values:
+                logger.info(f"[Missing Dependencies] Unavailable option values: {', '.join(sorted(self._unavailable_values))}")
+            if not getattr(self.opts, "no_dependency_check", False):
+                self._unavailable_values |= self.check_dependencies(probe=False)
+        return self._unavailable_values
+
+    def resolve_unavailable_values(self):
+        """Probe the option requirements this machine has not been checked for, only done when running experiments."""
+        if getattr(self.opts, "no_dependency_check", False):
+            return
+        newly = self.check_dependencies() - self.unavailable_values
+        if newly:
+            self.unavailable_values.update(newly)
+            self._config_space = None
+
+    @property
+    def config_space(self) -> ConfigSpaceDD:
+        if self._config_space is None:
+            start = time.monotonic()
+            self._config_space = ConfigSpaceDD(
+                [opt for opt in self.project_info.options if opt.option not in self.pruned_options],
+                self.forbidden_value_sets(),
+            )
+            logger.info(
+                f"[Config Space] Compiled {len(self._config_space)} decision diagram nodes in {time.monotonic() - start:.2f}s"
+            )
+        return self._config_space
+
+    def forbidden_value_sets(self) -> List[List[str]]:
+        # Value sets no sampled configuration may contain all of.
+        return [sorted(conflict) for conflict in self.learned_conflicts.sets] + [
+            [value] for value in sorted(self.unavailable_values)
+        ]
+
+    def is_forbidden(self, options: List[str]) -> bool:
+        return bool(self.learned_conflicts.violated(options)) or not self.unavailable_values.isdisjoint(options)
+
+    def detect_dead_options(self) -> Dict[str, str]:
+        """Options the build scripts never let reach compilation, scanned once per project commit."""
+        dead_file = os.path.join(
+            os.path.dirname(self.workspace),
+            "dead_options",
+            f"{self.project_info.commit.replace('/', '_')}.json",
+        )
+        key = {"version": 2, "options": options_spec_hash(self.project_info.options)}
+        dead = None
+        if os.path.exists(dead_file):
+            try:
+                with open(dead_file, "r") as f:
+                    data = json.load(f)
+                if data.get("key") == key:
+                    dead = data["dead"]
+            except (OSError, json.JSONDecodeError, KeyError):
+                dead = None
+        if dead is None:
+            start = time.monotonic()
+            dead = find_dead_options(self.src_dir, self.project_info.build_type, self.project_info.options)
+            logger.info(f"[Dead Options] Scanned build scripts in {time.monotonic() - start:.2f}s")
+            makedir(os.path.dirname(dead_file))
+            with open(dead_file, "w") as f:
+                json.dump({"key": key, "dead": dead}, f, indent=3)
+        for option, reason in sorted(dead.items()):
+            logger.info(f"[Dead Options] Pruning {option}: {reason}")
+        return dead
+
+    @property
+    def option_requirements(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Third-party requirements of the options as stated by the build scripts, scanned once."""
+        if self._option_requirements is None:
+            self._option_requirements = find_option_requirements(
+                self.src_dir, self.project_info.build_type, self.project_info.options
+            )
+        return self._option_requirements
+
+    def option_related_names(self) -> Dict[str, List[str]]:
+        # Names the build scripts' cached checks about an option may be named after.
+        return {option: [name for _, name in requirements] for option, requirements in self.option_requirements.items()}
+
+    def check_dependencies(self, probe: bool = True) -> Set[str]:
+        """Values of options whose stated requirements this machine misses, probed once per project commit and toolchain.
+
+        Without `probe`, only an earlier probe's results are used, if any.
+        """
+        check_file = os.path.join(
+            os.path.dirname(self.workspace),
+            "dependency_check",
+            f"{self.project_info.commit.replace('/', '_')}.json",
+        )
+        key = {
+            "version": 2,
+            "options": options_spec_hash(self.project_info.options),
+            "toolchain": toolchain_description(self.env),
+        }
+        unsatisfiable = None
+        if os.path.exists(check_file):
+            try:
+                with open(check_file, "r") as f:
+                    data = json.load(f)
+                if data.get("key") == key:
+                    unsatisfiable = {
+                        option: [tuple(requirement) for requirement in missing]
+                        for option, missing in data["unsatisfiable"].items()
+                    }
+            except (OSError, json.JSONDecodeError, KeyError):
+                unsatisfiable = None
+        if unsatisfiable is None and not probe:
+            return set()
+        if unsatisfiable is None:
+            start = time.monotonic()
+            requirements = self.option_requirements
+            unsatisfiable = unsatisfiable_options(requirements, self.env)
+            logger.info(
+                f"[Dependency Check] Probed the requirements of {len(requirements)} options "
+                f"in {time.monotonic() - start:.2f}s, {len(unsatisfiable)} unsatisfiable"
+            )
+            makedir(os.path.dirname(check_file))
+            with open(check_file, "w") as f:
+                json.dump({"key": key, "unsatisfiable": unsatisfiable}, f, indent=3)
+        values = set()
+        for option in self.project_info.options:
+            missing = unsatisfiable.get(option.option)
+            if missing:
+                logger.info(f"[Dependency Check] {option.option} is unavailable, missing {', '.join(f'{kind} {name}' for kind, name in missing)}")
+                values |= enabling_values(option)
+        return values
+
+    def sampling_plan_key(self) -> Dict:
+        return {
+            "options": options_spec_hash(
+                self.project_info.options,
+                {
+                    "static_prune": not getattr(self.opts, "no_static_prune", False),
+                    "dependency_check": not getattr(self.opts, "no_dependency_check", False),
+                },
+            ),
+            "strategy": self.strategy,
+            "seed": self.random_seed,
+            "max_configs": self.sampling_config.num,
+            "t_wise": self.t_wise,
+            "skip": config_fingerprint(sorted(self.skip_fingerprints)),
+        }
+
+    def sample_configurations(self):
+        """Load the sampling plan of this project, running the strategy only if there is no plan yet."""
+        plan_key = self.sampling_plan_key()
+        plan_file = os.path.join(
+            os.path.dirname(self.workspace), "sampling_plans", SamplingPlan.file_name(plan_key)
+        )
+        plan = SamplingPlan.load(plan_file, plan_key)
+        if plan is not None:
+            self.config_list = [
+                self.create_configuration(options, self.workspace, tag)
+                for tag, options in plan.configs
+            ]
+            self.baseline = self.config_list[0]
+            logger.info(f"[Sampling Plan] Loaded {len(self.config_list)} configurations from {plan_file}")
         else:
-            # Fallback
-            self.configuration_sampling()
+            if self.strategy == "preset":
+                self.configuration_sampling()
+            elif self.strategy == "random-space":
+                self.configuration_sampling_random_space()
+            elif self.strategy == "twise":
+                self.configuration_sampling_twise(self.t_wise)
+            elif self.strategy == "pairwise-explicit":
+                self.configuration_sampling_pairwise_explicit()
+            elif self.strategy == "adaptive":
+                self.configuration_sampling_adaptive()
+            else:
+                # Fallback
+                self.configuration_sampling()
+            SamplingPlan(
+                plan_key, [(config.tag, config.config_options) for config in self.config_list]
+            ).save(plan_file)
+            logger.info(f"[Sampling Plan] Saved {len(self.config_list)} configurations to {plan_file}")
+
+        configure_record = os.path.join(self.workspace, "configure.txt")
+        if plan is None or not os.path.exists(configure_record):
+            self.write_configure_record(configure_record)
+
+        if self.project_info.filter_configs:
+            old_list = self.config_list.copy()
+            self.config_list = [old_list[idx] for idx in self.project_info.filter_configs]
+
+        # What was learned since the plan was made changes which configurations run, never what a tag means.
+        if len(self.learned_conflicts) or self.unavailable_values:
+            planned = len(self.config_list)
+            self.config_list = [
+                config for config in self.config_list
+                if config is self.baseline or not self.is_forbidden(config.config_options)
+            ]
+            logger.info(
+                f"[Sampling Plan] Dropped {planned - len(self.config_list)} configurations with learned conflicts or unavailable values"
+            )
+
+    def write_configure_record(self, configure_record: str):
+        # Options classification followed by the configure script of every sampled configuration.
+        classified_options = {ty: [] for ty in OptionType}
+        for option in self.config_sampler.options:
+            classified_options[option.kind].append(
+                f"{option.option} on:{option.on_value} off:{option.off_value}"
+            )
+        with open(configure_record, "w") as f:
+            for ty in OptionType:
+                f.write(ty.getStr() + "\n")
+                f.writelines([(op_str + "\n") for op_str in classified_options[ty]])
+            for config in self.config_list:
+                configure_script = commands_to_shell_script(config.config_cmd())
+                f.write(config.tag + "\n")
+                f.write(configure_script + "\n")
 
     def create_dir(self):
         makedir(self.project_info.build_dir)
@@ -277,7 +620,7 @@ class Project:
                 f.write(native_config)
 
     def create_configuration(self, options, workspace, tag):
-        return Configuration(workspace, tag, self.opts, options, self.project_info)
+        return Configuration(workspace, tag, self.opts, options, self.project_info, self.option_space)
 
     def get_different_kind_configuration(self, kind: ConfigType, tag):
         options = self.config_sampler.get_different_kind_configuration(kind)
@@ -287,15 +630,6 @@ class Project:
         return config
 
     def configuration_sampling(self):
-        classified_options = {ty: [] for ty in OptionType}
-        for option in self.config_sampler.options:
-            classified_options[option.kind].append(
-                f"{option.option} on:{option.on_value} off:{option.off_value}"
-            )
-        with open(os.path.join(self.workspace, "configure.txt"), "w") as f:
-            for ty in OptionType:
-                f.write(ty.getStr() + "\n")
-                f.writelines([(op_str + "\n") for op_str in classified_options[ty]])
         # Default configuration
         default_configuration = self.get_different_kind_configuration(
             ConfigType.default, "0_default"
@@ -340,31 +674,13 @@ class Project:
             all_config.append(one_negative)
 
         self.config_list = [self.baseline] + [
-            config for config in all_config if config != self.baseline
+            config for config in all_config
+            if config is not None
+            and config != self.baseline
+            and config.fingerprint not in self.skip_fingerprints
         ]
-        # self.config_list = [all_negative_configuration]
-        with open(os.path.join(self.workspace, "configure.txt"), "a") as f:
-            for config in self.config_list:
-                configure_script = commands_to_shell_script(config.config_cmd())
-                f.write(config.tag + "\n")
-                f.write(configure_script + "\n")
-        
-        if self.project_info.filter_configs:
-            old_list = self.config_list.copy()
-            self.config_list = [old_list[idx] for idx in self.project_info.filter_configs]
 
     def configuration_sampling_random_space(self):
-        # Record options classification like the preset strategy
-        classified_options = {ty: [] for ty in OptionType}
-        for option in self.config_sampler.options:
-            classified_options[option.kind].append(
-                f"{option.option} on:{option.on_value} off:{option.off_value}"
-            )
-        with open(os.path.join(self.workspace, "configure.txt"), "w") as f:
-            for ty in OptionType:
-                f.write(ty.getStr() + "\n")
-                f.writelines([(op_str + "\n") for op_str in classified_options[ty]])
-
         # Baseline as default configuration (no options)
         default_configuration = self.get_different_kind_configuration(
             ConfigType.default, "0_default"
@@ -389,16 +705,6 @@ class Project:
         3. Triple configs (3 options) - only if pairwise success rate > 70%
         4. Quad configs (4 options) - only if triple success rate > 60%
         """
-        classified_options = {ty: [] for ty in OptionType}
-        for option in self.config_sampler.options:
-            classified_options[option.kind].append(
-                f"{option.option} on:{option.on_value} off:{option.off_value}"
-            )
-        with open(os.path.join(self.workspace, "configure.txt"), "w") as f:
-            for ty in OptionType:
-                f.write(ty.getStr() + "\n")
-                f.writelines([(op_str + "\n") for op_str in classified_options[ty]])
-
         # Baseline
         default_configuration = self.get_different_kind_configuration(
             ConfigType.default, "0_default"
@@ -409,25 +715,13 @@ class Project:
         # Build option value space
         option_tokens: List[List[tuple]] = []  # [(token_str, opt_obj), ...]
         for opt in self.project_info.options:
-            tokens = []
-            if opt.is_switch():
-                pos_token, _ = opt.positive()
-                neg_token, _ = opt.negative()
-                if pos_token:
-                    tokens.append((pos_token, opt))
-                if neg_token:
-                    tokens.append((neg_token, opt))
-            elif opt.values:
-                for val in opt.values:
-                    tokens.append((f"{opt.option}={val}", opt))
-            else:
-                pos, _ = opt.positive()
-                if pos:
-                    tokens.append((pos, opt))
+            if opt.option in self.pruned_options:
+                continue
+            tokens = [(token, opt) for token, _ in option_value_tokens(opt)]
             if tokens:
                 option_tokens.append(tokens)
 
-        seen_hashes: Set[str] = set()
+        seen_hashes: Set[str] = set(self.skip_fingerprints)
         seen_hashes.add(self.config_sampler.get_options_hash(self.baseline.config_options))
         
         # Budget allocation per complexity level
@@ -459,16 +753,14 @@ class Project:
 
         self.config_list = [self.baseline] + [c for c in all_configs if c != self.baseline]
 
-        with open(os.path.join(self.workspace, "configure.txt"), "a") as f:
-            for config in self.config_list:
-                configure_script = commands_to_shell_script(config.config_cmd())
-                f.write(config.tag + "\n")
-                f.write(configure_script + "\n")
-
     def _generate_n_option_configs(
         self, option_tokens: List[List[tuple]], n: int, budget: int, seen_hashes: Set[str]
     ) -> List[List[str]]:
-        """Generate configurations with exactly n options."""
+        """Generate configurations with exactly n options.
+
+        Every option combination draws from its own random stream, so combos can
+        be expanded by parallel workers and merged in order with the same result.
+        """
         if n > len(option_tokens):
             return []
         
@@ -479,46 +771,29 @@ class Project:
         max_combos = min(len(n_way_combos), budget * 10)
         if len(n_way_combos) > max_combos:
             # Shuffle for diversity
-            self.rand.shuffle(n_way_combos)
+            spawn_rand(self.random_seed, "adaptive", n).shuffle(n_way_combos)
             n_way_combos = n_way_combos[:max_combos]
         
         valid_configs: List[List[str]] = []
-        
-        for combo in n_way_combos:
-            if len(valid_configs) >= budget:
-                break
-            
-            # Try random value assignments for this option combination
-            attempts = min(5, 2 ** n)  # Limit attempts per combo
-            for _ in range(attempts):
+        tasks = [
+            (self.random_seed, n, combo_idx, combo)
+            for combo_idx, combo in enumerate(n_way_combos)
+        ]
+        # Expand combos batch by batch so we stop early once the budget is reached.
+        batch_size = self.sampling_jobs * 8
+        with SamplingPool(self.sampling_jobs, option_tokens) as pool:
+            for start in range(0, len(tasks), batch_size):
                 if len(valid_configs) >= budget:
                     break
-                
-                # Randomly pick one value for each option in the combo
-                selected_tokens = []
-                selected_objs = []
-                
-                for opt_idx in combo:
-                    tokens = option_tokens[opt_idx]
-                    token, opt_obj = self.rand.choice(tokens)
-                    selected_tokens.append(token)
-                    selected_objs.append(opt_obj)
-                
-                # Check if this combination is valid
-                if self._is_valid_n_tuple(selected_objs, selected_tokens):
-                    config_options = selected_tokens.copy()
-                    
-                    # Add combination side-effects
-                    for opt_obj in selected_objs:
-                        for com in opt_obj.combination:
-                            if com not in config_options:
-                                config_options.append(com)
-                    
-                    # Check for duplicates
-                    opt_hash = self.config_sampler.get_options_hash(config_options)
-                    if opt_hash not in seen_hashes:
-                        seen_hashes.add(opt_hash)
-                        valid_configs.append(config_options)
+                for candidates in pool.map(n_option_candidates, tasks[start:start + batch_size]):
+                    for config_options in candidates:
+                        if len(valid_configs) >= budget:
+                            break
+                        # Check for duplicates
+                        opt_hash = self.config_sampler.get_options_hash(config_options)
+                        if opt_hash not in seen_hashes:
+                            seen_hashes.add(opt_hash)
+                            valid_configs.append(config_options)
         
         # If we have more than budget, sample equidistantly
         if len(valid_configs) > budget:
@@ -526,40 +801,6 @@ class Project:
         
         return valid_configs
 
-    def _is_valid_n_tuple(self, opt_objs: List, tokens: List[str]) -> bool:
-        """Check if an n-tuple of options is valid (no conflicts)."""
-        conflict_set: Set[str] = set()
-        selected_keys: Set[str] = set()
-        
-        for i, opt_obj in enumerate(opt_objs):
-            token = tokens[i]
-            
-            # Check for duplicate option assignment
-            if opt_obj.option in selected_keys:
-                return False
-            selected_keys.add(opt_obj.option)
-            
-            # Check conflicts
-            if opt_obj.option in conflict_set:
-                return False
-            if any(cf in conflict_set for cf in opt_obj.conflict):
-                return False
-            
-            # Add conflicts
-            conflict_set.update(opt_obj.conflict)
-            
-            # Check combination conflicts
-            for com in opt_obj.combination:
-                com_key = com.split("=")[0]
-                if com_key in conflict_set:
-                    return False
-                # Check if combination conflicts with other selected options
-                for j, other_obj in enumerate(opt_objs):
-                    if i != j and other_obj.option == com_key and com != tokens[j]:
-                        return False
-        
-        return True
-
     def configuration_sampling_pairwise_explicit(self):
         """Generate configurations with exactly 2 explicit options each.
         
@@ -567,16 +808,6 @@ class Project:
         where each configuration explicitly sets exactly 2 options.
         This minimal approach maximizes the chance of successful prepare.
         """
-        classified_options = {ty: [] for ty in OptionType}
-        for option in self.config_sampler.options:
-            classified_options[option.kind].append(
-                f"{option.option} on:{option.on_value} off:{option.off_value}"
-            )
-        with open(os.path.join(self.workspace, "configure.txt"), "w") as f:
-            for ty in OptionType:
-                f.write(ty.getStr() + "\n")
-                f.writelines([(op_str + "\n") for op_str in classified_options[ty]])
-
         # Baseline
         default_configuration = self.get_different_kind_configuration(
             ConfigType.default, "0_default"
@@ -587,22 +818,10 @@ class Project:
         # Build option value space: each option has a list of possible token values
         option_tokens: List[List[tuple]] = []  # [(token_str, opt_obj), ...]
         for opt in self.project_info.options:
-            tokens = []
-            if opt.is_switch():
-                pos_token, _ = opt.positive()
-                neg_token, _ = opt.negative()
-                if pos_token:
-                    tokens.append((pos_token, opt))
-                if neg_token:
-                    tokens.append((neg_token, opt))
-            elif opt.values:
-                # Include all values for multi-value options
-                for val in opt.values:
-                    tokens.append((f"{opt.option}={val}", opt))
-            else:
-                pos, _ = opt.positive()
-                if pos:
-                    tokens.append((pos, opt))
+            if opt.option in self.pruned_options:
+                continue
+            # Includes all values for multi-value options
+            tokens = [(token, opt) for token, _ in option_value_tokens(opt)]
             if tokens:
                 option_tokens.append(tokens)
 
@@ -613,7 +832,7 @@ class Project:
         logger.info(f"[Pairwise-Explicit] Generating configs from {len(pairwise_combos)} option pairs")
 
         generated_configs: List[List[str]] = []
-        seen_hashes: Set[str] = set()
+        seen_hashes: Set[str] = set(self.skip_fingerprints)
         seen_hashes.add(self.config_sampler.get_options_hash(self.baseline.config_options))
         
         valid_count = 0
@@ -660,12 +879,6 @@ class Project:
 
         self.config_list = [self.baseline] + [c for c in all_configs if c != self.baseline]
 
-        with open(os.path.join(self.workspace, "configure.txt"), "a") as f:
-            for config in self.config_list:
-                configure_script = commands_to_shell_script(config.config_cmd())
-                f.write(config.tag + "\n")
-                f.write(configure_script + "\n")
-
     def _is_valid_pair(self, opt_obj1, opt_obj2, token1: str, token2: str) -> bool:
         """Check if a pair of options is valid (no conflicts)."""
         # Same option cannot be set twice
@@ -700,16 +913,6 @@ class Project:
         - Multi-value options: all possible values
         - Conflicts and combination constraints are respected
         """
-        classified_options = {ty: [] for ty in OptionType}
-        for option in self.config_sampler.options:
-            classified_options[option.kind].append(
-                f"{option.option} on:{option.on_value} off:{option.off_value}"
-            )
-        with open(os.path.join(self.workspace, "configure.txt"), "w") as f:
-            for ty in OptionType:
-                f.write(ty.getStr() + "\n")
-                f.writelines([(op_str + "\n") for op_str in classified_options[ty]])
-
         # Baseline
         default_configuration = self.get_different_kind_configuration(
             ConfigType.default, "0_default"
@@ -720,22 +923,9 @@ class Project:
         # Build option value space: each option has a list of possible (token, is_on, opt_obj) values
         option_value_space: List[List[tuple]] = []  # [(token_str, is_on, opt_obj), ...]
         for opt in self.project_info.options:
-            values = []
-            if opt.is_switch():
-                pos_token, _ = opt.positive()
-                neg_token, _ = opt.negative()
-                if pos_token:
-                    values.append((pos_token, True, opt))
-                if neg_token:
-                    values.append((neg_token, False, opt))
-            elif opt.values:
-                # All values for multi-value options
-                for val in opt.values:
-                    values.append((f"{opt.option}={val}", True, opt))
-            else:
-                pos, _ = opt.positive()
-                if pos:
-                    values.append((pos, True, opt))
+            if opt.option in self.pruned_options:
+                continue
+            values = [(token, is_on, opt) for token, is_on in option_value_tokens(opt)]
             if values:
                 option_value_space.append(values)
 
@@ -765,56 +955,61 @@ class Project:
         # Greedy algorithm: iteratively build configurations that cover the most uncovered tuples
         covered_tuples: Set[tuple] = set()
         generated_configs: List[List[str]] = []
-        seen_hashes: Set[str] = set()
+        seen_hashes: Set[str] = set(self.skip_fingerprints)
         seen_hashes.add(self.config_sampler.get_options_hash(self.baseline.config_options))
 
         iteration = 0
         max_iterations = min(len(all_tuples_to_cover), self.sampling_config.num * 10)  # Safety limit
 
-        while covered_tuples != all_tuples_to_cover and iteration < max_iterations:
-            iteration += 1
-            
-            # Try to find a configuration that covers the most uncovered tuples
-            best_config = None
-            best_coverage = 0
-            best_covered_tuples = set()
-
-            # Strategy: try random configurations and pick the one with best coverage
-            attempts = min(100, len(all_tuples_to_cover) - len(covered_tuples) + 10)
-            for attempt in range(attempts):
-                # Generate a random valid configuration
-                config_options = self._generate_random_valid_config(option_value_space)
-                if config_options is None:
-                    continue
+        # Candidates are drawn uniformly from the valid configurations of the sampled options.
+        config_space = ConfigSpaceDD([values[0][2] for values in option_value_space], self.forbidden_value_sets())
+        with SamplingPool(self.sampling_jobs, (option_value_space, config_space, all_tuples_to_cover)) as pool:
+            while covered_tuples != all_tuples_to_cover and iteration < max_iterations:
+                iteration += 1
                 
-                opt_hash = self.config_sampler.get_options_hash(config_options)
-                if opt_hash in seen_hashes:
-                    continue
+                # Try to find a configuration that covers the most uncovered tuples
+                best_config = None
+                best_coverage = 0
+                best_covered_tuples = set()
+
+                # Strategy: try random configurations and pick the one with best coverage.
+                # Candidates are generated (and scored) by workers, each attempt from its own stream.
+                # Workers track the uncovered tuples themselves from the configurations chosen so far.
+                attempts = min(100, len(all_tuples_to_cover) - len(covered_tuples) + 10)
+                tasks = [
+                    (self.random_seed, iteration, chunk, generated_configs)
+                    for chunk in split_evenly(list(range(attempts)), self.sampling_jobs)
+                ]
+                for results in pool.map(twise_candidates, tasks):
+                    for attempt, config_options, newly_covered in results:
+                        if config_options is None:
+                            continue
+                        
+                        opt_hash = self.config_sampler.get_options_hash(config_options)
+                        if opt_hash in seen_hashes:
+                            continue
 
-                # Check how many uncovered tuples this config covers
-                newly_covered = self._count_covered_tuples(config_options, all_tuples_to_cover - covered_tuples, option_value_space)
-                
-                if len(newly_covered) > best_coverage:
-                    best_coverage = len(newly_covered)
-                    best_config = config_options
-                    best_covered_tuples = newly_covered
-
-            if best_config is None or best_coverage == 0:
-                # Can't find any config that covers new tuples - might be due to conflicts
-                logger.info(f"[T-wise] Cannot cover remaining {len(all_tuples_to_cover) - len(covered_tuples)} tuples (possible conflicts)")
-                break
+                        if len(newly_covered) > best_coverage:
+                            best_coverage = len(newly_covered)
+                            best_config = config_options
+                            best_covered_tuples = newly_covered
 
-            # Add the best configuration
-            covered_tuples.update(best_covered_tuples)
-            generated_configs.append(best_config)
-            seen_hashes.add(self.config_sampler.get_options_hash(best_config))
-            
-            logger.info(f"[T-wise] Iteration {iteration}: added config covering {best_coverage} new tuples (total: {len(covered_tuples)}/{len(all_tuples_to_cover)})")
+                if best_config is None or best_coverage == 0:
+                    # Can't find any config that covers new tuples - might be due to conflicts
+                    logger.info(f"[T-wise] Cannot cover remaining {len(all_tuples_to_cover) - len(covered_tuples)} tuples (possible conflicts)")
+                    break
 
-            # Stop if we've generated enough configs
-            if len(generated_configs) >= self.sampling_config.num:
-                logger.info(f"[T-wise] Reached configuration limit ({self.sampling_config.num})")
-                break
+                # Add the best configuration
+                covered_tuples.update(best_covered_tuples)
+                generated_configs.append(best_config)
+                seen_hashes.add(self.config_sampler.get_options_hash(best_config))
+                
+                logger.info(f"[T-wise] Iteration {iteration}: added config covering {best_coverage} new tuples (total: {len(covered_tuples)}/{len(all_tuples_to_cover)})")
+
+                # Stop if we've generated enough configs
+                if len(generated_configs) >= self.sampling_config.num:
+                    logger.info(f"[T-wise] Reached configuration limit ({self.sampling_config.num})")
+                    break
 
         coverage_pct = 100.0 * len(covered_tuples) / len(all_tuples_to_cover) if all_tuples_to_cover else 100.0
         logger.info(f"[T-wise] Final: {len(generated_configs)} configs covering {len(covered_tuples)}/{len(all_tuples_to_cover)} tuples ({coverage_pct:.1f}%)")
@@ -826,12 +1021,6 @@ class Project:
 
         self.config_list = [self.baseline] + [c for c in all_configs if c != self.baseline]
 
-        with open(os.path.join(self.workspace, "configure.txt"), "a") as f:
-            for config in self.config_list:
-                configure_script = commands_to_shell_script(config.config_cmd())
-                f.write(config.tag + "\n")
-                f.write(configure_script + "\n")
-
     def _is_valid_tuple(self, value_tuple: tuple) -> bool:
         """Check if a t-tuple of option values is valid (no conflicts)."""
         conflict_set: Set[str] = set()
@@ -860,169 +1049,19 @@ class Project:
         
         return True
 
-    def _generate_random_valid_config(self, option_value_space: List[List[tuple]]) -> Union[List[str], None]:
-        """Generate a random valid configuration from the option value space."""
-        config_options: List[str] = []
-        option_to_idx: Dict[str, int] = {}
-        conflict_set: Set[str] = set()
-        
-        # Shuffle option order for randomness
-        option_order = list(range(len(option_value_space)))
-        self.rand.shuffle(option_order)
-        
-        for opt_idx in option_order:
-            values = option_value_space[opt_idx]
-            if not values:
-                continue
-            
-            # Shuffle values
-            values_shuffled = values.copy()
-            self.rand.shuffle(values_shuffled)
-            
-            # Try each value until we find a valid one
-            added = False
-            for token, is_on, opt_obj in values_shuffled:
-                if token is None:
-                    continue
-                
-                # Check conflicts
-                if opt_obj.option in conflict_set:
-                    continue
-                if any(cf in conflict_set for cf in opt_obj.conflict):
-                    continue
-                
-                # Check combination conflicts
-                if is_on:
-                    combo_conflict = False
-                    for com in opt_obj.combination:
-                        com_key = com.split("=")[0]
-                        if com_key in conflict_set:
-                            combo_conflict = True
-                            break
-                    if combo_conflict:
-                        continue
-                
-                # Add this option
-                option_to_idx[opt_obj.option] = len(config_options)
-                config_options.append(token)
-                
-                # Update conflicts if turning on
-                if is_on:
-                    conflict_set.update(opt_obj.conflict)
-                    # Add combination options
-                    for com in opt_obj.combination:
-                        com_key = com.split("=")[0]
-                        if com_key in option_to_idx:
-                            # Overwrite
-                            config_options[option_to_idx[com_key]] = com
-                        else:
-                            option_to_idx[com_key] = len(config_options)
-                            config_options.append(com)
-                
-                added = True
-                break
-            
-            # If we couldn't add any value for this option, that's ok (it remains unset)
-        
-        return config_options if config_options else None
-
-    def _count_covered_tuples(self, config_options: List[str], tuples_to_check: Set[tuple], option_value_space: List[List[tuple]]) -> Set[tuple]:
-        """Count how many tuples from tuples_to_check are covered by this configuration."""
-        # Build a map of option_idx -> assigned token
-        config_map: Dict[int, str] = {}
-        
-        # Parse config_options to extract option assignments
-        for opt_str in config_options:
-            opt_key = opt_str.split("=")[0]
-            # Find which option index this belongs to
-            for opt_idx, values in enumerate(option_value_space):
-                for token, is_on, opt_obj in values:
-                    if token == opt_str:
-                        config_map[opt_idx] = opt_str
-                        break
-        
-        # Check which tuples are covered
-        covered = set()
-        for tpl in tuples_to_check:
-            # tpl is ((opt_idx, token), ...)
-            is_covered = True
-            for opt_idx, token in tpl:
-                if config_map.get(opt_idx) != token:
-                    is_covered = False
-                    break
-            if is_covered:
-                covered.add(tpl)
-        
-        return covered
-
     def _random_option_set(self) -> List[str]:
-        """Generate a random, constraint-aware option list drawn from the full value space."""
-        options: List[str] = []
-        option_to_idx: Dict[str, int] = {}
-        conflict_options = set()
-
-        def add_to_options(op: Union[str, None], overwrite: bool):
-            nonlocal options, option_to_idx
-            if op is None:
-                return
-            key = op.split("=")[0]
-            if key in option_to_idx:
-                if overwrite:
-                    options[option_to_idx[key]] = op
-            else:
-                option_to_idx[key] = len(options)
-                options.append(op)
-
-        def handle_switch(option, turn_on: bool) -> bool:
-            nonlocal conflict_options
-            op, state = (option.positive() if turn_on else option.negative())
-            # state means whether this option is considered "on" semantically
-            if state:
-                if option.option not in conflict_options:
-                    conflict_options = conflict_options.union(option.conflict)
-                    # Check combination conflicts
-                    for com_op in option.combination:
-                        com_key = com_op.split("=")[0]
-                        if com_key in conflict_options and com_op != option.negative()[0]:
-                            return False
-                    add_to_options(op, False)
-                    for com_op in option.combination:
-                        add_to_options(com_op, True)
-                else:
-                    # If in conflict set, try to force negative value
-                    add_to_options(option.negative()[0], True)
-            else:
-                add_to_options(op, False)
-            return True
-
-        # Shuffle options to explore different combinations
-        shuffled = self.project_info.options.copy()
-        self.rand.shuffle(shuffled)
-
-        selected_options = shuffled[: min(len(shuffled), self.max_random_options)]
-
-        for option in selected_options:
-            # Switch options: randomly on/off, try alternative if conflict
-            if option.is_switch():
-                first_try = bool(self.rand.getrandbits(1))
-                if not handle_switch(option, first_try):
-                    # Try the opposite
-                    handle_switch(option, not first_try)
-                continue
-
-            # Multi-value options: choose a random value if available
-            if option.values and len(option.values) > 0:
-                value = self.rand.choice(option.values)
-                add_to_options(f"{option.option}={value}", True)
-            # else: skip if no values
-
-        return options
+        """Draw a uniformly random valid option list from the full value space."""
+        return self.config_space.sample(self.rand) or []
 
     def execute_prerequisites(self, config: Configuration):
         for prerequisite in self.project_info.prerequisites:
             run(prerequisite, config.build_dir, "Prerequisite", self.env)
         if self.project_info.must_make:
             self.build_clean(config)
+        if self.reconfigure_base(config) is None:
+            self.clear_configure_state(config)
+
+    def clear_configure_state(self, config: Configuration):
         if self.project_info.build_type == BuildType.CMake:
             run_without_check(
                 ["rm", os.path.join(config.build_dir, "CMakeCache.txt")],
@@ -1046,27 +1085,128 @@ class Project:
                 env=self.env,
             )
 
-    def configure(self, config: Configuration) -> bool:
-        configure_script = commands_to_shell_script(config.config_cmd())
+    def reconfigure_base(self, config: Configuration) -> Union[List[str], None]:
+        """Options the build dir was last configured with, if config can be configured in place of them."""
+        if not getattr(self.opts, "incremental_reconfigure", False) or not hasattr(config, "build_dir"):
+            return None
+        if self.project_info.build_type == BuildType.CMake:
+            state = os.path.join(config.build_dir, "CMakeCache.txt")
+        elif self.project_info.build_type == BuildType.Meson:
+            state = os.path.join(config.build_dir, "meson-private", "coredata.dat")
+        else:
+            return None
+        if not os.path.exists(state):
+            return None
+        return self.slot_pool.last_options(config.build_dir)
+
+    @property
+    def meson_defaults(self) -> Dict[str, str]:
+        if self._meson_defaults is None:
+            self._meson_defaults = meson_option_defaults(self.src_dir, self.env)
+        return self._meson_defaults
+
+    def run_configure_cmds(self, cmds: List[List[str]], config: Configuration, append: bool = False) -> MonitoredRun:
+        """Run the commands until one fails, streaming all their output into one log."""
+        log_file = os.path.join(config.prep_path, "configure.log")
+        fatal = None
+        if not getattr(self.opts, "no_early_abort", False):
+            fatal = CONFIGURE_FATAL_PATTERNS.get(self.project_info.build_type)
+        for idx, cmd in enumerate(cmds):
+            process = run_monitored(cmd, config.build_dir, self.env, log_file, fatal, append=append or idx > 0)
+            if process.returncode != 0:
+                break
+        return process
+
+    @staticmethod
+    def log_output(tag: str, process: MonitoredRun, log=logger.info):
+        if process.fatal_line is not None:
+            log(f"[{tag}] Aborted early after: {process.fatal_line}")
+        log(f"[{tag}] Full log in {process.log_file}, last lines:\n{process.tail}")
+
+    @property
+    def autoconf_cache(self) -> Union[AutoconfCache, None]:
+        """The autoconf cache shared by the candidates, None if unused or unsupported."""
+        if self._autoconf_cache is False:
+            self._autoconf_cache = None
+            configure_script = os.path.join(self.src_dir, "configure")
+            if (
+                self.project_info.build_type == BuildType.AutoConf
+                and not getattr(self.opts, "no_configure_cache", False)
+                and AutoconfCache.supported(configure_script)
+            ):
+                self._autoconf_cache = AutoconfCache(
+                    os.path.join(os.path.dirname(self.workspace), "configure_cache"),
+                    configure_script,
+                    self.env,
+                    self.project_info.constant_options,
+                    self.option_related_names(),
+                )
+        return self._autoconf_cache
+
+    def configure(self, config: Configuration, record_failure: bool = True) -> bool:
+        config_cmd = config.config_cmd()
+        config_cmds = [config_cmd]
+        cache_file = None
+        cached = 0
+        if self.autoconf_cache is not None and os.path.exists(config.build_dir):
+            cache_file = os.path.join(config.build_dir, "config.cache")
+            cached = self.autoconf_cache.prepare(cache_file, config.config_options, config.option_cmd())
+            logger.info(
+                f"[Configure Cache] {cached} cached check results for {config.tag}, "
+                f"candidates seeded so far: {self.autoconf_cache.hits}"
+            )
+            config_cmd.append(f"--cache-file={cache_file}")
+        previous_options = self.reconfigure_base(config)
+        if previous_options is not None and self.project_info.build_type == BuildType.CMake:
+            reconfigure_args = cmake_reconfigure_args(
+                os.path.join(config.build_dir, "CMakeCache.txt"),
+                previous_options,
+                config.config_options,
+                self.option_related_names(),
+            )
+            logger.info(f"[Reconfigure] {config.tag} in place, unsetting {len(reconfigure_args) // 2} cache variables")
+            config_cmd.extend(reconfigure_args)
+        elif previous_options is not None:
+            meson_cmds = meson_reconfigure_cmds(
+                config.build_dir, previous_options, config.config_options, self.meson_defaults
+            )
+            if meson_cmds is None:
+                logger.info(f"[Reconfigure] {config.tag} resets an option without known default, configuring from scratch")
+                self.clear_configure_state(config)
+                previous_options = None
+            else:
+                logger.info(f"[Reconfigure] {config.tag} in place with meson configure")
+                config_cmds = meson_cmds
+        configure_script = " && ".join(commands_to_shell_script(cmd) for cmd in config_cmds)
         logger.info(f"[Configure Script] {configure_script}")
         if not os.path.exists(config.build_dir):
             logger.error(
                 f"[Configure Script] Please make sure {config.build_dir} exists!"
             )
             return False
-        process = subprocess.run(
-            config.config_cmd(),
-            cwd=config.build_dir,
-            env=self.env,
-            capture_output=True,
-            text=True,
-        )
-        logger.info(
-            f"[Configure Output]\nstdout:\n{process.stdout}\nstderr:\n{process.stderr}"
-        )
+        process = self.run_configure_cmds(config_cmds, config)
+        self.log_output("Configure Output", process)
+        if process.returncode != 0 and (cached or previous_options is not None):
+            # A cached result may not hold for these options, a failure only counts without them.
+            logger.info(f"[Configure Cache] {config.tag} failed with cached results, configuring from scratch")
+            if cached:
+                os.remove(cache_file)
+            if previous_options is not None:
+                self.clear_configure_state(config)
+                config_cmd = config.config_cmd()
+            process = self.run_configure_cmds([config_cmd], config, append=True)
+            self.log_output("Configure Output", process)
         if process.returncode != 0:
             logger.info(f"[Configure Failed] {configure_script}")
+            self.slot_pool.forget(config.build_dir)
+            if record_failure:
+                self.record_configure_failure(config, process.tail)
         else:
+            self.slot_pool.record(config.build_dir, config.config_options)
+            if cache_file:
+                self.autoconf_cache.save(
+                    cache_file, config.option_cmd(), config.config_options if config is self.baseline else None
+                )
             if self.project_info.build_type.notNeedBear():
                 shutil.copy(
                     os.path.join(
@@ -1077,6 +1217,21 @@ class Project:
 
         return process.returncode == 0
 
+    def record_configure_failure(self, config: Configuration, output: str):
+        """Classify a configure failure, a missing dependency makes every option needing it unavailable."""
+        cause = classify_failure(output)
+        self.configure_failures[config.tag] = cause
+        logger.info(f"[Configure Failure] {config.tag}: {cause} {cause.detail}")
+        if cause.dependency is None:
+            return
+        if self.missing_dependencies.add(cause, self.project_info.repo_name):
+            unavailable = dependent_values(self.missing_dependencies, self.project_info.options)
+            newly = unavailable - self.unavailable_values
+            if newly:
+                logger.info(f"[Missing Dependencies] {cause.dependency} is missing, unavailable: {', '.join(sorted(newly))}")
+                self.unavailable_values.update(newly)
+                self._config_space = None
+
     def build(self, config: Configuration) -> bool:
         if global_config.bear_version == 2:
             cmd = [GlobalConfig.bear, "--cdb", str(config.compile_database)]
@@ -1085,20 +1240,20 @@ class Project:
         cmd.extend(config.build_cmd())
 
         logger.info(f"[Building] {commands_to_shell_script(cmd)}")
-        process = subprocess.run(
-            cmd,
-            cwd=config.build_dir,
-            env=self.env,
-            capture_output=True,
-            text=True,
+        # Errors are tolerated with ignore_make_error, so only then the whole build has to run.
+        fatal = None
+        if not self.project_info.ignore_make_error and not getattr(self.opts, "no_early_abort", False):
+            fatal = BUILD_FATAL_PATTERN
+        process = run_monitored(
+            cmd, config.build_dir, self.env, os.path.join(config.prep_path, "build.log"), fatal
         )
         if process.returncode != 0:
             logger.error(f"[Build Failed] {commands_to_shell_script(cmd)}")
-            logger.error(
-                f"[Build Output]\nstdout:\n{process.stdout}\nstderr:\n{process.stderr}"
-            )
+            self.log_output("Build Output", process, logger.error)
         else:
             logger.info(f"[Build Success] {commands_to_shell_script(cmd)}")
+        # Build outputs are most of a slot's footprint, which sizes the slot pool.
+        self.slot_pool.measure(config.build_dir)
         if self.project_info.ignore_make_error:
             return True
         return process.returncode == 0
@@ -1115,194 +1270,48 @@ class Project:
 
     def parse_makefile(self, config: Configuration):
         if self.project_info.build_type.notNeedBear():
-            # The compile_commands.json of opencv contain compile argument like -DXXX="long long",
-            # compiledb doesn't perserve the "", so we use CMake's compile_commands.json.
-            # TODO: compiledb support -DXXX="long long"?
+            # CMake and Meson write the exact compile_commands.json themselves.
             logger.info(
                 "[Parse Makefile] Use compile_commands.json generated by CMake/Meson"
             )
             return True
 
-        # Get compile_commands.json without build by parse "make -n -B -i".
+        # Get compile_commands.json without build by parse "make -n -i".
         # make arguments:
         # -n: Output compile commands only;
-        # -B: Don't consider incremental build;
         # -i: Ignore errors while executing.
-        make_n = subprocess.run(
-            ["make", "-n", "-i"],
-            capture_output=True,
-            text=True,
-            cwd=config.build_dir,
-            env=self.env,
+        # The output is parsed while make produces it, so large recursive builds
+        # are neither held in memory nor cut off by a timeout. Sub-makes run in
+        # parallel and are only run again when their Makefiles changed.
+        make_dry_run = MakeDryRun(
+            config.build_dir,
+            self.env,
+            os.path.join(os.path.dirname(self.workspace), "make_n_cache"),
+            jobs=getattr(self.opts, "dry_run_jobs", 0),
+            serial=getattr(self.opts, "serial_make_n", False),
         )
-        # compiledb arguments:
-        # -f: Overwrite compile_commands.json instead of just updating it.
-        # -S: Do not check if source files exist in the file system.
-        compiledb_cmd = ["compiledb", "-o", config.compile_database, "-f", "-S"]
-        logger.info(f"[Compiledb Script] {commands_to_shell_script(compiledb_cmd)}")
-        subprocess.run(
-            compiledb_cmd,
-            capture_output=True,
-            text=True,
-            cwd=config.build_dir,
-            input=make_n.stdout,
-            timeout=60,  # Set timeout to avoid make execute recursively.
+        other_commands = [] if self.project_info.dry_run else None
+        make_dry_run.extract(config.compile_database, other_commands)
+        logger.info(
+            f"[Parse Makefile] {make_dry_run.entries} compile commands written to {config.compile_database} "
+            f"({make_dry_run.runs} make -n runs, {make_dry_run.cached} cached)"
         )
-
-        def split_cdb_item(cdb_file):
-            # Split items which command contain multiple files.
-            if os.path.exists(cdb_file):
-                cdb: List = json.load(open(cdb_file, "r"))
-                idx = 0
-                while idx < len(cdb):
-                    ccmd = cdb[idx]
-                    idx += 1
-                    if "command" in ccmd:
-                        from shlex import split
-
-                        arguments = split(ccmd["command"])
-                    else:
-                        arguments = ccmd["arguments"]
-
-                    current_file = os.path.abspath(
-                        os.path.join(ccmd["directory"], ccmd["file"])
-                    )
-                    new_item_num = 0
-                    files_in_one_command = []
-                    arguments_without_files = []
-
-                    for argument in arguments:
-                        extname = os.path.splitext(argument)[1][1:]
-                        if extname in {
-                            "c",
-                            "C",
-                            "cc",
-                            "CC",
-                            "cp",
-                            "cpp",
-                            "CPP",
-                            "cxx",
-                            "CXX",
-                            "c++",
-                            "C++",
-                        }:
-                            # It's source code file.
-                            this_file = os.path.abspath(
-                                os.path.join(ccmd["directory"], argument)
-                            )
-                            files_in_one_command.append((this_file))
-                        else:
-                            arguments_without_files.append(argument)
-
-                    for file in files_in_one_command:
-                        if file != current_file:
-                            # Split this item.
-                            new_item = ccmd.copy()
-                            new_item["file"] = file
-                            if "arguments" in new_item:
-                                new_item.pop("arguments")
-                            new_arguments = arguments_without_files.copy()
-                            new_arguments.insert(1, file)
-                            new_item["command"] = " ".join(new_arguments)
-                            cdb.insert(idx, new_item)
-                            new_item_num += 1
-                        else:
-                            ccmd["file"] = current_file
-                            if "arguments" in ccmd:
-                                ccmd.pop("arguments")
-                            new_arguments = arguments_without_files.copy()
-                            new_arguments.insert(1, file)
-                            ccmd["command"] = " ".join(new_arguments)
-
-                    if new_item_num > 0:
-                        logger.info(
-                            f"[SPLIT CDB] Find {new_item_num} new item in {arguments}"
-                        )
-                        idx += new_item_num  # Skip new item
-
-                with open(cdb_file, "w") as f:
-                    json.dump(cdb, f, indent=3)
-
-        split_cdb_item(config.compile_database)
-
-        def filter_commands(make_n_output):
-            commands = []
-            buffer = []
-            for line in make_n_output.split("\n"):
-                line = line.rstrip()
-                if not line:
-                    continue
-                # Merge \ at the end of line.
-                if line.endswith("\\"):
-                    buffer.append(line[:-1].strip())
-                else:
-                    buffer.append(line.strip())
-                    commands.append(" ".join(buffer))
-                    buffer = []
-
-            return commands
-
-        def dry_run(commands):
-            skip_patterns = [
-                r"^\s*((/[\w-]+)+/)?(gcc|clang|cc|g\+\+|clang\+\+|nvcc|ld|ar|ccache)\s",  # Compile, link.
-                r"\smake\s",  # Make
-                r"\smsgfmt\s",  # Don't parse .po
-                r"\s-shared\b",  # Shared library.
-                r"\s-shared\b",  # Shared library.
-                r"\s-arch\b",  # Architecture argument.
-                # r'\.(o|a|so|dylib|exe)\b',  # Target or executable file.
-                # No command
-                r"^\s*#",  # Comment(e.g. # This is a comment).
-                r"\b(make|info|warning)\b",  # Ignore Makefile function(e.g. $(info ...))
-                r"^\s*\$\(",  # Ignore variable expansion(e.g. $(RM) file.o)
-            ]
-            dir_stack = [config.build_dir]
-
-            for cmd in commands:
-                skip = False
-                if not cmd:
-                    continue
-
-                # make[%d] Entering/Leaving directory 'path'
-                entering_match = re.search(
-                    r"make\[\d+\]: Entering directory \'(.+)\'", cmd
-                )
-                leaving_match = re.search(
-                    r"make\[\d+\]: Leaving directory \'(.+?)\'", cmd
-                )
-                if entering_match:
-                    logger.debug(f"[ENTERING] {cmd}")
-                    dir_stack.append(entering_match.group(1))
-                    continue
-                elif leaving_match:
-                    assert leaving_match.group(1) == dir_stack[-1]
-                    logger.debug(f"[LEAVING] {cmd}")
-                    dir_stack.pop()
-                    continue
-
-                # Skip this command if it's for compilation.
-                for pattern in skip_patterns:
-                    if re.search(pattern, cmd, re.IGNORECASE):
-                        logger.debug(f"[SKIPPED] {cmd}")
-                        skip = True
-                        break
-                if not skip:
-                    logger.debug(f"[EXECUTE] {cmd}")
-                    try:
-                        subprocess.run(
-                            cmd, shell=True, check=True, cwd=dir_stack[-1], env=self.env
-                        )
-                    except subprocess.CalledProcessError as e:
-                        logger.info(f"[FAILED!] {cmd}\nError: {e}")
-            return True
+        if make_dry_run.split:
+            logger.info(f"[SPLIT CDB] Found {make_dry_run.split} new items in multi-source commands")
 
         if self.project_info.dry_run:
-            logger.info(f"[DRY RUN] {config.tag}")
-            make_n_commands = filter_commands(make_n.stdout)
-            return dry_run(make_n_commands)
+            self.dry_run_commands[config] = other_commands
+            self.run_generator_commands(config, other_commands)
         return True
 
+    def run_generator_commands(self, config: Configuration, commands: List[Tuple[str, str]]):
+        logger.info(f"[DRY RUN] {config.tag}")
+        failed = run_dry_run_commands(commands, self.env, getattr(self.opts, "dry_run_jobs", 0))
+        if failed:
+            logger.info(f"[DRY RUN] {failed} commands failed")
+
     def icebear(self, config: Configuration, cache_file, prep_only):
+        config.materialize()
         icebear_cmd = config.icebear_cmd(prep_only=prep_only, update_cache=True, cache_file=cache_file, clean_prep_cache=self.opts.clean_preprocess_cache)
         run(icebear_cmd, self.src_dir, "IceBear Running")
 
@@ -1315,17 +1324,39 @@ class Project:
         run(icebear_cmd, self.src_dir, "IceBear Pre-Analysis Running")
 
     def prepare_compilation_database(self, config):
+        config.materialize()
         if self.opts.skip_prepare:
             return True
+        # A build needs the slot configured, restoring only fits databases from make -n or a twin.
+        if not self.project_info.must_make and self.restore_prepared(config):
+            return True
         self.execute_prerequisites(config)
+        # A little earlier, coarse file system clocks may stamp configure's first writes before it.
+        configure_start = time.time() - 0.1
         process_status = self.configure(config)
         if not process_status:
             logger.error(
                 f"[Configure {config.tag}] Configure failed! Stop subsequent jobs."
             )
             return False
-        if self.project_info.must_make:
-            return self.build(config)
+        twin = self.find_build_twin(config, configure_start)
+        if (
+            twin is not None
+            and not self.project_info.must_make
+            and os.path.exists(twin.compile_database)
+            and (not self.project_info.dry_run or twin in self.dry_run_commands)
+        ):
+            # Same generated files, so the same compile commands, no need for make -n.
+            self.copy_from_twin(twin.compile_database, config.compile_database, twin, config)
+            if self.project_info.dry_run:
+                # The sources make -n's generator commands produced still have to be made in this build directory.
+                self.run_generator_commands(config, [
+                    (directory.replace(twin.build_dir, config.build_dir), command.replace(twin.build_dir, config.build_dir))
+                    for directory, command in self.dry_run_commands[twin]
+                ])
+        elif self.project_info.must_make:
+            if not self.build(config):
+                return False
         else:
             process_status = self.parse_makefile(config)
             if not process_status:
@@ -1333,21 +1364,176 @@ class Project:
                     f"[Parse Makefile {config.tag}] Parse makefile failed! Stop subsequent jobs."
                 )
                 return False
+        self.save_prepared(config)
         return True
 
+    def prepare_key(self, config: Configuration) -> str:
+        """Store key of everything which determines what preparing config produces."""
+        return store_key(
+            self.project_info.commit,
+            config.fingerprint,
+            self.project_info.build_type.name,
+            self.project_info.constant_options,
+            self.project_info.out_of_tree,
+            self.project_info.must_make,
+            self.project_info.dry_run,
+            toolchain_description(self.env),
+        )
+
+    @staticmethod
+    def prepared_file(config: Configuration, name: str) -> str:
+        # Store names: build/<path> in the build dir, the rest in the preprocess dir.
+        if name.startswith("build/"):
+            return os.path.join(config.build_dir, name[len("build/"):])
+        return os.path.join(config.prep_path, name)
+
+    def save_prepared(self, config: Configuration):
+        if self.prepare_store is None or not os.path.exists(config.compile_database):
+            return
+        files = {name: self.prepared_file(config, name) for name in ("compile_commands.json", "options.json")}
+        for rel in generated_files(config.build_dir, self.src_dir):
+            files[f"build/{rel}"] = os.path.join(config.build_dir, rel)
+        self.prepare_store.save(self.prepare_key(config), files, config.build_dir)
+
+    def restore_prepared(self, config: Configuration) -> bool:
+        """Take config's prepare outputs from the store if any workspace prepared it before."""
+        if self.prepare_store is None:
+            return False
+        key = self.prepare_key(config)
+        names = self.prepare_store.names(key)
+        if names is None:
+            return False
+        # What an earlier configuration of the slot generated and config doesn't.
+        stored = {name[len("build/"):] for name in names if name.startswith("build/")}
+        for rel in generated_files(config.build_dir, self.src_dir):
+            if rel not in stored:
+                remove_file(os.path.join(config.build_dir, rel))
+        if not self.prepare_store.restore(key, lambda name: self.prepared_file(config, name), config.build_dir):
+            return False
+        # The slot's configure state still belongs to whatever was configured in it before.
+        self.slot_pool.forget(config.build_dir)
+        self.clear_configure_state(config)
+        logger.info(f"[Prepare Store] Reusing the prepare outputs of {config.tag} ({key})")
+        return True
+
+    def find_build_twin(self, config: Configuration, configure_start: float) -> Union[Configuration, None]:
+        """A configuration prepared before whose configure, started at configure_start, generated exactly the same build."""
+        if getattr(self.opts, "no_build_dedup", False):
+            return None
+        fingerprint = build_fingerprint(
+            config.build_dir, self.src_dir, configure_start, [option.option for option in self.project_info.options]
+        )
+        twin = self.build_fingerprints.setdefault(fingerprint, config)
+        if twin is config:
+            return None
+        logger.info(f"[Build Fingerprint] {config.tag} builds the same as {twin.tag}")
+        self.build_twins[config] = twin
+        return twin
+
+    @staticmethod
+    def copy_from_twin(src_file: str, dst_file: str, twin: Configuration, config: Configuration):
+        # Paths into the twin's build directory point into the configuration's own.
+        with open(src_file, "r") as f:
+            text = f.read()
+        if twin.build_dir != config.build_dir:
+            text = text.replace(twin.build_dir, config.build_dir)
+        makedir(os.path.dirname(dst_file))
+        with open(dst_file, "w") as f:
+            f.write(text)
+
+    def pre_analyze(self, config: Configuration):
+        """icebear_for_fdb, or the file-level cache of the configuration's build twin."""
+        twin = self.build_twins.get(config)
+        if twin is not None and os.path.exists(twin.cache_file):
+            logger.info(f"[Build Fingerprint] Reusing the file-level cache of {twin.tag} for {config.tag}")
+            self.copy_from_twin(twin.cache_file, config.cache_file, twin, config)
+            return
+        # The file-level cache depends on, and adds to, the workspace's overall cache, so it is never taken from the store.
+        self.icebear_for_fdb(config, self.overall_cache_file)
+
+    def isolate_failure(self, config: Configuration) -> Union[List[str], None]:
+        """Find a minimal set of option values which makes configure fail, with configure-only probes.
+
+        Probes apply subsets of the values config adds to the baseline. Returns
+        None if probes are disabled or configure alone doesn't fail.
+        """
+        if self.ddmin_probes <= 0 or self.opts.skip_prepare:
+            return None
+        baseline_options = set(self.baseline.config_options)
+        delta = [token for token in config.config_options if token not in baseline_options]
+        if not delta:
+            return None
+        base_vec = self.option_space.encode(self.baseline.config_options)
+        results: Dict[FrozenSet[str], bool] = {}
+
+        def fails(subset: List[str]) -> bool:
+            key = frozenset(subset)
+            if key not in results:
+                if len(results) >= self.ddmin_probes:
+                    # Out of probes, keep the smallest failing set found so far.
+                    return False
+                vec = base_vec
+                for token in subset:
+                    vec = self.option_space.with_token(vec, token)
+                probe = self.create_configuration(
+                    self.option_space.decode(vec), self.workspace, f"{config.tag}_dd{len(results)}"
+                )
+                probe.set_build_dir("ddmin")
+                probe.materialize()
+                self.execute_prerequisites(probe)
+                # A probe's failure may come from the probe itself (e.g. a partial option set),
+                # it doesn't tell which dependencies this machine misses.
+                results[key] = not self.configure(probe, record_failure=False)
+                shutil.rmtree(probe.prep_path, ignore_errors=True)
+            return results[key]
+
+        if not fails(delta):
+            logger.info(f"[DDMin] {config.tag}: configure alone doesn't fail, can't isolate the cause.")
+            return None
+        culprit = ddmin(delta, fails)
+        logger.info(f"[DDMin] {config.tag}: {culprit} fail configure together ({len(results)} probes).")
+        return culprit
+
+    def observe_option_effect(self, base: Configuration, config: Configuration) -> Union[str, None]:
+        """Learn whether the only option toggled from base to config changed any file hash.
+
+        Returns the option if it has just been recognized as a no-op.
+        """
+        changed_keys = self.option_space.diff_keys(
+            self.option_space.encode(base.config_options),
+            self.option_space.encode(config.config_options),
+        )
+        if len(changed_keys) != 1:
+            # Effects of several toggled options can't be attributed.
+            return None
+        if not os.path.exists(base.cache_file) or not os.path.exists(config.cache_file):
+            return None
+        base_flc = FileLevelCache.model_validate(json.load(open(base.cache_file)))
+        curr_flc = FileLevelCache.model_validate(json.load(open(config.cache_file)))
+        build_root = self.project_info.build_dir
+        changed = base_flc.distance(curr_flc, build_root) > 0 or curr_flc.distance(base_flc, build_root) > 0
+        option = changed_keys[0]
+        if self.option_effects.observe(option, changed):
+            logger.info(f"[Option Effects] {option} changed no file in {self.option_effects.noop_contexts} contexts, pruning it.")
+            self.pruned_options.add(option)
+            return option
+        return None
+
     def get_candidate_config_list(self) -> List[Configuration]:
-        configs_not_chosen = list(filter(
-            lambda c: c not in self.chosen_config_list, self.config_list
-        ))
+        if self.candidate_pool is None:
+            self.candidate_pool = CandidatePool(self.config_list)
+            for config in self.chosen_config_list:
+                self.candidate_pool.mark(config, CandidateState.chosen)
+        # Candidates which were neither chosen nor discarded in the last round are available again.
         # If configuration has not been chosen, but its distance to all chosen configurations is zero,
-        # then it won't be chosen anymore.
-        all_candidates = list(filter(
-            lambda c: c not in self.zero_distance_configs, configs_not_chosen
-        ))
-        candidate_configs = get_equidistant_elements(all_candidates, self.candidate_size)
-        for i, config in enumerate(candidate_configs):
-            config.set_build_dir(f"s{i}")
-        return candidate_configs
+        # then it won't be chosen anymore, and configurations failed to prepare won't be retried.
+        self.candidate_pool.release_in_flight()
+        # Build dirs are assigned right before preparing, see determine_chosen_configurations.
+        if self._source_bytes is None:
+            # An in-tree slot starts as a copy of the sources, at worst.
+            self._source_bytes = 0 if self.project_info.out_of_tree else tree_bytes(self.src_dir)
+        self.slot_pool.resize(self.slot_pool.target_size(self.candidate_size, self._source_bytes))
+        return self.candidate_pool.pick(min(self.candidate_size, len(self.slot_pool)))
 
     def determine_chosen_configurations(self, chosen_configs: Union[None, List[Configuration]]=None):
         if chosen_configs is not None:
@@ -1356,6 +1542,7 @@ class Project:
                 self.chosen_config_list.append(self.create_configuration(config.config_options, self.workspace, config.tag))
             return
         
+        self.resolve_unavailable_values()
         choose_process_record = os.path.join(self.workspace, "choose_process.txt")
         choose_process_details: List[Dict] = []
         cache_hit_count = 0  # Track cache hits
@@ -1374,6 +1561,11 @@ class Project:
         def append_stop(reason: str):
             choose_process_details.append({"type": "stop", "reason": reason})
 
+        def record_evaluated(config: Configuration, status: str):
+            self.config_index.record(
+                config.fingerprint, config.config_options, self.workspace, config.tag, status
+            )
+
         # Choose configurations through adaptive sampling.
         choice_rounds = 5
 
@@ -1387,6 +1579,7 @@ class Project:
                 f"[Prepare {curr_config.tag}] Prepare compilation database failed! Stop subsequent jobs."
             )
             return
+        record_evaluated(curr_config, "prepared")
         self.icebear(curr_config, self.overall_cache_file, prep_only=self.opts.prep_only)
         file_level_cache = FileLevelCache.model_validate(json.load(open(curr_config.cache_file)))
         self.chosen_config_list.append(curr_config)
@@ -1415,14 +1608,19 @@ class Project:
                 }
                 chosen_config = None
                 max_dis = 0
-                for config in candidate_config_list:
+                # Every candidate goes to the slot last configured most like it.
+                slots = self.slot_pool.assign([config.config_options for config in candidate_config_list])
+                for slot, config in zip(slots, candidate_config_list):
                     logger.TAG = f"{self.project_name}/{config.tag}"
                     self.explored_candidate_configs.add(config.tag)
                     # 1. Calculate incremental database by icebear.
                     # Check if already prepared
                     if config.tag not in self.prepared_configs:
+                        config.set_build_dir(slot)
                         process_status = self.prepare_compilation_database(config)
+                        record_evaluated(config, "prepared" if process_status else "failed")
                         if not process_status:
+                            self.candidate_pool.mark(config, CandidateState.failed)
                             round_info["candidates"].append(
                                 {
                                     "tag": config.tag,
@@ -1437,11 +1635,12 @@ class Project:
                         logger.info(f"[Cache Hit] {config.tag} already prepared, skipping prepare")
                         cache_hit_count += 1
                     # Always run icebear_for_fdb to recalculate with updated overall_cache
-                    self.icebear_for_fdb(config, self.overall_cache_file)
+                    self.pre_analyze(config)
                     # 2. Calculate distance.
                     curr_flc = FileLevelCache.model_validate(json.load(open(config.cache_file)))
                     curr_dis = file_level_cache.distance(curr_flc, self.project_info.build_dir)
                     logger.info(f"[Distance] {config.tag}: {curr_dis}")
+                    self.observe_option_effect(self.baseline, config)
                     round_info["candidates"].append(
                         {
                             "tag": config.tag,
@@ -1459,9 +1658,11 @@ class Project:
                         logger.info(f"[Not Chosen] {config.tag}: {curr_dis} <= {max_dis}")
                         if curr_dis == 0:
                             self.zero_distance_configs.add(config)
+                            self.candidate_pool.mark(config, CandidateState.zero_distance)
                 if chosen_config:
                     curr_config = chosen_config
                     self.chosen_config_list.append(chosen_config)
+                    self.candidate_pool.mark(chosen_config, CandidateState.chosen)
                     mark_chosen(round_info, chosen_config.tag, max_dis)
                     logger.TAG = f"{self.project_name}/{chosen_config.tag}"
                     
@@ -1481,28 +1682,25 @@ class Project:
             ov_to_opt_name: Dict[str, str] = {}
             
             for opt in self.project_info.options:
-                tokens = []
-                if opt.is_switch():
-                    pos, _ = opt.positive()
-                    neg, _ = opt.negative()
-                    if pos: tokens.append(pos)
-                    if neg: tokens.append(neg)
-                elif opt.values:
-                    for val in opt.values:
-                        tokens.append(f"{opt.option}={val}")
-                else:
-                    pos, _ = opt.positive()
-                    if pos: tokens.append(pos)
-                
-                for t in tokens:
+                for t, _ in option_value_tokens(opt):
                     ov_to_opt_name[t] = opt.option
                     all_option_values.append(t)
 
             # 2. Initialize population
             m = self.candidate_size
-            # Population stores the current option set for each of the m slots
-            population_options: List[List[str]] = [self.baseline.config_options.copy() for _ in range(m)]
-            blacklisted_ov: Set[str] = set()
+            # Population stores the current option set for each of the m slots, encoded as option vectors.
+            space = self.option_space
+            population_options: List[array] = [space.encode(self.baseline.config_options) for _ in range(m)]
+            # Option values which can still be picked; used, failed and blacklisted values are removed.
+            scheduler = OptionValueScheduler(ov_to_opt_name, self.ov_scheduler)
+            # Picked option value and prepare time of each candidate, to reward the scheduler.
+            candidate_picks: Dict[Configuration, Tuple[str, float]] = {}
+            # The configuration each candidate was superimposed on, to learn option effects.
+            candidate_bases: Dict[Configuration, Configuration] = {}
+            for opt_name in self.pruned_options:
+                scheduler.remove_option(opt_name)
+            for value in self.unavailable_values:
+                scheduler.remove(value)
             
             # Load persistent failed OVs
             failed_ov_path = os.path.join(os.path.dirname(self.workspace), "failed_options.json")
@@ -1520,20 +1718,8 @@ class Project:
 
             low_rounds = 0
             round_idx = 0
-            
-            def update_options_list(current_opts: List[str], new_ov: str) -> List[str]:
-                target_opt_name = ov_to_opt_name.get(new_ov)
-                if not target_opt_name:
-                    return current_opts + [new_ov]
-                
-                new_list = []
-                # Remove existing values for this option
-                for op in current_opts:
-                    op_name = ov_to_opt_name.get(op)
-                    if op_name != target_opt_name:
-                        new_list.append(op)
-                new_list.append(new_ov)
-                return new_list
+            # Option sets already evaluated in this run (superimposed slots may converge).
+            evaluated_vectors: Set[bytes] = {space.vector_key(population_options[0])}
 
             while True:
                 if self.max_rounds and round_idx >= self.max_rounds:
@@ -1545,7 +1731,7 @@ class Project:
                     )
                     break
 
-                if len([item for item in all_option_values if item not in blacklisted_ov]) == 0:
+                if len(scheduler) == 0:
                     logger.info("[Adaptive-Random] All option values blacklisted, stopping generation.")
                     append_stop("All option values blacklisted.")
                     break
@@ -1563,7 +1749,7 @@ class Project:
                 
                 # Generate m configurations
                 for i in range(m):
-                    base_opts = population_options[i]
+                    base_vec = population_options[i]
                     
                     # Retry loop for this slot
                     slot_success = False
@@ -1573,13 +1759,16 @@ class Project:
                     while not slot_success and attempts < max_attempts:
                         attempts += 1
                         
-                        # Pick random OV not in blacklist
-                        valid_ovs = [ov for ov in all_option_values if ov not in blacklisted_ov]
-                        if not valid_ovs:
+                        # Pick an OV not in blacklist
+                        if len(scheduler) == 0:
                             logger.info("[Adaptive-Random] No valid options left!")
                             break
                         
-                        picked_ov = self.rand.choice(valid_ovs)
+                        # Each (round, slot, attempt) draws from its own stream, so a slot's
+                        # picks don't depend on how many picks the other slots consumed.
+                        picked_ov = scheduler.pick(
+                            spawn_rand(self.random_seed, "random-space", round_idx, i, attempts)
+                        )
                         
                         # Check persistent failed OVs
                         if picked_ov in persistent_failed_ovs:
@@ -1589,13 +1778,28 @@ class Project:
                             round_info["candidates"].append({
                                 "tag": tag,
                                 "result": "prepare-failed",
-                                "options": update_options_list(base_opts, picked_ov)
+                                "options": space.decode(space.with_token(base_vec, picked_ov))
                             })
-                            blacklisted_ov.add(picked_ov)
+                            scheduler.remove(picked_ov)
                             continue
 
                         # Superimpose
-                        new_opts = update_options_list(base_opts, picked_ov)
+                        # (replaces the previous value of the same option)
+                        new_vec = space.with_token(base_vec, picked_ov)
+                        new_opts = space.decode(new_vec)
+                        new_key = space.vector_key(new_vec)
+                        if new_key in evaluated_vectors or (
+                            self.skip_fingerprints and config_fingerprint(new_opts, space) in self.skip_fingerprints
+                        ):
+                            logger.info(f"[Adaptive-Random] Skipping already evaluated option set: {new_opts}")
+                            scheduler.remove(picked_ov)
+                            continue
+                        conflict = self.learned_conflicts.violated(new_opts)
+                        if conflict:
+                            logger.info(f"[Adaptive-Random] Skipping {picked_ov}, learned conflict: {sorted(conflict)}")
+                            scheduler.remove(picked_ov)
+                            continue
+                        evaluated_vectors.add(new_key)
                         
                         # Create config
                         tag = f"r{round_idx}_s{i}_try{attempts}"
@@ -1606,26 +1810,44 @@ class Project:
                         self.explored_candidate_configs.add(cfg.tag)
 
                         # Prepare
+                        prepare_start = time.monotonic()
                         if cfg.tag not in self.prepared_configs:
                             process_status = self.prepare_compilation_database(cfg)
+                            record_evaluated(cfg, "prepared" if process_status else "failed")
                             if process_status:
                                 # Success
                                 self.prepared_configs.add(cfg.tag)
-                                self.icebear_for_fdb(cfg, self.overall_cache_file)
-                                population_options[i] = new_opts # Update population
+                                self.pre_analyze(cfg)
+                                candidate_picks[cfg] = (picked_ov, time.monotonic() - prepare_start)
+                                candidate_bases[cfg] = last_slot_configs.get(i, self.baseline)
+                                population_options[i] = new_vec # Update population
                                 current_round_configs.append((cfg, i))
                                 last_slot_configs[i] = cfg
                                 slot_success = True
                             else:
                                 # Fail
-                                logger.info(f"[Adaptive-Random] Config {tag} failed prepare. Blacklisting {picked_ov}")
+                                scheduler.reward(picked_ov, 0.0)
                                 round_info["candidates"].append({
                                     "tag": cfg.tag,
                                     "result": "prepare-failed",
                                     "options": snapshot_options(cfg)
                                 })
+                                if picked_ov in self.unavailable_values:
+                                    # A missing dependency, every value needing it is out.
+                                    for value in self.unavailable_values:
+                                        scheduler.remove(value)
+                                    continue
+                                # The cause is often an interaction with an earlier value of the slot.
+                                culprit = self.isolate_failure(cfg)
+                                if culprit and len(culprit) > 1:
+                                    if self.learned_conflicts.add(culprit):
+                                        logger.info(f"[Adaptive-Random] Config {tag} failed prepare. Learned conflict {culprit}")
+                                    scheduler.remove(picked_ov)
+                                    continue
+                                failed_ov = culprit[0] if culprit else picked_ov
+                                logger.info(f"[Adaptive-Random] Config {tag} failed prepare. Blacklisting {failed_ov}")
                                 # Add to persistent failed OVs
-                                persistent_failed_ovs.add(picked_ov)
+                                persistent_failed_ovs.add(failed_ov)
                                 try:
                                     with open(failed_ov_path, "w") as f:
                                         json.dump(list(persistent_failed_ovs), f)
@@ -1634,18 +1856,20 @@ class Project:
                         else:
                             # Should not happen with unique tags
                             cache_hit_count += 1
-                            population_options[i] = new_opts
+                            candidate_picks[cfg] = (picked_ov, time.monotonic() - prepare_start)
+                            candidate_bases[cfg] = last_slot_configs.get(i, self.baseline)
+                            population_options[i] = new_vec
                             current_round_configs.append((cfg, i))
                             last_slot_configs[i] = cfg
                             slot_success = True
                         
                         # Blacklist the picked OV to avoid retrying it
-                        blacklisted_ov.add(picked_ov)
+                        scheduler.remove(picked_ov)
                     
                     if not slot_success:
                         logger.info(f"[Adaptive-Random] Slot {i} failed to find valid config after retries.")
 
-                    if len([item for item in all_option_values if item not in blacklisted_ov]) == 0:
+                    if len(scheduler) == 0:
                         logger.info("[Adaptive-Random] All option values blacklisted during generation, stopping slot attempts.")
                         break
 
@@ -1665,6 +1889,12 @@ class Project:
                     curr_dis = file_level_cache.distance(curr_flc, self.project_info.build_dir)
                     
                     logger.info(f"[Distance] {config.tag}: {curr_dis}")
+                    # Reward the picked option by distance per second of prepare time.
+                    picked_ov, prepare_seconds = candidate_picks[config]
+                    scheduler.reward(picked_ov, curr_dis / max(prepare_seconds, 1e-3))
+                    noop_option = self.observe_option_effect(candidate_bases[config], config)
+                    if noop_option:
+                        scheduler.remove_option(noop_option)
                     
                     if curr_dis == 0:
                         self.zero_distance_configs.add(config)
@@ -1814,14 +2044,11 @@ class Project:
 
         def write_selection_summary(details: List[Dict], output_path: str):
             # Calculate config space based on current strategy
-            def compute_config_space() -> int:
-                if self.strategy == "random-space":
-                    return len(all_option_values)
-                # preset / twise / pairwise-explicit / adaptive operate on explicit enumerations
-                return max(1, len(self.config_list))
-
-            total_space = compute_config_space()
-            if total_space > 10**18:
+            # Exact number of valid configurations of the unpruned options.
+            total_space = self.config_space.count()
+            if total_space > 10**300:
+                space_expr = f"~10^{len(str(total_space)) - 1}"
+            elif total_space > 10**18:
                 space_expr = f"{total_space:.2e}"
             else:
                 space_expr = str(total_space)
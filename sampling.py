@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Set, Tuple, Union
+
+
+def spawn_seed(seed: int, *spawn_key) -> int:
+    """Derive an independent child seed from (seed, spawn_key).
+
+    Like numpy's SeedSequence.spawn, every work item gets its own stream that
+    only depends on the root seed and its key, so the generated values don't
+    depend on how the work is distributed across processes.
+    """
+    material = "/".join(str(k) for k in (seed,) + spawn_key)
+    digest = hashlib.blake2b(material.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def spawn_rand(seed: int, *spawn_key) -> random.Random:
+    return random.Random(spawn_seed(seed, *spawn_key))
+
+
+def split_evenly(items: List, parts: int) -> List[List]:
+    parts = max(1, min(parts, len(items)))
+    size, rest = divmod(len(items), parts)
+    chunks = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < rest else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+# Read-only data shared with sampling workers, installed once per worker.
+_worker_context = None
+# What a worker derived from the context and keeps up to date itself, reset with it.
+_worker_state: Dict = {}
+
+
+def _init_worker(context):
+    global _worker_context, _worker_state
+    _worker_context = context
+    _worker_state = {}
+
+
+class SamplingPool:
+    """Map sampling tasks over worker processes, or in-process when jobs is 1."""
+
+    def __init__(self, jobs: int, context):
+        self.jobs = max(1, jobs)
+        self.context = context
+        self._executor: Union[ProcessPoolExecutor, None] = None
+
+    def __enter__(self):
+        if self.jobs > 1:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.jobs,
+                initializer=_init_worker,
+                initargs=(self.context,),
+            )
+        else:
+            _init_worker(self.context)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def map(self, func: Callable, tasks: Iterable) -> List:
+        # Results are always returned in task order.
+        if self._executor is not None:
+            return list(self._executor.map(func, tasks))
+        return [func(task) for task in tasks]
+
+
+def is_valid_n_tuple(opt_objs: List, tokens: List[str]) -> bool:
+    """Check if an n-tuple of options is valid (no conflicts)."""
+    conflict_set: Set[str] = set()
+    selected_keys: Set[str] = set()
+
+    for i, opt_obj in enumerate(opt_objs):
+        # Check for duplicate option assignment
+        if opt_obj.option in selected_keys:
+            return False
+        selected_keys.add(opt_obj.option)
+
+        # Check conflicts
+        if opt_obj.option in conflict_set:
+            return False
+        if any(cf in conflict_set for cf in opt_obj.conflict):
+            return False
+
+        # Add conflicts
+        conflict_set.update(opt_obj.conflict)
+
+        # Check combination conflicts
+        for com in opt_obj.combination:
+            com_key = com.split("=")[0]
+            if com_key in conflict_set:
+                return False
+            # Check if combination conflicts with other selected options
+            for j, other_obj in enumerate(opt_objs):
+                if i != j and other_obj.option == com_key and com != tokens[j]:
+                    return False
+
+    return True
+
+
+def count_covered_tuples(
+    config_options: List[str],
+    tuples_to_check: Set[tuple],
+    option_value_space: List[List[tuple]],
+) -> Set[tuple]:
+    """Count how many tuples from tuples_to_check are covered by this configuration."""
+    # Build a map of option_idx -> assigned token
+    config_map: Dict[int, str] = {}
+    selected = set(config_options)
+    for opt_idx, values in enumerate(option_value_space):
+        for token, is_on, opt_obj in values:
+            if token in selected:
+                config_map[opt_idx] = token
+                break
+
+    # Check which tuples are covered
+    covered = set()
+    for tpl in tuples_to_check:
+        # tpl is ((opt_idx, token), ...)
+        if all(config_map.get(opt_idx) == token for opt_idx, token in tpl):
+            covered.add(tpl)
+    return covered
+
+
+def twise_candidates(task) -> List[tuple]:
+    """Worker: build and score the random candidates of one t-wise iteration.
+
+    Candidate `attempt` of `iteration` always draws from the same stream, so
+    the merged candidates are identical for any number of workers. The
+    tuples to cover come with the worker context, tasks only carry the
+    configurations chosen so far, whose tuples the worker drops from its
+    own uncovered set once.
+    """
+    seed, iteration, attempts, chosen = task
+    option_value_space, config_space, all_tuples = _worker_context
+    uncovered = _worker_state.setdefault("uncovered", set(all_tuples))
+    for config_options in chosen[_worker_state.get("applied", 0):]:
+        uncovered -= count_covered_tuples(config_options, uncovered, option_value_space)
+    _worker_state["applied"] = len(chosen)
+    results = []
+    for attempt in attempts:
+        rand = spawn_rand(seed, "twise", iteration, attempt)
+        config_options = config_space.sample(rand)
+        if config_options is None:
+            results.append((attempt, None, set()))
+            continue
+        covered = count_covered_tuples(config_options, uncovered, option_value_space)
+        results.append((attempt, config_options, covered))
+    return results
+
+
+def n_option_candidates(task) -> List[List[str]]:
+    """Worker: random value assignments for one n-way option combination."""
+    seed, n, combo_idx, combo = task
+    option_tokens = _worker_context
+    rand = spawn_rand(seed, "adaptive", n, combo_idx)
+    candidates: List[List[str]] = []
+    # Limit attempts per combo
+    for _ in range(min(5, 2**n)):
+        # Randomly pick one value for each option in the combo
+        selected_tokens = []
+        selected_objs = []
+        for opt_idx in combo:
+            token, opt_obj = rand.choice(option_tokens[opt_idx])
+            selected_tokens.append(token)
+            selected_objs.append(opt_obj)
+
+        if not is_valid_n_tuple(selected_objs, selected_tokens):
+            continue
+        config_options = selected_tokens.copy()
+        # Add combination side-effects
+        for opt_obj in selected_objs:
+            for com in opt_obj.combination:
+                if com not in config_options:
+                    config_options.append(com)
+        candidates.append(config_options)
+    return candidates
+
+
+SAMPLING_PLAN_VERSION = 2
+
+
+def options_spec_hash(options: List, settings: Union[Dict, None] = None) -> str:
+    """Fingerprint of everything in the option specs, and the given settings, that sampling depends on."""
+    spec = [
+        [
+            option.option,
+            [str(v) for v in option.values],
+            option.switch_values,
+            option.kind.name,
+            sorted(option.conflict),
+            sorted(option.combination),
+            option.on_value,
+            option.off_value,
+        ]
+        for option in options
+    ]
+    material = json.dumps(spec if settings is None else [spec, settings], sort_keys=True)
+    return hashlib.blake2b(material.encode(), digest_size=16).hexdigest()
+
+
+class SamplingPlan:
+    """The sampled configurations of a strategy run, persisted as compact JSON.
+
+    A plan is only valid for the exact key it was generated with, so changing
+    the option specs, pruning settings, strategy, seed or limits produces a new plan.
+    """
+
+    def __init__(self, key: Dict, configs: List[Tuple[str, List[str]]]):
+        self.key = key
+        self.configs = configs  # [(tag, options), ...], baseline first.
+
+    @staticmethod
+    def file_name(key: Dict) -> str:
+        material = json.dumps(key, sort_keys=True)
+        digest = hashlib.blake2b(material.encode(), digest_size=16).hexdigest()
+        return f"{key.get('strategy', 'plan')}_{digest}.json"
+
+    @staticmethod
+    def load(plan_file: str, key: Dict) -> Union["SamplingPlan", None]:
+        if not os.path.exists(plan_file):
+            return None
+        try:
+            with open(plan_file, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if data.get("version") != SAMPLING_PLAN_VERSION or data.get("key") != key:
+            return None
+        return SamplingPlan(key, [(tag, options) for tag, options in data["configs"]])
+
+    def save(self, plan_file: str):
+        os.makedirs(os.path.dirname(plan_file), exist_ok=True)
+        data = {
+            "version": SAMPLING_PLAN_VERSION,
+            "key": self.key,
+            "configs": [[tag, options] for tag, options in self.configs],
+        }
+        # Write then rename, so concurrent readers never see a partial plan.
+        tmp_file = f"{plan_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_file, plan_file)
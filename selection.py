@@ -0,0 +1,363 @@
+import json
+import math
+import os
+import random
+from enum import Enum, auto
+from typing import Callable, Dict, FrozenSet, Hashable, Iterable, List, Set, Union
+
+from sampling import split_evenly
+
+
+class CandidateState(Enum):
+    available = auto()
+    in_flight = auto()  # Picked for the current round, result not known yet.
+    chosen = auto()
+    zero_distance = auto()
+    failed = auto()
+
+
+class CandidatePool:
+    """Selection state of every sampled configuration.
+
+    A Fenwick tree counts the available items by position, so state updates
+    are O(log N) and picking k equidistant candidates is O(k log N), no matter
+    how many configurations were already chosen or discarded.
+    """
+
+    def __init__(self, items: List[Hashable]):
+        self.items: List[Hashable] = []
+        self.position: Dict[Hashable, int] = {}
+        self.states: Dict[Hashable, CandidateState] = {}
+        self.counts: Dict[CandidateState, int] = {state: 0 for state in CandidateState}
+        self._in_flight: Dict[Hashable, None] = {}  # Insertion-ordered set.
+        self._tree: List[int] = [0]
+        for item in items:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.position
+
+    def _tree_update(self, pos: int, delta: int):
+        i = pos + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _rebuild_tree(self, capacity: int):
+        self._tree = [0] * (capacity + 1)
+        for pos, item in enumerate(self.items):
+            if self.states[item] == CandidateState.available:
+                self._tree_update(pos, 1)
+
+    def _find_available(self, rank: int) -> int:
+        # Position of the rank-th (0-based) available item.
+        pos = 0
+        remaining = rank + 1
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] < remaining:
+                pos = nxt
+                remaining -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+    def add(self, item: Hashable, state: CandidateState = CandidateState.available):
+        if item in self.position:
+            return
+        self.position[item] = len(self.items)
+        self.items.append(item)
+        self.states[item] = state
+        self.counts[state] += 1
+        if state == CandidateState.in_flight:
+            self._in_flight[item] = None
+        if len(self.items) >= len(self._tree):
+            # Grow geometrically, so appends stay amortized O(log N).
+            self._rebuild_tree(2 * len(self.items))
+        elif state == CandidateState.available:
+            self._tree_update(len(self.items) - 1, 1)
+
+    def state(self, item: Hashable) -> CandidateState:
+        return self.states[item]
+
+    def mark(self, item: Hashable, state: CandidateState):
+        old_state = self.states[item]
+        if old_state == state:
+            return
+        self.states[item] = state
+        self.counts[old_state] -= 1
+        self.counts[state] += 1
+        if old_state == CandidateState.in_flight:
+            del self._in_flight[item]
+        elif state == CandidateState.in_flight:
+            self._in_flight[item] = None
+        if old_state == CandidateState.available:
+            self._tree_update(self.position[item], -1)
+        elif state == CandidateState.available:
+            self._tree_update(self.position[item], 1)
+
+    def available_count(self) -> int:
+        return self.counts[CandidateState.available]
+
+    def pick(self, k: int) -> List[Hashable]:
+        """Pick k equidistant available items (all of them if fewer) and mark them in flight."""
+        n = self.available_count()
+        if n == 0 or k <= 0:
+            return []
+        if n <= k:
+            ranks = list(range(n))
+        elif k == 1:
+            ranks = [0]
+        else:
+            step = (n - 1) / (k - 1)
+            ranks = [round(i * step) for i in range(k)]
+        # Resolve every rank before marking, marking shifts the ranks.
+        picked = [self.items[self._find_available(rank)] for rank in ranks]
+        for item in picked:
+            self.mark(item, CandidateState.in_flight)
+        return picked
+
+    def release_in_flight(self):
+        """Return candidates that were picked but not resolved to the available state."""
+        for item in list(self._in_flight):
+            self.mark(item, CandidateState.available)
+
+    def items_in(self, state: CandidateState) -> List[Hashable]:
+        # O(N), meant for reporting only.
+        return [item for item in self.items if self.states[item] == state]
+
+
+class IndexedSet:
+    """Set with O(1) add, remove and uniform random choice."""
+
+    def __init__(self, items: Iterable[Hashable] = ()):
+        self.items: List[Hashable] = []
+        self.position: Dict[Hashable, int] = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.position
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def add(self, item: Hashable):
+        if item not in self.position:
+            self.position[item] = len(self.items)
+            self.items.append(item)
+
+    def remove(self, item: Hashable):
+        pos = self.position.pop(item, None)
+        if pos is None:
+            return
+        last = self.items.pop()
+        if pos < len(self.items):
+            # Move the last item into the hole.
+            self.items[pos] = last
+            self.position[last] = pos
+
+    def choice(self, rand: random.Random) -> Hashable:
+        return self.items[rand.randrange(len(self.items))]
+
+
+class OptionValueScheduler:
+    """Pick the next option value to superimpose in the adaptive-random strategy.
+
+    Arms are options, the values of one option share their statistics since
+    every value is only superimposed once. An arm is rewarded by the distance
+    its candidate introduced per second of prepare time. "ucb" uses UCB1 and
+    "thompson" Gaussian Thompson sampling on rewards normalized by the best
+    reward seen so far, "uniform" picks any eligible value at random.
+    """
+
+    def __init__(self, ov_to_opt_name: Dict[str, str], mode: str = "ucb", exploration: float = 1.0):
+        self.ov_to_opt_name = ov_to_opt_name
+        self.mode = mode
+        self.exploration = exploration
+        self.eligible_values = IndexedSet(ov_to_opt_name.keys())
+        self.arm_values: Dict[str, IndexedSet] = {}
+        for ov, opt_name in ov_to_opt_name.items():
+            self.arm_values.setdefault(opt_name, IndexedSet()).add(ov)
+        self.eligible_arms = IndexedSet(self.arm_values.keys())
+        self.unpulled_arms = IndexedSet(self.arm_values.keys())
+        self.pulls: Dict[str, int] = {arm: 0 for arm in self.arm_values}
+        self.reward_sums: Dict[str, float] = {arm: 0.0 for arm in self.arm_values}
+        self.total_pulls = 0
+        self.max_reward = 0.0
+
+    def __len__(self) -> int:
+        return len(self.eligible_values)
+
+    def __contains__(self, ov: str) -> bool:
+        return ov in self.eligible_values
+
+    def remove(self, ov: str):
+        """The value won't be picked anymore (used, failed or blacklisted)."""
+        if ov not in self.eligible_values:
+            return
+        self.eligible_values.remove(ov)
+        arm = self.ov_to_opt_name[ov]
+        self.arm_values[arm].remove(ov)
+        if len(self.arm_values[arm]) == 0:
+            self.eligible_arms.remove(arm)
+            self.unpulled_arms.remove(arm)
+
+    def remove_option(self, opt_name: str):
+        arm_values = self.arm_values.get(opt_name)
+        if arm_values is None:
+            return
+        for ov in list(arm_values):
+            self.remove(ov)
+
+    def reward(self, ov: str, value: float):
+        arm = self.ov_to_opt_name[ov]
+        self.pulls[arm] += 1
+        self.reward_sums[arm] += value
+        self.total_pulls += 1
+        self.max_reward = max(self.max_reward, value)
+        self.unpulled_arms.remove(arm)
+
+    def _mean(self, arm: str) -> float:
+        if self.max_reward <= 0:
+            return 0.0
+        return self.reward_sums[arm] / self.pulls[arm] / self.max_reward
+
+    def pick(self, rand: random.Random) -> Union[str, None]:
+        if len(self.eligible_values) == 0:
+            return None
+        if self.mode == "uniform":
+            return self.eligible_values.choice(rand)
+        if len(self.unpulled_arms):
+            # Every arm is tried once before exploiting.
+            arm = self.unpulled_arms.choice(rand)
+            return self.arm_values[arm].choice(rand)
+
+        best_arm = None
+        best_score = -math.inf
+        for arm in self.eligible_arms:
+            if self.mode == "thompson":
+                score = rand.gauss(self._mean(arm), 1.0 / math.sqrt(self.pulls[arm] + 1))
+            else:
+                score = self._mean(arm) + self.exploration * math.sqrt(
+                    2 * math.log(self.total_pulls) / self.pulls[arm]
+                )
+            if score > best_score:
+                best_arm, best_score = arm, score
+        return self.arm_values[best_arm].choice(rand)
+
+
+class OptionEffectStats:
+    """Whether toggling an option ever changed a file hash, persisted per project commit.
+
+    An observation compares a configuration with the one it was derived from
+    when exactly one option differs. An option that changed nothing in
+    `noop_contexts` different contexts is considered a no-op and pruned.
+    """
+
+    def __init__(self, stats_file: str, noop_contexts: int = 2):
+        self.stats_file = stats_file
+        self.noop_contexts = noop_contexts
+        self.stats: Dict[str, Dict[str, int]] = {}  # option -> {"contexts": n, "changed": m}
+        if os.path.exists(stats_file):
+            try:
+                with open(stats_file, "r") as f:
+                    self.stats = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.stats = {}
+
+    def observe(self, option: str, changed: bool) -> bool:
+        """Record one context, return True if the option just became a no-op."""
+        was_noop = self.is_noop(option)
+        entry = self.stats.setdefault(option, {"contexts": 0, "changed": 0})
+        entry["contexts"] += 1
+        if changed:
+            entry["changed"] += 1
+        self.save()
+        return not was_noop and self.is_noop(option)
+
+    def is_noop(self, option: str) -> bool:
+        if self.noop_contexts <= 0:
+            return False
+        entry = self.stats.get(option)
+        return entry is not None and entry["changed"] == 0 and entry["contexts"] >= self.noop_contexts
+
+    def noop_options(self) -> Set[str]:
+        return {option for option in self.stats if self.is_noop(option)}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.stats_file), exist_ok=True)
+        with open(self.stats_file, "w") as f:
+            json.dump(self.stats, f, indent=3)
+
+
+def ddmin(items: List[Hashable], fails: Callable[[List[Hashable]], bool]) -> List[Hashable]:
+    """Shrink a failing list of items to a 1-minimal failing subset (Zeller's ddmin).
+
+    fails(items) must hold for the full list. Subsets are only adopted once
+    they are seen failing, so a test that gives up (returns False) leaves a
+    failing, if not minimal, result.
+    """
+    n = 2
+    while len(items) >= 2:
+        chunks = split_evenly(items, n)
+        for chunk in chunks:
+            if fails(chunk):
+                items, n = chunk, 2
+                break
+        else:
+            for chunk in chunks:
+                complement = [item for item in items if item not in chunk]
+                if fails(complement):
+                    items, n = complement, max(n - 1, 2)
+                    break
+            else:
+                if n >= len(items):
+                    break
+                n = min(len(items), 2 * n)
+    return items
+
+
+class LearnedConflicts:
+    """Option value sets which are known to fail configure together, persisted as JSON."""
+
+    def __init__(self, conflicts_file: str):
+        self.conflicts_file = conflicts_file
+        self.sets: List[FrozenSet[str]] = []
+        if os.path.exists(conflicts_file):
+            try:
+                with open(conflicts_file, "r") as f:
+                    self.sets = [frozenset(tokens) for tokens in json.load(f)]
+            except (OSError, json.JSONDecodeError):
+                self.sets = []
+
+    def __len__(self) -> int:
+        return len(self.sets)
+
+    def add(self, tokens: Iterable[str]) -> bool:
+        """Record a failing set, return False if it was already known."""
+        conflict = frozenset(tokens)
+        if any(known <= conflict for known in self.sets):
+            return False
+        # A smaller set makes the sets containing it redundant.
+        self.sets = [known for known in self.sets if not conflict <= known] + [conflict]
+        self.save()
+        return True
+
+    def violated(self, options: Iterable[str]) -> Union[FrozenSet[str], None]:
+        selected = set(options)
+        for conflict in self.sets:
+            if conflict <= selected:
+                return conflict
+        return None
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.conflicts_file), exist_ok=True)
+        with open(self.conflicts_file, "w") as f:
+            json.dump(sorted(sorted(conflict) for conflict in self.sets), f, indent=3)